@@ -0,0 +1,138 @@
+import os
+import asyncio
+import hashlib
+import logging
+
+from aiogram.types import FSInputFile
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest
+
+from storage import store_call
+
+log = logging.getLogger(__name__)
+
+# Медиа из data/ (озвучка слов, картинки к грамматике): каждый файл загружается в Telegram один раз,
+# дальше отправляется по file_id. Ключ — способ отправки и sha256 содержимого: переименованный файл
+# не загружается заново, изменённый под тем же именем — загружается.
+KINDS = {
+    ".ogg": "voice", ".oga": "voice",
+    ".mp3": "audio", ".m4a": "audio",
+    ".jpg": "photo", ".jpeg": "photo", ".png": "photo", ".webp": "photo",
+}
+
+
+def kind_of(name):
+    return KINDS[os.path.splitext(name)[1].lower()]
+
+
+def file_id_of(message, kind):
+    if kind == "photo":
+        return message.photo[-1].file_id  # самый большой размер
+    return getattr(message, kind).file_id
+
+
+def file_key(path, kind):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return f"{kind}:{h.hexdigest()}"
+
+
+class Assets:
+    """file_id загруженных файлов хранится в store (общий для всех процессов при Redis)."""
+
+    def __init__(self, store, base_dir):
+        self.store = store
+        self.base_dir = base_dir
+        self.file_ids = store.file_ids()
+        self.keys = {}  # имя файла -> (mtime_ns, размер, ключ): хеш считается только после изменения
+        self.uploading = {}  # ключ -> Future, завершается после загрузки: один файл не загружается дважды одновременно
+        self.hits = 0
+        self.uploads = 0
+        self.uploaded_bytes = 0
+
+    async def _key(self, name):
+        path = os.path.join(self.base_dir, name)
+        st = os.stat(path)
+        known = self.keys.get(name)
+        if known and known[:2] == (st.st_mtime_ns, st.st_size):
+            return known[2], st.st_size
+        key = await asyncio.get_running_loop().run_in_executor(None, file_key, path, kind_of(name))
+        self.keys[name] = (st.st_mtime_ns, st.st_size, key)
+        return key, st.st_size
+
+    async def _remember(self, key, file_id):
+        self.file_ids[key] = file_id
+        await store_call(self.store, self.store.put_file_id, key, file_id)
+
+    async def _forget(self, key, file_id):
+        if self.file_ids.get(key) == file_id:
+            del self.file_ids[key]
+        # из store тоже: иначе следующее чтение общего store вернёт тот же отклонённый file_id
+        await store_call(self.store, self.store.drop_file_id, key, file_id)
+
+    async def send(self, bot, chat_id, name, **kwargs):
+        """Отправляет data/<name> в чат: по file_id, а если файл ещё не загружен — загружает его."""
+        kind = kind_of(name)
+        method = getattr(bot, "send_" + kind)
+        try:
+            key, size = await self._key(name)
+        except FileNotFoundError:
+            log.warning("media file %s is missing", name)
+            raise
+        refresh = self.store.shared
+        while True:
+            file_id = self.file_ids.get(key)
+            if file_id is None and refresh:
+                # мог загрузить другой процесс
+                self.file_ids.update(await store_call(self.store, self.store.file_ids))
+                file_id = self.file_ids.get(key)
+            if file_id is not None:
+                try:
+                    message = await method(chat_id, file_id, **kwargs)
+                except TelegramBadRequest as e:
+                    if "file identifier" not in e.message:
+                        raise
+                    # file_id от другого бота (сменили токен) — загружаем заново, не перечитывая store
+                    log.warning("file_id for %s rejected, uploading again", name)
+                    await self._forget(key, file_id)
+                    refresh = False
+                    continue
+                self.hits += 1
+                return message
+            upload = self.uploading.get(key)
+            if upload is not None:
+                # файл уже загружается для другого пользователя: ждём его file_id
+                await asyncio.shield(upload)
+                continue
+            return await self._upload(method, chat_id, name, kind, key, size, **kwargs)
+
+    async def _upload(self, method, chat_id, name, kind, key, size, **kwargs):
+        upload = self.uploading[key] = asyncio.get_running_loop().create_future()
+        try:
+            message = await method(chat_id, FSInputFile(os.path.join(self.base_dir, name)), **kwargs)
+            self.uploads += 1
+            self.uploaded_bytes += size
+            await self._remember(key, file_id_of(message, kind))
+            return message
+        finally:
+            del self.uploading[key]
+            upload.set_result(None)  # при ошибке ждавшие попробуют загрузить сами
+
+    async def warm(self, bot, chat_id, names):
+        """Загружает ещё не загруженные файлы в служебный чат, чтобы пользователи сразу получали file_id."""
+        for name in sorted(set(names)):
+            try:
+                key, size = await self._key(name)
+            except FileNotFoundError:
+                log.warning("media file %s is missing", name)
+                continue
+            if key in self.file_ids or key in self.uploading:
+                continue
+            kind = kind_of(name)
+            try:
+                await self._upload(getattr(bot, "send_" + kind), chat_id, name, kind, key, size,
+                                   disable_notification=True)
+            except TelegramAPIError as e:
+                log.warning("media warm-up failed for %s: %s", name, e)
+        log.info("media warm-up done: %d files known", len(self.file_ids))
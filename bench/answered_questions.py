@@ -0,0 +1,80 @@
+"""Списки текстов вопросов против битовых масок: память на пользователя и время выбора вопроса.
+
+    python -m bench.answered_questions [--questions 10000] [--users 100000]
+"""
+import json
+import time
+import random
+import argparse
+import tracemalloc
+
+from bitset import QuestionSet, get_bits, set_bits
+from content import Question
+
+SAMPLE_USERS = 200
+
+
+def make_questions(n):
+    return [{"id": i + 1, "question": f"«Сөз {i}» сөзі нені білдіреді? Қай аударма дұрыс?"} for i in range(n)]
+
+
+def old_pick(data, used):
+    available = [i for i, q in enumerate(data) if q["question"] not in used]
+    return random.choice(available) if available else None
+
+
+def per_user_memory(build):
+    tracemalloc.start()
+    users = [build() for _ in range(SAMPLE_USERS)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size / len(users), users
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=100000)
+    args = parser.parse_args()
+
+    data = make_questions(args.questions)
+    qs = QuestionSet([Question(q["id"], q["question"], (), 0) for q in data])
+    print(f"{args.questions} questions, {args.users} users (memory extrapolated from {SAMPLE_USERS})")
+    print(f"{'answered':>9} {'list MB':>10} {'bits MB':>9} {'list json MB':>13} {'bits json MB':>13} "
+          f"{'list pick us':>13} {'bits pick us':>13}")
+    for share in (0.1, 0.5, 0.9, 0.99):
+        answered = random.sample(range(args.questions), int(args.questions * share))
+
+        # как после json.load: у каждого пользователя свои строковые объекты
+        texts = json.dumps([data[i]["question"] for i in answered], ensure_ascii=False)
+        list_mem, list_users = per_user_memory(lambda: {"used_words": json.loads(texts)})
+
+        bits = 0
+        for i in answered:
+            bits |= 1 << data[i]["id"]
+        record = {}
+        set_bits(record, "words_done", bits)
+        hexed = json.dumps(record)
+        bits_mem, bits_users = per_user_memory(lambda: json.loads(hexed))
+
+        list_json = len(json.dumps(list_users[0], ensure_ascii=False).encode())
+        bits_json = len(json.dumps(bits_users[0]).encode())
+
+        used = list_users[0]["used_words"]
+        list_us = timed(lambda: old_pick(data, used), 5)
+        bits_us = timed(lambda: qs.pick_unanswered(get_bits(bits_users[0], "words_done")), 2000)
+
+        mb = args.users / 2**20
+        print(f"{share:>9.0%} {list_mem * mb:>10.0f} {bits_mem * mb:>9.1f} {list_json * mb:>13.0f} "
+              f"{bits_json * mb:>13.1f} {list_us:>13.0f} {bits_us:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
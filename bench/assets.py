@@ -0,0 +1,148 @@
+"""Медиа по file_id против загрузки файла на каждую отправку, на заглушке Bot API.
+
+    python -m bench.assets [--files 40] [--kb 48] [--taps 2000] [--concurrency 50]
+
+В каталоге data/ создаётся --files файлов (озвучка .ogg и картинки .jpg по --kb КБ), пользователи
+--taps раз нажимают «🔊 Тыңдау» у случайных слов, по --concurrency одновременно. Сравниваются:
+наивная отправка FSInputFile каждый раз; Assets с холодным кэшем (первые нажатия загружают файл);
+перезапуск процесса на том же store; прогрев при старте в служебный чат; смена токена бота
+(старые file_id отклоняются), в том числе при общем store нескольких процессов. Проверка: каждый файл загружен ровно один раз на каждый store/бот.
+"""
+import os
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+from aiogram import Bot
+from aiogram.types import FSInputFile
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from assets import Assets
+from storage import SqliteStore
+from bench.fake_api import FakeBotAPI, BOT_TOKEN
+
+WARM_CHAT = -100
+
+
+def make_files(path, count, size, rng):
+    os.makedirs(os.path.join(path, "media"))
+    names = []
+    for i in range(count):
+        name = os.path.join("media", f"word{i}.ogg" if i % 4 else f"card{i}.jpg")
+        with open(os.path.join(path, name), "wb") as f:
+            f.write(rng.randbytes(size))
+        names.append(name)
+    return names
+
+
+class SharedStore(SqliteStore):
+    """Как RedisStore для Assets: file_id других процессов перечитываются из store."""
+    shared = True
+
+
+def make_bot(api):
+    return Bot(token=BOT_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(api.url)))
+
+
+async def tap(send, taps, concurrency, names, rng):
+    plan = [(rng.randrange(1, 1000), rng.choice(names)) for _ in range(taps)]
+    latencies = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(chat_id, name):
+        async with sem:
+            start = time.perf_counter()
+            await send(chat_id, name)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(chat_id, name) for chat_id, name in plan))
+    latencies.sort()
+    return time.perf_counter() - start, latencies[len(latencies) // 2] * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--kb", type=int, default=48)
+    parser.add_argument("--taps", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    tmp = tempfile.mkdtemp(prefix="anatili-assets-")
+    names = make_files(tmp, args.files, args.kb * 1024, rng)
+    api = await FakeBotAPI().start()
+    bot = make_bot(api)
+    rows = []
+    failures = []
+
+    async def naive(chat_id, name):
+        method = getattr(bot, "send_voice" if name.endswith(".ogg") else "send_photo")
+        await method(chat_id, FSInputFile(os.path.join(tmp, name)))
+
+    before = api.uploaded_bytes
+    elapsed, p50 = await tap(naive, args.taps, args.concurrency, names, rng)
+    rows.append(("naive upload every time", args.taps, api.uploaded_bytes - before, 0, elapsed, p50))
+
+    def run(label, assets, expected_uploads):
+        async def go():
+            before, hits = api.uploaded_bytes, assets.hits
+            elapsed, p50 = await tap(lambda chat_id, name: assets.send(bot, chat_id, name),
+                                     args.taps, args.concurrency, names, rng)
+            rows.append((label, assets.uploads, api.uploaded_bytes - before, assets.hits - hits, elapsed, p50))
+            if assets.uploads != expected_uploads:
+                failures.append(f"{label}: {assets.uploads} uploads, expected {expected_uploads}")
+        return go()
+
+    store = SqliteStore(os.path.join(tmp, "user_data.db"))
+    await run("file_id cache, cold", Assets(store, tmp), args.files)
+    await run("file_id cache, after restart", Assets(store, tmp), 0)
+    store.close()
+
+    store = SqliteStore(os.path.join(tmp, "warm.db"))
+    assets = Assets(store, tmp)
+    start = time.perf_counter()
+    await assets.warm(bot, WARM_CHAT, names)
+    warm_time = time.perf_counter() - start
+    warmed = assets.uploads
+    assets.uploads = 0
+    await run("file_id cache, warmed at start", assets, 0)
+
+    # новый токен: file_id прежнего бота не принимаются, каждый файл загружается заново один раз
+    await bot.session.close()
+    await api.stop()
+    api = await FakeBotAPI().start()
+    bot = make_bot(api)
+    await run("file_id cache, bot token changed", Assets(store, tmp), args.files)
+    store.close()
+
+    # то же с общим store: отклонённый file_id не должен вернуться из store при перечитывании
+    store = SharedStore(os.path.join(tmp, "shared.db"))
+    await run("shared store, cold", Assets(store, tmp), args.files)
+    await bot.session.close()
+    await api.stop()
+    api = await FakeBotAPI().start()
+    bot = make_bot(api)
+    await run("shared store, bot token changed", Assets(store, tmp), args.files)
+    store.close()
+    await bot.session.close()
+    await api.stop()
+
+    total = sum(os.path.getsize(os.path.join(tmp, name)) for name in names)
+    print(f"{args.files} files, {total / 1024:.0f} KB total; {args.taps} sends, {args.concurrency} at a time")
+    print(f"{'':34}{'uploads':>8}{'uploaded':>12}{'by file_id':>12}{'time':>8}{'p50':>9}")
+    for label, uploads, sent, hits, elapsed, p50 in rows:
+        print(f"{label:34}{uploads:>8}{sent / 1024:>9.0f} KB{hits:>12}{elapsed:>7.2f}s{p50:>6.1f} ms")
+    print(f"warm-up at start: {warmed} files in {warm_time:.2f}s")
+    if failures or warmed != args.files:
+        raise SystemExit("; ".join(failures) or f"warm-up uploaded {warmed} files, expected {args.files}")
+    print("OK")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
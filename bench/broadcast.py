@@ -0,0 +1,135 @@
+"""Рассылка фразы дня на заглушке Bot API: пропускная способность, ошибки и продолжение после падения.
+
+    python -m bench.broadcast [--users 5000] [--api-latency 0.02] [--rate 500] [--concurrency 20] [--redis]
+
+Сначала наивный цикл send_message по всем пользователям (до первой необработанной ошибки), затем
+Broadcast: 1% пользователей заблокировали бота (403), ещё 1% получает 429 с retry_after=1 на первую
+попытку, ещё 1% — 502 на все попытки OutboundLimiter (доставляется только повтором "failed"). Рассылка прерывается на середине и запускается заново с тем же run_id; в конце проверяется,
+что никто не получил сообщение дважды и не пропущен никто, кроме тех, чей запрос оборвало прерывание.
+С --redis store и журнал доставки лежат в заглушке Redis, а продолжают рассылку два «процесса»
+одновременно (у каждого своя аренда RedisLease): рассылку ведёт только получивший аренду.
+"""
+import os
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+from aiogram.exceptions import TelegramAPIError
+
+from bench.fake_api import FakeBotAPI, load_bot
+from bench.fake_redis import serve_in_thread
+from broadcast import Broadcast, DeliveryLog, RedisDeliveryLog
+from cluster import RedisLease
+from templates import DAILY_PHRASE
+
+TEXT = DAILY_PHRASE.render(phrase="Білім — табысқа бастар жол.")
+
+
+async def naive(bot, uids, limit):
+    sent = 0
+    start = time.perf_counter()
+    try:
+        for uid in uids[:limit]:
+            await bot.send_message(int(uid), TEXT, parse_mode="HTML")
+            sent += 1
+    except TelegramAPIError as e:
+        return sent, time.perf_counter() - start, f"stopped: {type(e).__name__}"
+    return sent, time.perf_counter() - start, "ok"
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--api-latency", type=float, default=0.02)
+    parser.add_argument("--rate", type=float, default=500, help="сообщений в секунду (в Telegram — до 30)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--redis", action="store_true", help="store и журнал доставки в заглушке Redis")
+    args = parser.parse_args()
+    random.seed(args.seed)
+    loop = asyncio.get_running_loop()
+
+    api = await FakeBotAPI(latency=args.api_latency).start()
+    if args.redis:
+        makan = load_bot(api, USER_STORE=serve_in_thread().url, JOURNAL_DIR="", FLUSH_INTERVAL_MS=0)
+    else:
+        makan = load_bot(api, FLUSH_INTERVAL_MS=0)
+    uids = [str(uid) for uid in range(1, args.users + 1)]
+    await loop.run_in_executor(None, makan.store.put_many, {uid: {"xp": 0} for uid in uids})
+    blocked = set(random.sample(uids, args.users // 100))
+    limited = set(random.sample([uid for uid in uids if uid not in blocked], args.users // 100))
+    flaky = set(random.sample([uid for uid in uids if uid not in blocked | limited], args.users // 100))
+
+    sent, elapsed, result = await naive(makan.bot, uids, 500)
+    print(f"naive loop: {sent} messages in {elapsed:.2f}s, {sent / elapsed:.0f} msg/s")
+    api.faults[300] = [(429, "Too Many Requests: retry after 1", 1)]
+    makan.outbound.max_retries = 0
+    sent, elapsed, result = await naive(makan.bot, uids, args.users)
+    print(f"naive loop, 429 at user 300 without retries: {sent} messages, {result}")
+    makan.outbound.max_retries = 3
+    api.delivered.clear()
+
+    for uid in blocked:
+        api.faults[int(uid)] = [(403, "Forbidden: bot was blocked by the user", None)]
+    for uid in limited:
+        api.faults[int(uid)] = [(429, "Too Many Requests: retry after 1", 1)]
+    for uid in flaky:
+        api.faults[int(uid)] = [(502, "Bad Gateway", None)] * (makan.outbound.max_retries + 1)
+
+    if args.redis:
+        deliveries = RedisDeliveryLog(makan.store.client)
+    else:
+        deliveries = DeliveryLog(os.path.join(tempfile.mkdtemp(prefix="anatili-bench-"), "broadcast.db"))
+    broadcast = Broadcast(makan.bot, makan.store, deliveries, args.rate, args.concurrency, batch=500)
+    start = time.perf_counter()
+    task = asyncio.create_task(broadcast.run("bench", TEXT))
+    while sum(api.delivered.values()) < args.users // 2:
+        await asyncio.sleep(0.01)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    print(f"interrupted after {sum(api.delivered.values())} deliveries ({time.perf_counter() - start:.2f}s)")
+
+    if args.redis:
+        async def process():
+            broadcast = Broadcast(makan.bot, makan.store, deliveries, args.rate, args.concurrency, batch=500)
+            async with RedisLease(makan.store.client, "broadcast").hold() as held:
+                return await broadcast.run("bench", TEXT) if held else None
+
+        reports = await asyncio.gather(process(), process())
+        print(f"resumed by {sum(r is not None for r in reports)} of 2 processes")
+        report = next(r for r in reports if r)
+    else:
+        broadcast = Broadcast(makan.bot, makan.store, deliveries, args.rate, args.concurrency, batch=500)
+        report = await broadcast.run("bench", TEXT)
+    elapsed = time.perf_counter() - start
+    print(f"resumed run: {report}")
+    print(f"total {elapsed:.2f}s, {sum(api.delivered.values()) / elapsed:.0f} msg/s overall")
+
+    # "sending" — запросы, оборванные прерыванием: доставлены или нет, но повторно не отправлялись
+    uncertain = await loop.run_in_executor(
+        None, deliveries.done, "bench", [uid for uid in uids if uid not in blocked]) - {
+        uid for uid in uids if api.delivered[int(uid)]}
+    twice = sum(count > 1 for count in api.delivered.values())
+    missing = sum(not api.delivered[int(uid)] for uid in uids if uid not in blocked) - len(uncertain)
+    total = report["total"]
+    print(f"delivered twice: {twice}, missing: {missing}, cut off mid-request: {total.get('sending', 0)}, "
+          f"blocked recorded: {total.get('blocked', 0)} of {len(blocked)}")
+    ok = not twice and not missing and total.get("blocked", 0) == len(blocked)
+    if args.redis:
+        # второй «процесс» берёт аренду после первого и видит законченную рассылку
+        async with RedisLease(makan.store.client, "broadcast").hold() as held:
+            again = await Broadcast(makan.bot, makan.store, deliveries).run("bench", TEXT) if held else None
+        ok = ok and held and again["sent"] == 0
+    print("OK" if ok else "MISMATCH")
+    deliveries.close()
+    await makan.bot.session.close()
+    await api.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,136 @@
+"""Несколько процессов бота на одном Redis: прогресс не теряется и не удваивается,
+повторно доставленные апдейты обрабатываются один раз.
+
+    python -m bench.cluster [--workers 4] [--users 50] [--rounds 5]
+
+Поднимается заглушка Redis (bench.fake_redis) и --workers процессов бота, у каждого своя
+заглушка Bot API. Все процессы одновременно гоняют одних и тех же пользователей: «Сөздер» →
+правильный ответ на вопрос, который сейчас ждёт пользователь. Каждый апдейт «Сөздер»
+доставляется двум процессам (свой и соседа) с одним update_id.
+Проверка: XP каждого пользователя в Redis = 10 × число ответов «✅ Дұрыс», отправленных всеми
+процессами, каждый повтор отброшен и ни один апдейт не потерян из-за конфликта версий
+(ConflictRetryMiddleware не исчерпал попытки, исключения из feed_update не было).
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+from collections import Counter
+
+from aiogram.types import Update
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+from bench.fake_api import FakeBotAPI, UpdateFactory, load_bot
+from bench.fake_redis import FakeRedis
+
+
+class CorrectReplies(BaseRequestMiddleware):
+    def __init__(self):
+        self.count = Counter()
+
+    async def __call__(self, make_request, bot, method):
+        if type(method).__name__ == "EditMessageText" and method.text.startswith("✅"):
+            self.count[str(method.chat_id)] += 1
+        return await make_request(bot, method)
+
+
+def update_id(workers, users, r, uid, phase, owner):
+    # одинаковый у всех процессов для одного и того же (раунд, пользователь, шаг, чей апдейт)
+    return ((r * (users + 1) + uid) * 2 + phase) * workers + owner + 1
+
+
+async def worker(url, index, workers, users, rounds):
+    api = await FakeBotAPI().start()
+    makan = load_bot(api, USER_STORE=url, JOURNAL_DIR="", FLUSH_INTERVAL_MS=0, METRICS_PORT=0)
+    replies = CorrectReplies()
+    makan.bot.session.middleware(replies)
+    factory = UpdateFactory()
+
+    errors = Counter()
+
+    async def feed(update):
+        try:
+            await makan.dp.feed_update(makan.bot, Update.model_validate(update, context={"bot": makan.bot}))
+        except Exception as e:
+            errors[type(e).__name__] += 1
+
+    def callback(uid, data, r, phase, owner):
+        update = factory.callback(uid, data)
+        update["update_id"] = update_id(workers, users, r, uid, phase, owner)
+        return update
+
+    async def play(r, uid):
+        neighbour = (index + 1) % workers
+        # свой апдейт и повторная доставка апдейта соседа
+        for owner in (index, neighbour):
+            await feed(callback(uid, makan.router.pack("task_words"), r, 0, owner))
+        pending = makan.store.get(str(uid)).get("pending")
+        if pending:
+            q = makan.word_questions(makan.content.current).by_id[int(pending[1:])]
+            await feed(callback(uid, makan.router.pack("task_words_answer", q.id, q.correct), r, 1, index))
+
+    start = time.perf_counter()
+    for r in range(rounds):
+        await asyncio.gather(*(play(r, uid) for uid in range(1, users + 1)))
+    print(json.dumps({
+        "correct": replies.count, "duplicates": makan.dedup.duplicates, "conflicts": makan.retry.conflicts,
+        "failures": makan.retry.failures, "errors": errors,
+        "seconds": time.perf_counter() - start,
+    }))
+    await makan.bot.session.close()
+    await api.stop()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--worker", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        await worker(args.worker[0], int(args.worker[1]), args.workers, args.users, args.rounds)
+        return
+
+    redis = await FakeRedis().start()
+    procs = [
+        await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "bench.cluster", "--worker", redis.url, str(i), "--workers", str(args.workers),
+            "--users", str(args.users), "--rounds", str(args.rounds), stdout=asyncio.subprocess.PIPE,
+        )
+        for i in range(args.workers)
+    ]
+    outputs = [json.loads((await p.communicate())[0].decode().strip().splitlines()[-1]) for p in procs]
+    correct = Counter()
+    for out in outputs:
+        correct.update(out["correct"])
+
+    from storage import RedisStore
+
+    def stored_xp():
+        store = RedisStore(redis.url)
+        xp = {uid: record.get("xp", 0) for uid, record in store.iter_all()}
+        store.close()
+        return xp
+
+    xp = await asyncio.get_running_loop().run_in_executor(None, stored_xp)
+    await redis.stop()
+
+    bad = [uid for uid in map(str, range(1, args.users + 1)) if xp.get(uid, 0) != 10 * correct[uid]]
+    duplicates = sum(out["duplicates"] for out in outputs)
+    expected_duplicates = args.workers * args.users * args.rounds
+    for i, out in enumerate(outputs):
+        print(f"worker {i}: {sum(out['correct'].values()):>5} correct answers, {out['duplicates']:>5} duplicates "
+              f"dropped, {out['conflicts']:>4} version conflicts retried, {out['failures']} updates lost, "
+              f"errors {dict(out['errors'])}, {out['seconds']:.1f} s")
+    print(f"XP in Redis {sum(xp.values())}, 10 x correct answers sent {10 * sum(correct.values())}")
+    print(f"duplicates dropped {duplicates}, redelivered {expected_duplicates}")
+    lost = sum(out["failures"] + sum(out["errors"].values()) for out in outputs)
+    if bad or duplicates != expected_duplicates or lost:
+        raise SystemExit(f"{len(bad)} users with mismatched XP, {lost} updates lost")
+    print("OK")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+"""Загрузка data/: прежний загрузчик (json + MappingProxyType) против проверки и сборки записей
+из JSON.
+
+    python -m bench.content_load [--scale 1 20 200]
+
+data/ размножается в --scale раз (новые id у вопросов) во временном каталоге. Каждый вариант
+запускается в отдельном процессе: время загрузки, память под загруженные данные (tracemalloc)
+и прирост RSS процесса после загрузки (Linux, /proc/self/statm).
+"""
+import os
+import sys
+import json
+import time
+import types
+import tempfile
+import argparse
+import resource
+import subprocess
+import tracemalloc
+
+import content
+
+MODES = ("dicts", "compile")
+
+
+def freeze(value):
+    # прежний content.freeze
+    if isinstance(value, dict):
+        return types.MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def load_dicts(data_dir):
+    data = {}
+    for name, filename in content.FILES.items():
+        with open(os.path.join(data_dir, filename), "r", encoding="utf-8") as f:
+            data[name] = freeze(json.load(f))
+    return data
+
+
+def load(mode, data_dir):
+    if mode == "dicts":
+        return load_dicts(data_dir)
+    return content.compile_sources(content.read_sources(data_dir))
+
+
+def scaled(src, scale):
+    target = tempfile.mkdtemp(prefix="anatili-content-")
+    for name, filename in content.FILES.items():
+        with open(os.path.join(src, filename), "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        if name == "words":
+            raw = {"words_tasks": raw["words_tasks"]}
+            items = raw["words_tasks"]
+        else:
+            items = raw
+        copies = []
+        for copy in range(scale):
+            for item in items:
+                item = dict(item)
+                if "id" in item and isinstance(item["id"], int):
+                    item["id"] += copy * len(items)
+                copies.append(item)
+        items[:] = copies
+        with open(os.path.join(target, filename), "w", encoding="utf-8") as f:
+            json.dump(raw, f, ensure_ascii=False)
+    return target
+
+
+def rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize()
+
+
+def worker(mode, data_dir):
+    rss_before = rss()
+    start = time.perf_counter()
+    data = load(mode, data_dir)
+    elapsed = time.perf_counter() - start
+    grown = rss() - rss_before
+    assert data is not None
+    del data
+    # память под данные — по второй загрузке под tracemalloc (он сам замедляет загрузку)
+    tracemalloc.start()
+    data = load(mode, data_dir)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(json.dumps({"ms": elapsed * 1000, "retained": retained, "rss": grown}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 20, 200])
+    parser.add_argument("--worker", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        worker(*args.worker)
+        return
+
+    src = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+    print(f"{'scale':>6} {'json KB':>8} {'mode':>9} {'load ms':>9} {'data KB':>9} {'RSS +KB':>9}")
+    for scale in args.scale:
+        data_dir = scaled(src, scale)
+        size = sum(os.path.getsize(os.path.join(data_dir, f)) for f in content.FILES.values())
+        for mode in MODES:
+            out = subprocess.run(
+                [sys.executable, "-m", "bench.content_load", "--worker", mode, data_dir],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            r = json.loads(out)
+            print(f"{scale:>6} {size / 1024:>8.0f} {mode:>9} {r['ms']:>9.2f} {r['retained'] / 1024:>9.0f} "
+                  f"{r['rss'] / 1024:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Локальная заглушка Telegram Bot API и генератор синтетических апдейтов для бенчмарков."""
+import os
+import json
+import time
+import asyncio
+import tempfile
+import itertools
+from collections import Counter
+
+from aiohttp import web
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from metrics import ApiMetricsMiddleware
+
+BOT_TOKEN = "123456:BENCHMARK-TOKEN"
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "AnaTili", "username": "anatili_bench_bot"}
+
+
+def chat(uid):
+    return {"id": uid, "type": "private", "first_name": f"user{uid}"}
+
+
+def user(uid):
+    return {"id": uid, "is_bot": False, "first_name": f"user{uid}"}
+
+
+def message_result(chat_id, text=""):
+    return {"message_id": 1, "date": int(time.time()), "chat": chat(chat_id), "text": text or "ok"}
+
+
+# метод отправки медиа -> поле с файлом
+MEDIA = {"sendPhoto": "photo", "sendAudio": "audio", "sendVoice": "voice"}
+
+
+def media_result(chat_id, field, file_id):
+    file = {"file_id": file_id, "file_unique_id": file_id}
+    if field == "photo":
+        return {**message_result(chat_id), "photo": [{**file, "width": 320, "height": 240}]}
+    return {**message_result(chat_id), field: {**file, "duration": 1}}
+
+
+def error_response(code, description, retry_after=None):
+    return web.json_response({
+        "ok": False, "error_code": code, "description": description,
+        **({"parameters": {"retry_after": retry_after}} if retry_after is not None else {}),
+    }, status=code)
+
+
+class FakeBotAPI:
+    """Отвечает на любые методы Bot API; getUpdates отдаёт накопленную очередь апдейтов."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.calls = Counter()
+        self.updates = asyncio.Queue()
+        self.waiters = []
+        self.runner = None
+        self.screens = {}  # chat_id -> последняя inline-клавиатура, которую видит пользователь
+        self.faults = {}  # chat_id -> [(error_code, description, retry_after), ...] — по ошибке на вызов
+        self.delivered = Counter()  # chat_id -> сколько sendMessage прошло успешно
+        self.files = {}  # file_id -> размер загруженного файла
+        self.uploaded_bytes = 0
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        app = web.Application(client_max_size=50 * 2**20)
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        app.router.add_get("/bot{token}/{method}", self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    def wait_for(self, method, count):
+        """Future, который завершится, когда method будет вызван count раз."""
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append((method, count, future))
+        self._check_waiters()
+        return future
+
+    def _check_waiters(self):
+        for item in list(self.waiters):
+            method, count, future = item
+            if self.calls[method] >= count and not future.done():
+                future.set_result(None)
+                self.waiters.remove(item)
+
+    async def _params(self, request):
+        if request.content_type == "multipart/form-data":
+            params = {}
+            async for part in await request.multipart():
+                data = await part.read()
+                params[part.name] = data if part.filename else data.decode()
+            return params
+        if request.can_read_body:
+            return dict(await request.post())
+        return dict(request.query)
+
+    async def handle(self, request):
+        method = request.match_info["method"]
+        params = await self._params(request)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        chat_id = int(params.get("chat_id") or 0)
+        if self.faults.get(chat_id):
+            code, description, retry_after = self.faults[chat_id].pop(0)
+            self.calls[method + ":error"] += 1
+            return error_response(code, description, retry_after)
+        media = MEDIA.get(method)
+        if media and params.get(media, "").startswith("attach://"):
+            # aiogram кладёт файл отдельной частью multipart, а в поле — ссылку на неё
+            params[media] = params.pop(params[media][len("attach://"):])
+        if media and isinstance(params.get(media), str) and params[media] not in self.files:
+            self.calls[method + ":error"] += 1
+            return error_response(400, "Bad Request: wrong file identifier/HTTP URL specified")
+        if method == "sendMessage":
+            self.delivered[chat_id] += 1
+        result = await self.result(method, params)
+        self.calls[method] += 1
+        self._check_waiters()
+        return web.json_response({"ok": True, "result": result})
+
+    async def result(self, method, params):
+        if method == "getMe":
+            return BOT_USER
+        if method == "getUpdates":
+            return await self._get_updates(float(params.get("timeout") or 0))
+        if method in ("sendMessage", "editMessageText"):
+            chat_id = int(params.get("chat_id") or 1)
+            if params.get("reply_markup"):
+                self.screens[chat_id] = json.loads(params["reply_markup"])
+            return message_result(chat_id, params.get("text", ""))
+        if method in MEDIA:
+            field = MEDIA[method]
+            data = params[field]
+            if isinstance(data, str):
+                return media_result(int(params["chat_id"]), field, data)  # отправка по file_id
+            # каждая загрузка — новый file_id, как у Telegram
+            file_id = f"{field}-{len(self.files) + 1}"
+            self.files[file_id] = len(data)
+            self.uploaded_bytes += len(data)
+            return media_result(int(params["chat_id"]), field, file_id)
+        return True
+
+    async def _get_updates(self, timeout):
+        batch = []
+        try:
+            batch.append(await asyncio.wait_for(self.updates.get(), timeout or 0.01))
+        except asyncio.TimeoutError:
+            return []
+        while not self.updates.empty() and len(batch) < 100:
+            batch.append(self.updates.get_nowait())
+        return batch
+
+
+def load_bot(api, **env):
+    """Импортирует makan с тестовым окружением и направляет бота на заглушку API."""
+    tmp = tempfile.mkdtemp(prefix="anatili-bench-")
+    os.environ.setdefault("BOT_TOKEN", BOT_TOKEN)
+    os.environ.setdefault("USER_STORE", "sqlite:" + os.path.join(tmp, "user_data.db"))
+    # всё, что бот пишет на диск, — во временный каталог, а не в корень репозитория
+    os.environ.setdefault("JOURNAL_DIR", os.path.join(tmp, "journal"))
+    os.environ.setdefault("BROADCAST_DB", os.path.join(tmp, "broadcast.db"))
+    # бенчмарки меряют сам бот, а не лимиты Telegram
+    os.environ.setdefault("TG_GLOBAL_RATE", "1e9")
+    os.environ.setdefault("TG_CHAT_RATE", "1e9")
+    for key, value in env.items():
+        os.environ[key] = str(value)
+    import makan
+
+    session = AiohttpSession(api=TelegramAPIServer.from_base(api.url))
+    session.middleware(makan.outbound)
+    session.middleware(ApiMetricsMiddleware())
+    makan.bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+    return makan
+
+
+class UpdateFactory:
+    def __init__(self):
+        self.ids = itertools.count(1)
+
+    def message(self, uid, text):
+        return {
+            "update_id": next(self.ids),
+            "message": {
+                "message_id": next(self.ids), "date": int(time.time()), "chat": chat(uid),
+                "from": user(uid), "text": text,
+                **({"entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]}
+                   if text.startswith("/") else {}),
+            },
+        }
+
+    def callback(self, uid, data):
+        return {
+            "update_id": next(self.ids),
+            "callback_query": {
+                "id": str(next(self.ids)), "chat_instance": str(uid), "data": data, "from": user(uid),
+                "message": {"message_id": 1, "date": int(time.time()), "chat": chat(uid), "text": "menu"},
+            },
+        }
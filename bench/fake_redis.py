@@ -0,0 +1,326 @@
+"""Локальная заглушка Redis (RESP2/RESP3) для бенчмарков: только команды, которые нужны RedisStore,
+RedisSeenUpdates, RedisLease и RedisDeliveryLog (строки, sorted set, hash), включая WATCH/MULTI/EXEC
+с проверкой изменённых ключей.
+
+    python -m bench.fake_redis [--port 6390]
+"""
+import time
+import asyncio
+import argparse
+import threading
+
+
+class Error(Exception):
+    pass
+
+
+class Map(dict):
+    pass
+
+
+class Pairs(list):
+    """Ответ WITHSCORES: в RESP3 — массив пар, в RESP2 — плоский список."""
+
+
+def encode(value, resp3=False):
+    if isinstance(value, Map):
+        if not resp3:
+            return encode([item for pair in value.items() for item in pair])
+        return f"%{len(value)}\r\n".encode() + b"".join(encode(k, resp3) + encode(v, resp3) for k, v in value.items())
+    if isinstance(value, Pairs) and not resp3:
+        return encode([item for pair in value for item in pair])
+    if value is None:
+        return b"_\r\n" if resp3 else b"$-1\r\n"
+    if isinstance(value, Error):
+        return f"-{value}\r\n".encode()
+    if value is True:
+        return b"+OK\r\n"
+    if isinstance(value, int):
+        return f":{value}\r\n".encode()
+    if isinstance(value, (list, tuple)):
+        return f"*{len(value)}\r\n".encode() + b"".join(encode(item, resp3) for item in value)
+    if isinstance(value, str):
+        value = value.encode()
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+async def read_command(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.decode().split()  # inline-команда (redis-cli, telnet)
+    args = []
+    for _ in range(int(line[1:])):
+        size = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(size + 2))[:-2].decode())
+    return args
+
+
+def _score_range(low, high):
+    def bound(text):
+        exclusive = text.startswith("(")
+        return float(text.lstrip("(")), exclusive
+
+    (lo, lo_ex), (hi, hi_ex) = bound(low), bound(high)
+    return lambda s: (s > lo if lo_ex else s >= lo) and (s < hi if hi_ex else s <= hi)
+
+
+class FakeRedis:
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.data = {}  # ключ -> str | {член: оценка} | {поле: значение}
+        self.expires = {}
+        self.versions = {}  # ключ -> номер изменения, для WATCH
+        self.clock = 0
+        self.server = None
+        self.commands = 0
+
+    @property
+    def url(self):
+        return f"redis://{self.host}:{self.port}/0"
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.serve, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def _touch(self, key):
+        self.clock += 1
+        self.versions[key] = self.clock
+
+    def _alive(self, key):
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.data.pop(key, None)
+            del self.expires[key]
+            self._touch(key)
+        return key in self.data
+
+    async def serve(self, reader, writer):
+        conn = {"watched": {}, "queue": None, "resp3": False}
+        try:
+            while True:
+                args = await read_command(reader)
+                if args is None:
+                    break
+                writer.write(encode(self.execute(conn, args), conn["resp3"]))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def execute(self, conn, args):
+        self.commands += 1
+        name = args[0].upper()
+        if conn["queue"] is not None and name not in ("EXEC", "DISCARD", "MULTI", "WATCH"):
+            conn["queue"].append(args)
+            return "QUEUED"
+        if name == "MULTI":
+            conn["queue"] = []
+            return True
+        if name == "DISCARD":
+            conn["queue"] = None
+            conn["watched"] = {}
+            return True
+        if name == "EXEC":
+            queue, conn["queue"] = conn["queue"] or [], None
+            watched, conn["watched"] = conn["watched"], {}
+            if any(self.versions.get(key, 0) != version for key, version in watched.items()):
+                return None  # ключ изменился после WATCH — транзакция отменена
+            return [self.run(cmd) for cmd in queue]
+        if name == "WATCH":
+            for key in args[1:]:
+                self._alive(key)
+                conn["watched"][key] = self.versions.get(key, 0)
+            return True
+        if name == "HELLO":
+            conn["resp3"] = args[1:2] == ["3"]
+        if name == "UNWATCH":
+            conn["watched"] = {}
+            return True
+        return self.run(args)
+
+    def run(self, args):
+        name, args = args[0].upper(), args[1:]
+        try:
+            handler = getattr(self, "cmd_" + name.lower())
+        except AttributeError:
+            return Error(f"ERR unknown command '{name}'")
+        try:
+            return handler(*args)
+        except (TypeError, ValueError):
+            return Error(f"ERR wrong arguments for '{name}'")
+
+    # === команды ===
+    def cmd_ping(self, message=None):
+        return message or "PONG"
+
+    def cmd_hello(self, protocol="2", *args):
+        # после HELLO 3 меняется только запись null; массивы и строки в RESP3 те же
+        return Map({"server": "fake-redis", "version": "7.2.0", "proto": int(protocol), "mode": "standalone"})
+
+    def cmd_select(self, db):
+        return True
+
+    def cmd_client(self, *args):
+        return True
+
+    def cmd_get(self, key):
+        return self.data.get(key) if self._alive(key) else None
+
+    def cmd_mget(self, *keys):
+        return [self.cmd_get(key) for key in keys]
+
+    def cmd_set(self, key, value, *options):
+        options = [o.upper() for o in options]
+        if "NX" in options and self._alive(key):
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if "EX" in options:
+            self.expires[key] = time.monotonic() + int(options[options.index("EX") + 1])
+        self._touch(key)
+        return True
+
+    def cmd_expire(self, key, seconds):
+        if not self._alive(key):
+            return 0
+        self.expires[key] = time.monotonic() + int(seconds)
+        return 1
+
+    def cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._alive(key):
+                del self.data[key]
+                self.expires.pop(key, None)
+                self._touch(key)
+                removed += 1
+        return removed
+
+    def cmd_zadd(self, key, *pairs):
+        zset = self.data.setdefault(key, {})
+        added = 0
+        for score, member in zip(pairs[::2], pairs[1::2]):
+            added += member not in zset
+            zset[member] = float(score)
+        self._touch(key)
+        return added
+
+    def cmd_zrem(self, key, *members):
+        zset = self.data.get(key, {})
+        removed = sum(zset.pop(m, None) is not None for m in members)
+        if removed:
+            self._touch(key)
+        return removed
+
+    def cmd_zcard(self, key):
+        return len(self.data.get(key, {}))
+
+    def cmd_zcount(self, key, low, high):
+        inside = _score_range(low, high)
+        return sum(1 for score in self.data.get(key, {}).values() if inside(score))
+
+    def cmd_zrevrangebyscore(self, key, high, low, *options):
+        inside = _score_range(low, high)
+        members = sorted(((score, m) for m, score in self.data.get(key, {}).items() if inside(score)), reverse=True)
+        upper = [o.upper() for o in options]
+        if "LIMIT" in upper:
+            at = upper.index("LIMIT")
+            offset, count = int(options[at + 1]), int(options[at + 2])
+            members = members[offset:offset + count if count >= 0 else None]
+        if "WITHSCORES" in upper:
+            return Pairs([m, repr(score)] for score, m in members)
+        return [m for _, m in members]
+
+    def cmd_zrangebylex(self, key, low, high, *limit):
+        members = sorted(self.data.get(key, {}))
+
+        def above(m):
+            return low == "-" or (m > low[1:] if low[0] == "(" else m >= low[1:])
+
+        def below(m):
+            return high == "+" or (m < high[1:] if high[0] == "(" else m <= high[1:])
+
+        result = [m for m in members if above(m) and below(m)]
+        if limit:
+            offset, count = int(limit[1]), int(limit[2])
+            result = result[offset:offset + count if count >= 0 else None]
+        return result
+
+    def cmd_hset(self, key, *pairs):
+        if not pairs or len(pairs) % 2:
+            raise ValueError(pairs)
+        fields = self.data.setdefault(key, {})
+        added = 0
+        for field, value in zip(pairs[::2], pairs[1::2]):
+            added += field not in fields
+            fields[field] = value
+        self._touch(key)
+        return added
+
+    def cmd_hsetnx(self, key, field, value):
+        if field in self.data.get(key, {}):
+            return 0
+        return self.cmd_hset(key, field, value)
+
+    def cmd_hmget(self, key, *fields):
+        values = self.data.get(key, {}) if self._alive(key) else {}
+        return [values.get(field) for field in fields]
+
+    def cmd_hvals(self, key):
+        return list(self.data.get(key, {}).values()) if self._alive(key) else []
+
+    def cmd_hget(self, key, field):
+        return self.data.get(key, {}).get(field)
+
+    def cmd_hdel(self, key, *fields):
+        removed = 0
+        for field in fields:
+            if field in self.data.get(key, {}):
+                del self.data[key][field]
+                removed += 1
+        if removed:
+            self._touch(key)
+        return removed
+
+    def cmd_hgetall(self, key):
+        return Map(self.data.get(key, {}))
+
+    def cmd_dbsize(self):
+        return len(self.data)
+
+    def cmd_flushdb(self, *args):
+        for key in list(self.data):
+            self._touch(key)
+        self.data.clear()
+        self.expires.clear()
+        return True
+
+
+def serve_in_thread():
+    """Заглушка в отдельном потоке со своим event loop: для бенчмарков, где синхронный клиент Redis
+    вызывается из того же процесса (в том числе из потока event loop при импорте makan)."""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(FakeRedis().start(), loop).result()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    server = await FakeRedis(port=args.port).start()
+    print(f"listening on {server.url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
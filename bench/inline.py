@@ -0,0 +1,99 @@
+"""Inline-поиск по словарю на каждое нажатие клавиши: отсортированные массивы + bisect и кэш ответов
+против перебора всех записей.
+
+    python -m bench.inline [--words 1000 10000 100000] [--typed 300]
+
+Словарь синтетический (как в bench.quiz) плюс фразы из нескольких слов. Набор имитируется так:
+--typed случайных слов вводятся по букве, на каждую букву — запрос первой страницы (половина слов
+набирается без казахских букв). «cold» — первый раз (промах кэша), «cached» — тот же набор снова.
+Перебор нормализует каждую запись и проверяет начало формы и начало каждого слова.
+Проверка: страницы по next_offset для коротких префиксов дают ровно те же записи, что и перебор.
+"""
+import time
+import random
+import argparse
+
+import inline
+import search
+from content import Phrase
+from bench.quiz import vocabulary, percentile
+
+
+def phrases(n, words, rng):
+    return tuple(
+        Phrase(" ".join(rng.choice(words).kz for _ in range(rng.randint(2, 5))), rng.choice(words).ru)
+        for _ in range(n)
+    )
+
+
+def naive(entries, query, page):
+    prefix = inline.form(query)
+    found = []
+    for i, entry in enumerate(entries):
+        forms = (inline.form(entry.kz), inline.form(entry.ru))
+        if any(f.startswith(prefix) or f" {prefix}" in f for f in forms):
+            found.append(i)
+            if len(found) == page:
+                break
+    return found
+
+
+def typing(words, n, rng):
+    queries = []
+    for w in rng.sample(words, n):
+        text = w.kz.translate(search.FOLD) if rng.random() < 0.5 else w.kz
+        queries += [text[:i] for i in range(1, len(text) + 1)]
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--words", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--typed", type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"{'words':>7} {'entries':>8} {'build ms':>9} {'cold p50':>9} {'cold p99':>9} {'cached p50':>11} "
+          f"{'scan p50':>9}  (us per keystroke)")
+    for n in args.words:
+        rng = random.Random(n)
+        words = vocabulary(n, rng)
+        c = type("C", (), {"vocabulary": words, "phrases": phrases(n // 5, words, rng)})
+        start = time.perf_counter()
+        index = inline.build_index(c)
+        build = time.perf_counter() - start
+
+        queries = typing(words, args.typed, rng)
+        cold, cached, scan = [], [], []
+        for query in queries:
+            start = time.perf_counter()
+            index.answer(query)
+            cold.append(time.perf_counter() - start)
+        for query in queries:
+            start = time.perf_counter()
+            index.answer(query)
+            cached.append(time.perf_counter() - start)
+        for query in queries[:30]:
+            start = time.perf_counter()
+            naive(index.entries, query, index.page)
+            scan.append(time.perf_counter() - start)
+
+        # постраничная выдача не теряет и не повторяет записи
+        for query in ("а", "ба", "қа", "ка", "кітап ", "ru"):
+            pages, offset = [], ""
+            while True:
+                results, offset = index.answer(query, offset)
+                pages += [r.id for r in results]
+                if not offset:
+                    break
+            expected = naive(index.entries, query, len(index.entries))
+            expected = [f"{index.entries[i].kind[0]}{i}" for i in expected]
+            if sorted(pages) != sorted(expected) or len(set(pages)) != len(pages):
+                raise SystemExit(f"paging mismatch for {query!r}: {len(pages)} vs {len(expected)}")
+
+        print(f"{n:>7} {len(index.entries):>8} {build * 1000:>9.0f} {percentile(cold, 0.5):>9.1f} "
+              f"{percentile(cold, 0.99):>9.1f} {percentile(cached, 0.5):>11.1f} {percentile(scan, 0.5):>9.0f}")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
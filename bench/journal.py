@@ -0,0 +1,78 @@
+"""Журнал ответов: запись пачками с fsync против fsync на каждый ответ, свёртка сегментов
+и восстановление итогов при старте.
+
+    python -m bench.journal [--events 20000] [--users 2000] [--segment-kb 1024]
+
+Ответы идут потоком от --users пользователей; сравнивается, сколько ответов в секунду
+успевает записать журнал (Journal.record + фоновый flush) и наивная запись с fsync
+на каждую строку. Затем журнал закрывается без свёртки хвоста и открывается заново.
+"""
+import os
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+import journal
+
+
+def naive(path, events):
+    with open(os.path.join(path, "naive.log"), "ab") as f:
+        for at, uid, qid, ok in events:
+            f.write(f"{at}\t{uid}\tw\t{qid}\t{int(ok)}\t{10 if ok else 0}\n".encode())
+            f.flush()
+            os.fsync(f.fileno())
+
+
+async def batched(j, events, rate_yield=100):
+    j.start()
+    for n, (at, uid, qid, ok) in enumerate(events, 1):
+        j.record(uid, "w", qid, ok, 10 if ok else 0, at)
+        if n % rate_yield == 0:
+            await asyncio.sleep(0)  # хендлеры отдают управление на каждом запросе к Telegram
+    await j.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--segment-kb", type=int, default=1024)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    now = int(time.time())
+    events = [(now + i // 100, str(rng.randrange(args.users)), rng.randrange(300), rng.random() < 0.7)
+              for i in range(args.events)]
+    expected = sum(1 for e in events if e[1] == "0")
+
+    tmp = tempfile.mkdtemp(prefix="anatili-journal-")
+    start = time.perf_counter()
+    naive(tmp, events[:2000])
+    naive_rate = 2000 / (time.perf_counter() - start)
+
+    path = os.path.join(tmp, "journal")
+    j = journal.Journal(path, args.segment_kb * 1024, interval_ms=50)
+    start = time.perf_counter()
+    asyncio.run(batched(j, events))
+    batched_rate = args.events / (time.perf_counter() - start)
+    segments = j.segments()
+    j.close()
+    tail = sum(os.path.getsize(os.path.join(path, journal.segment_name(seq))) for seq in segments)
+
+    start = time.perf_counter()
+    j = journal.Journal(path, args.segment_kb * 1024)
+    restart = time.perf_counter() - start
+    stats = j.stats("0")
+    j.close()
+
+    print(f"naive fsync per answer: {naive_rate:>9.0f} answers/s")
+    print(f"batched journal:        {batched_rate:>9.0f} answers/s")
+    print(f"segments folded while running: {segments[0] - 1}, tail at shutdown: {tail / 1024:.0f} KB")
+    print(f"restart (snapshot + tail):     {restart * 1000:.1f} ms")
+    print(f"user 0 answers after restart:  {stats.answers} (expected {expected})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Рейтинг по XP: сортировка всего user_data на запрос против индекса leaderboard.Leaderboard
+(JsonStore) и таблицы scores в SqliteStore.
+
+    python -m bench.leaderboard [--users 1000 10000 100000] [--queries 200]
+
+На каждый запрос — топ-10 и место одного пользователя, между запросами по 10 начислений XP.
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+
+from leaderboard import Leaderboard
+from storage import SqliteStore
+
+
+def sorted_query(users, uid):
+    order = sorted(users, key=lambda u: (-users[u]["xp"], u))
+    return order[:10], order.index(uid) + 1
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="anatili-lb-")
+    print(f"{'users':>8} {'sort ms/query':>14} {'index us/query':>15} {'index us/update':>16} {'sqlite us/query':>16}")
+    for n in args.users:
+        users = {str(i): {"xp": random.randint(1, 5000)} for i in range(n)}
+        uids = list(users)
+        board = Leaderboard()
+        for uid, user in users.items():
+            board.set(uid, user["xp"])
+        gains = [(random.choice(uids), random.choice(uids)) for _ in range(args.queries * 10)]
+
+        start = time.perf_counter()
+        for q in range(args.queries):
+            for uid, _ in gains[q * 10:(q + 1) * 10]:
+                users[uid]["xp"] += 10
+            sorted_query(users, gains[q * 10][1])
+        sort_ms = (time.perf_counter() - start) / args.queries * 1000
+
+        update_time = query_time = 0.0
+        for q in range(args.queries):
+            start = time.perf_counter()
+            for uid, _ in gains[q * 10:(q + 1) * 10]:
+                board.set(uid, board.xp[uid] + 10)
+            update_time += time.perf_counter() - start
+            start = time.perf_counter()
+            board.top(10), board.rank(gains[q * 10][1])
+            query_time += time.perf_counter() - start
+
+        store = SqliteStore(os.path.join(tmp, f"lb-{n}.db"))
+        store.put_many(users)
+        sqlite_time = 0.0
+        for q in range(args.queries):
+            batch = {uid: users[uid] for uid, _ in gains[q * 10:(q + 1) * 10]}
+            for user in batch.values():
+                user["xp"] += 10
+            store.put_many(batch)
+            start = time.perf_counter()
+            store.top(None, 10), store.count_above(None, users[gains[q * 10][1]]["xp"])
+            sqlite_time += time.perf_counter() - start
+        store.close()
+        print(f"{n:>8} {sort_ms:>14.2f} {query_time / args.queries * 1e6:>15.1f} "
+              f"{update_time / (args.queries * 10) * 1e6:>16.1f} {sqlite_time / args.queries * 1e6:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
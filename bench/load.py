@@ -0,0 +1,101 @@
+"""Нагрузочный прогон хендлеров makan.py на синтетических сессиях учеников.
+
+    python -m bench.load [--users 200] [--steps 40] [--api-latency 0.0] [--think 0.0]
+
+Каждый пользователь шлёт /start и дальше нажимает кнопки из последней клавиатуры, которую
+ему прислал бот (заглушка Bot API её запоминает), с перевесом в сторону заданий: навигация
+по меню, тесты по словам и грамматике, чтение. Отчёт: p50/p95/p99 времени обработки апдейта
+(dp.feed_update, включая запросы к заглушке API) по маршрутам callback_data, updates/s и пиковый RSS.
+"""
+import time
+import random
+import asyncio
+import argparse
+import resource
+from collections import defaultdict
+
+from aiogram.types import Update
+
+from bench.fake_api import FakeBotAPI, UpdateFactory, load_bot
+
+# насколько охотнее пользователь жмёт кнопку маршрута с таким префиксом имени
+WEIGHTS = {
+    "task_": 6,
+    "menu_tasks": 3,
+    "reading_text": 2,
+    "grammar": 2,
+    "menu_back": 0.5,
+}
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+def choose_button(router, markup):
+    buttons = [b["callback_data"] for row in markup["inline_keyboard"] for b in row if b.get("callback_data")]
+    if not buttons:
+        return router.pack("menu_back")
+    names = [router.name_of(data) for data in buttons]
+    weights = [next((w for prefix, w in WEIGHTS.items() if name.startswith(prefix)), 1) for name in names]
+    return random.choices(buttons, weights)[0]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--steps", type=int, default=40, help="нажатий на пользователя после /start")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="задержка ответа заглушки API, с")
+    parser.add_argument("--think", type=float, default=0.0, help="пауза пользователя между нажатиями, с")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    api = await FakeBotAPI(latency=args.api_latency).start()
+    makan = load_bot(api)
+    if makan.writer:
+        makan.writer.start()
+    factory = UpdateFactory()
+    latencies = defaultdict(list)
+    errors = 0
+
+    async def feed(raw, label):
+        nonlocal errors
+        update = Update.model_validate(raw, context={"bot": makan.bot})
+        start = time.perf_counter()
+        try:
+            await makan.dp.feed_update(makan.bot, update)
+        except Exception:
+            errors += 1
+        latencies[label].append(time.perf_counter() - start)
+
+    async def session(uid):
+        await feed(factory.message(uid, "/start"), "/start")
+        for _ in range(args.steps):
+            if args.think:
+                await asyncio.sleep(random.uniform(0, 2 * args.think))
+            data = choose_button(makan.router, api.screens.get(uid, {"inline_keyboard": []}))
+            await feed(factory.callback(uid, data), makan.router.name_of(data))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session(uid) for uid in range(1, args.users + 1)))
+    elapsed = time.perf_counter() - start
+    if makan.writer:
+        await makan.writer.stop()
+
+    everything = [x for values in latencies.values() for x in values]
+    print(f"{args.users} users x {args.steps + 1} updates: {len(everything)} updates in {elapsed:.2f}s, "
+          f"{len(everything) / elapsed:.0f} updates/s, {errors} errors")
+    print(f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+    print(f"{'handler':<24} {'count':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for label, values in sorted(latencies.items(), key=lambda item: -len(item[1])) + [("all", everything)]:
+        print(f"{label:<24} {len(values):>7} {percentile(values, 0.5):>8.2f} "
+              f"{percentile(values, 0.95):>8.2f} {percentile(values, 0.99):>8.2f}")
+
+    await makan.bot.session.close()
+    await api.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
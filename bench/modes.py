@@ -0,0 +1,96 @@
+"""Пропускная способность long polling против webhook на локальной заглушке Bot API.
+
+    python -m bench.modes [--updates 5000] [--concurrency 64] [--api-latency 0.005]
+"""
+import time
+import random
+import asyncio
+import argparse
+
+import aiohttp
+from aiohttp import web
+
+from bench.fake_api import FakeBotAPI, UpdateFactory, load_bot
+
+SECRET = "bench-secret"
+TIMEOUT = 120  # с на обработку всех апдейтов одного режима
+NAVIGATION = [("menu_tasks",), ("menu_grammar",), ("grammar", 0), ("menu_reading",), ("reading_level", 0), ("menu_back",)]
+
+
+def make_updates(factory, router, n, users=500):
+    # одна фабрика на оба режима: update_id не повторяются, иначе дедупликация отбросит второй прогон
+    buttons = [router.pack(*button) for button in NAVIGATION]
+    return [factory.callback(random.randint(1, users), random.choice(buttons)) for _ in range(n)]
+
+
+async def bench_polling(api, makan, updates):
+    done = api.wait_for("answerCallbackQuery", api.calls["answerCallbackQuery"] + len(updates))
+    polling = asyncio.create_task(makan.dp.start_polling(makan.bot, handle_signals=False, polling_timeout=1))
+    start = time.perf_counter()
+    for update in updates:
+        api.updates.put_nowait(update)
+    await asyncio.wait_for(done, TIMEOUT)
+    elapsed = time.perf_counter() - start
+    await makan.dp.stop_polling()
+    await polling
+    return elapsed
+
+
+async def bench_webhook(api, makan, updates, concurrency):
+    makan.WEBHOOK_SECRET = SECRET
+    runner = web.AppRunner(makan.webhook_app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}{makan.WEBHOOK_PATH}"
+
+    done = api.wait_for("answerCallbackQuery", api.calls["answerCallbackQuery"] + len(updates))
+    queue = asyncio.Queue()
+    for update in updates:
+        queue.put_nowait(update)
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+
+    async def telegram(session):
+        while not queue.empty():
+            async with session.post(url, json=queue.get_nowait(), headers=headers) as resp:
+                assert resp.status == 200, resp.status
+
+    start = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(telegram(session) for _ in range(concurrency)))
+        acked = time.perf_counter() - start
+        await asyncio.wait_for(done, TIMEOUT)
+    elapsed = time.perf_counter() - start
+
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, json=updates[0], headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"}) as resp:
+            assert resp.status == 401, "webhook accepted a wrong secret token"
+    await runner.cleanup()
+    return elapsed, acked
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--api-latency", type=float, default=0.005, help="задержка ответа заглушки API, с")
+    args = parser.parse_args()
+
+    api = await FakeBotAPI(latency=args.api_latency).start()
+    makan = load_bot(api, FLUSH_INTERVAL_MS=500)
+    makan.writer.start()
+    factory = UpdateFactory()
+
+    elapsed = await bench_polling(api, makan, make_updates(factory, makan.router, args.updates))
+    print(f"polling: {args.updates / elapsed:8.0f} updates/s ({elapsed:.2f}s)")
+    elapsed, acked = await bench_webhook(api, makan, make_updates(factory, makan.router, args.updates), args.concurrency)
+    print(f"webhook: {args.updates / elapsed:8.0f} updates/s ({elapsed:.2f}s, all ACKed after {acked:.2f}s)")
+
+    await makan.writer.stop()
+    await makan.bot.session.close()
+    await api.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+"""Сборка вопроса по словарю: пулы, собранные при загрузке, против подбора вариантов перебором словаря.
+
+    python -m bench.quiz [--words 1000 10000 50000] [--rounds 2000]
+
+Словарь синтетический: слова разной длины с типичными окончаниями (-у/-ть у глаголов и т.п.).
+Перебор на каждый вопрос ищет слова с тем же окончанием и длиной и берёт из них случайные варианты.
+"""
+import time
+import random
+import argparse
+
+import quiz
+from content import Word
+
+KZ_ENDINGS = ["у", "лық", "шы", "ды", "ым", "ан", "ар", "ек"]
+RU_ENDINGS = ["ть", "ость", "ник", "ный", "ка", "ие", "ок", "а"]
+LETTERS = "абвгдежзиклмнопрстуфхцчшыэюяәіңғүұқөһ"
+
+
+def vocabulary(n, rng):
+    def word(endings):
+        return "".join(rng.choice(LETTERS) for _ in range(rng.randint(2, 9))) + rng.choice(endings)
+
+    return tuple(Word(word(KZ_ENDINGS), word(RU_ENDINGS), "", "", "") for _ in range(n))
+
+
+def naive(words, i, rng):
+    key = quiz.shape_keys(words[i].ru)[0]
+    similar = [j for j, w in enumerate(words) if j != i and quiz.shape_keys(w.ru)[0] == key]
+    if len(similar) < quiz.OPTIONS - 1:
+        similar = [j for j in range(len(words)) if j != i]
+    return rng.sample(similar, quiz.OPTIONS - 1)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--words", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    print(f"{'words':>7} {'build ms':>9} {'p50 us':>7} {'p99 us':>7} {'naive us':>9} {'same end':>9}")
+    for n in args.words:
+        words = vocabulary(n, rng)
+        start = time.perf_counter()
+        bank = quiz.QuizBank(words)
+        build = time.perf_counter() - start
+
+        latencies, same = [], 0
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            q = bank.generate(rng=rng)
+            latencies.append(time.perf_counter() - start)
+            texts = bank.ru if q.kind == quiz.KZ_RU else bank.kz
+            end = texts[q.word][-2:]
+            same += sum(texts[j][-2:] == end for j, _ in q.options) - 1
+        rounds = max(10, args.rounds * 1000 // n)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            naive(words, rng.randrange(n), rng)
+        naive_us = (time.perf_counter() - start) / rounds * 1e6
+        share = same / (args.rounds * (quiz.OPTIONS - 1))
+        print(f"{n:>7} {build * 1000:>9.1f} {percentile(latencies, 0.5):>7.1f} {percentile(latencies, 0.99):>7.1f} "
+              f"{naive_us:>9.0f} {share:>9.0%}")
+
+
+if __name__ == "__main__":
+    main()
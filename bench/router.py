@@ -0,0 +1,92 @@
+"""Стоимость выбора хендлера: цепочка F.data-фильтров aiogram против таблицы callbacks.CallbackRouter.
+
+    python -m bench.router [--handlers 10 50 200] [--updates 20000]
+
+Для каждого числа хендлеров строятся два диспетчера с пустыми хендлерами: в одном половина
+маршрутов — F.data == "name", половина — F.data.startswith("name|") с разбором split("|"), как
+было в makan.py; в другом — один хендлер, который отдаёт апдейт CallbackRouter. Апдейты
+равномерно распределены по всем кнопкам, время — dp.feed_update на апдейт, без сети.
+"""
+import time
+import random
+import asyncio
+import argparse
+
+from aiogram import Bot, Dispatcher, F
+from aiogram.types import Update
+
+from bench.fake_api import BOT_TOKEN, UpdateFactory
+from callbacks import CallbackRouter, CODES
+
+
+async def noop(call, *args):
+    pass
+
+
+def chain_dispatcher(n):
+    dp = Dispatcher()
+    buttons = []
+    for i in range(n):
+        name = f"route_{i}"
+        if i % 2:
+            async def handler(call, name=name):
+                _, idx, opt = call.data.split("|")
+                await noop(call, int(idx), int(opt))
+            dp.callback_query.register(handler, F.data.startswith(name + "|"))
+            buttons.append(f"{name}|12|3")
+        else:
+            dp.callback_query.register(noop, F.data == name)
+            buttons.append(name)
+    return dp, buttons
+
+
+def router_dispatcher(n):
+    dp = Dispatcher()
+    router = CallbackRouter(code_width=1 if n <= len(CODES) else 2)
+    buttons = []
+    for i in range(n):
+        code = CODES[i] if router.code_width == 1 else CODES[i // len(CODES)] + CODES[i % len(CODES)]
+        name = f"route_{i}"
+        if i % 2:
+            router.route(code, name, "idx", "opt")(noop)
+            buttons.append(router.pack(name, 12, 3))
+        else:
+            router.route(code, name)(noop)
+            buttons.append(router.pack(name))
+
+    @dp.callback_query()
+    async def on_callback(call):
+        await router.dispatch(call)
+    return dp, buttons
+
+
+async def measure(bot, dp, buttons, count):
+    factory = UpdateFactory()
+    updates = [Update.model_validate(factory.callback(1, random.choice(buttons)), context={"bot": bot})
+               for _ in range(count)]
+    start = time.perf_counter()
+    for update in updates:
+        await dp.feed_update(bot, update)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--handlers", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--updates", type=int, default=20000)
+    args = parser.parse_args()
+
+    bot = Bot(token=BOT_TOKEN)
+    print(f"{'handlers':>8} {'chain us/upd':>13} {'router us/upd':>14} {'max data B':>11}")
+    for n in args.handlers:
+        chain, chain_buttons = chain_dispatcher(n)
+        table, table_buttons = router_dispatcher(n)
+        chain_us = await measure(bot, chain, chain_buttons, args.updates)
+        table_us = await measure(bot, table, table_buttons, args.updates)
+        longest = max(len(data.encode()) for data in table_buttons)
+        print(f"{n:>8} {chain_us:>13.1f} {table_us:>14.1f} {longest:>11}")
+    await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
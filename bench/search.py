@@ -0,0 +1,61 @@
+"""Задержка /search: обратный индекс с триграммами против перебора всех текстов.
+
+    python -m bench.search [--scale 1 10 100] [--rounds 200]
+
+Документы — слова, фразы, грамматика и тексты для чтения из data/, размноженные в --scale раз.
+Запросы: точное слово, то же без казахских букв, начало слова, опечатка, несколько слов.
+Перебор — нормализация и поиск подстроки в каждом документе (без нечёткого совпадения).
+"""
+import os
+import time
+import random
+import argparse
+
+import search
+from content import ContentRegistry
+
+QUERIES = ["кітап", "китап", "мекте", "мектп", "отбасі", "септик жалгау", "менің күнім", "глагол", "абай"]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1e6
+
+
+def scan(docs, query):
+    words = search.tokens(query)
+    return [doc for doc in docs if all(word in search.normalize(doc.title + " " + doc.body) for word in words)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+    base = search.content_docs(ContentRegistry(data_dir).current)
+    print(f"{'scale':>6} {'docs':>6} {'terms':>7} {'build ms':>9} {'p50 us':>8} {'p99 us':>8} {'scan us':>9}")
+    for scale in args.scale:
+        docs = [search.Doc(d.kind, d.title, d.body, d.ref) for _ in range(scale) for d in base]
+        start = time.perf_counter()
+        index = search.SearchIndex(docs)
+        build = time.perf_counter() - start
+
+        latencies = []
+        for _ in range(args.rounds):
+            query = random.choice(QUERIES)
+            start = time.perf_counter()
+            index.search(query, 8)
+            latencies.append(time.perf_counter() - start)
+        rounds = max(1, args.rounds // scale)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            scan(docs, random.choice(QUERIES))
+        scan_us = (time.perf_counter() - start) / rounds * 1e6
+        print(f"{scale:>6} {len(docs):>6} {len(index.terms):>7} {build * 1000:>9.1f} "
+              f"{percentile(latencies, 0.5):>8.0f} {percentile(latencies, 0.99):>8.0f} {scan_us:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Стоимость выбора следующего вопроса из колоды интервальных повторений.
+
+    python -m bench.srs_select [--sizes 1000 10000 100000] [--picks 2000]
+
+Сравнивает кучу по сроку (srs.next_due + srs.record) с полным перебором items,
+плюс размер состояния колоды в JSON на один вопрос.
+"""
+import json
+import time
+import random
+import argparse
+
+import srs
+
+
+def build_deck(size, now):
+    d = srs.Deck({})
+    for qid in range(1, size + 1):
+        # история: часть вопросов уже просрочена, часть — в будущем
+        srs.record(d, qid, random.random() < 0.8, now - random.randint(0, 30 * srs.DAY))
+    return d
+
+
+def scan_due(d, now, valid):
+    best = None
+    for key, item in d["items"].items():
+        if int(key) in valid and item[0] <= now and (best is None or item[0] < best[0]):
+            best = (item[0], int(key))
+    return best[1] if best else None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--picks", type=int, default=2000)
+    args = parser.parse_args()
+
+    now = srs.now()
+    print(f"{'items':>8} {'heap us/pick':>13} {'scan us/pick':>13} {'json B/item':>12}")
+    for size in args.sizes:
+        valid = range(1, size + 1)
+        d = build_deck(size, now)
+        size_per_item = len(json.dumps(d, separators=(",", ":"))) / size
+
+        start = time.perf_counter()
+        for i in range(args.picks):
+            qid = srs.next_due(d, now + i, valid) or srs.earliest(d, valid)
+            srs.record(d, qid, random.random() < 0.8, now + i)
+        heap_us = (time.perf_counter() - start) / args.picks * 1e6
+
+        picks = max(1, args.picks // 50)
+        start = time.perf_counter()
+        for i in range(picks):
+            scan_due(d, now + i, valid)
+        scan_us = (time.perf_counter() - start) / picks * 1e6
+        print(f"{size:>8} {heap_us:>13.1f} {scan_us:>13.0f} {size_per_item:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Стресс-тест: тысячи одновременных тапов по ответам не должны терять или удваивать XP.
+
+    python -m bench.stress_taps [--users 100] [--taps 10] [--rounds 5]
+
+Каждый раунд каждый пользователь получает вопрос и жмёт правильный ответ --taps раз
+одновременно (users * taps параллельных апдейтов). Ожидаем ровно +10 XP за раунд.
+"""
+import asyncio
+import argparse
+
+from aiogram.types import Update
+
+from bench.fake_api import FakeBotAPI, UpdateFactory, load_bot
+
+
+async def hammer(makan, users, taps, rounds):
+    """rounds раз: вопрос каждому из users, затем taps одновременных правильных ответов на него.
+    Возвращает XP пользователей в памяти и в store."""
+    factory = UpdateFactory()
+
+    async def feed(update):
+        await makan.dp.feed_update(makan.bot, Update.model_validate(update, context={"bot": makan.bot}))
+
+    for _ in range(rounds):
+        await asyncio.gather(*(feed(factory.callback(uid, makan.router.pack("task_words"))) for uid in users))
+        updates = []
+        for uid in users:
+            pending = (await makan.get_user(str(uid)))["pending"]
+            q = makan.word_questions(makan.content.current).by_id[int(pending[1:])]
+            data = makan.router.pack("task_words_answer", q.id, q.correct)
+            updates += [factory.callback(uid, data) for _ in range(taps)]
+        await asyncio.gather(*(feed(update) for update in updates))
+
+    await makan.writer.stop()
+    memory = [(await makan.get_user(str(uid)))["xp"] for uid in users]
+    stored = [makan.store.get(str(uid))["xp"] for uid in users]
+    return memory, stored
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--taps", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    api = await FakeBotAPI(latency=0.002).start()
+    makan = load_bot(api, FLUSH_INTERVAL_MS=50)
+    makan.writer.start()
+    users = range(1, args.users + 1)
+    memory, stored = await hammer(makan, users, args.taps, args.rounds)
+    expected = 10 * args.rounds
+    bad = sum(xp != expected for xp in memory) + sum(xp != expected for xp in stored)
+    print(f"{args.rounds * args.users * args.taps} answer taps, expected {expected} XP per user")
+    print(f"total XP in memory {sum(memory)}, in store {sum(stored)}, expected {expected * args.users}")
+    print(f"idle lock entries left: {len(makan.user_locks.locks)}")
+    await makan.bot.session.close()
+    await api.stop()
+    if bad:
+        raise SystemExit(f"{bad} inconsistent user records")
+    print("OK")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+"""Сборка сообщений: шаблон + текст, экранированный при загрузке, против f-строки с html.escape
+на каждый запрос.
+
+    python -m bench.templates [--renders 200000]
+
+Сообщения — вопрос и ответ из тестов по словам и экран прогресса (только числа). Проверка:
+обе сборки дают одинаковый текст, и каждое сообщение из data/ проходит html_errors.
+"""
+import os
+import time
+import html
+import argparse
+
+import content
+import templates
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+
+def naive_question(q):
+    return f"🧩 <b>{html.escape(q.question, quote=False)}</b>"
+
+
+def naive_right(answer, xp):
+    return f"✅ Дұрыс! <b>{html.escape(answer, quote=False)}</b> (+{xp} XP)"
+
+
+def naive_progress(d):
+    return (f"📊 <b>Сенің нәтижелерің:</b>\n\n"
+            f"🏆 Ұпай: {d['score']}\n🔥 XP: {d['xp']}\n{html.escape(d['bar'], quote=False)}\n"
+            f"📈 Деңгей: {d['level']}\n\n🗓 Апта орны: {d['rank']}\n🌍 Жалпы орын: {d['rank']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--renders", type=int, default=200000)
+    args = parser.parse_args()
+
+    c = content.Content(0, content.compile_sources(content.read_sources(DATA_DIR)))
+    start = time.perf_counter()
+    t = templates.escape_content(c)
+    escape_ms = (time.perf_counter() - start) * 1000
+    questions = c.words
+    d = {"score": 420, "xp": 1230, "bar": "🟩🟩🟩⬜⬜", "level": 3, "rank": "12 / 350"}
+
+    def naive(i):
+        q = questions[i % len(questions)]
+        return naive_question(q), naive_right(q.options[q.correct], 10), naive_progress(d)
+
+    def template(i):
+        q = questions[i % len(questions)]
+        return (templates.WORD_QUESTION.render(question=t[q.question]),
+                templates.RIGHT.render(answer=t[q.options[q.correct]], xp=10),
+                templates.PROGRESS.render(score=d["score"], xp=d["xp"], bar=d["bar"], level=d["level"], answers="",
+                                          week_rank=d["rank"], total_rank=d["rank"]))
+
+    for i in range(len(questions)):
+        if naive(i) != template(i):
+            raise SystemExit(f"render mismatch: {naive(i)!r} vs {template(i)!r}")
+
+    print(f"{len(t)} content strings escaped at load in {escape_ms:.1f} ms; {args.renders} renders of 3 messages")
+    for label, build in (("f-string + html.escape", naive), ("template + escaped content", template)):
+        start = time.perf_counter()
+        for i in range(args.renders):
+            build(i)
+        elapsed = time.perf_counter() - start
+        print(f"{label:28}{elapsed:>7.2f}s{elapsed / args.renders * 1e6:>7.2f} us/request")
+
+    failed = [f"{where}: {error}" for where, message in templates.content_messages(c)
+              for error in templates.html_errors(message)]
+    if failed:
+        raise SystemExit("\n".join(failed))
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Память процесса в зависимости от числа пользователей в store: все записи в памяти
+(прежний load_all) против UserCache с ограниченным размером.
+
+    python -m bench.user_cache [--users 10000 100000 300000] [--cache 5000] [--active 20000]
+
+Во временной SQLite-базе создаётся --users записей, похожих на настоящие (битовые маски,
+колода повторений на пару десятков вопросов). Каждый режим запускается в отдельном процессе:
+  all        — store.load_all(), как было до кэша
+  cache      — --active обращений к случайным пользователям через UserCache(max_size=--cache)
+  cache+lb   — то же плюс рейтинг Leaderboards(store) с топом и местом, как при старте бота
+Печатается прирост RSS (Linux, /proc/self/statm), время и счётчики кэша.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import tempfile
+import subprocess
+
+from storage import SqliteStore, UserCache
+from leaderboard import Leaderboards
+
+MODES = ("all", "cache", "cache+lb")
+
+
+def record(rng):
+    items = {str(q): [1700000000 + rng.randrange(10 ** 6), 86400, 250, 2] for q in rng.sample(range(200), 20)}
+    return {
+        "words_done": format(rng.getrandbits(200), "x"),
+        "grammar_done": format(rng.getrandbits(100), "x"),
+        "used_reading": {"1": [0, 1, 2]},
+        "score": rng.randrange(100),
+        "xp": rng.randrange(5000),
+        "name": "user",
+        "srs": {"w": {"items": items}},
+    }
+
+
+def populate(path, n):
+    store = SqliteStore(path)
+    rng = random.Random(1)
+    for start in range(0, n, 10000):
+        store.put_many({f"{uid:09d}": record(rng) for uid in range(start, min(n, start + 10000))})
+    store.close()
+
+
+def rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize()
+
+
+def worker(mode, path, n, cache_size, active):
+    store = SqliteStore(path)
+    before = rss()
+    start = time.perf_counter()
+    stats = {}
+    if mode == "all":
+        data = store.load_all()
+        assert len(data) == n
+    else:
+        if mode == "cache+lb":
+            board = Leaderboards(store).board(weekly=False)
+            assert len(board) > 0 and board.top(10)
+        users = UserCache(store, max_size=cache_size)
+        rng = random.Random(2)
+        for _ in range(active):
+            assert users.get(f"{rng.randrange(n):09d}") is not None
+        stats = {"hits": users.hits, "misses": users.misses, "evictions": users.evictions}
+    print(json.dumps({"ms": (time.perf_counter() - start) * 1000, "rss": rss() - before, **stats}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, nargs="+", default=[10000, 100000, 300000])
+    parser.add_argument("--cache", type=int, default=5000)
+    parser.add_argument("--active", type=int, default=20000)
+    parser.add_argument("--worker", nargs=5, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        mode, path, n, cache_size, active = args.worker
+        worker(mode, path, int(n), int(cache_size), int(active))
+        return
+
+    tmp = tempfile.mkdtemp(prefix="anatili-users-")
+    print(f"{'users':>7} {'mode':>9} {'ms':>8} {'RSS +MB':>8} {'hits':>6} {'misses':>7} {'evicted':>8}")
+    for n in args.users:
+        path = os.path.join(tmp, f"users-{n}.db")
+        populate(path, n)
+        for mode in MODES:
+            out = subprocess.run(
+                [sys.executable, "-m", "bench.user_cache", "--worker", mode, path, str(n), str(args.cache),
+                 str(args.active)],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            r = json.loads(out)
+            print(f"{n:>7} {mode:>9} {r['ms']:>8.0f} {r['rss'] / 2 ** 20:>8.1f} {r.get('hits', '-'):>6} "
+                  f"{r.get('misses', '-'):>7} {r.get('evictions', '-'):>8}")
+
+
+if __name__ == "__main__":
+    main()
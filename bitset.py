@@ -0,0 +1,59 @@
+import random
+
+# Пройденные вопросы хранятся у пользователя битовой маской по числовому id вопроса,
+# в записи — hex-строкой (большие int в JSON упираются в лимит длины десятичных строк).
+
+
+def get_bits(user, key):
+    return int(user.get(key) or "0", 16)
+
+
+def set_bits(user, key, bits):
+    user[key] = format(bits, "x")
+
+
+def mark(user, key, qid):
+    set_bits(user, key, get_bits(user, key) | (1 << qid))
+
+
+class QuestionSet:
+    """Вопросы одного раздела, проиндексированные по стабильному id."""
+
+    def __init__(self, questions):
+        self.questions = questions
+        self.by_id = {q.id: q for q in questions}
+        self.ids = tuple(self.by_id)
+        self.mask = 0
+        for qid in self.ids:
+            self.mask |= 1 << qid
+        self.ids_by_text = {}
+        for q in questions:
+            self.ids_by_text.setdefault(q.question, []).append(q.id)
+
+    def pick_unanswered(self, bits, tries=8):
+        free = self.mask & ~bits
+        if not free:
+            return None
+        # пока пройдено немного, случайная проба почти всегда попадает в свободный вопрос
+        for _ in range(tries):
+            qid = random.choice(self.ids)
+            if not bits >> qid & 1:
+                return qid
+        # иначе берём случайный из оставшихся битов
+        s = format(free, "b")[::-1]
+        pos = -1
+        for _ in range(random.randrange(free.bit_count()) + 1):
+            pos = s.find("1", pos + 1)
+        return pos
+
+    def migrate(self, user, list_key, bits_key):
+        """Переводит старый список текстов вопросов в битовую маску."""
+        texts = user.pop(list_key, None)
+        if texts is None:
+            return False
+        bits = get_bits(user, bits_key)
+        for text in texts:
+            for qid in self.ids_by_text.get(text, ()):
+                bits |= 1 << qid
+        set_bits(user, bits_key, bits)
+        return True
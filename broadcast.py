@@ -0,0 +1,314 @@
+import time
+import asyncio
+import logging
+import sqlite3
+import datetime
+import threading
+import contextlib
+from collections import Counter
+
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError, TelegramRetryAfter
+
+import templates
+from sender import TokenBucket
+
+log = logging.getLogger(__name__)
+
+
+def daily_phrase(c, day):
+    """Фраза дня: одна и та же для всех получателей и при повторном запуске в тот же день."""
+    pool = c.phrases or c.quotes
+    if not pool:
+        return None
+    return pool[day.toordinal() % len(pool)].kz
+
+
+# === Журнал рассылок: курсор по uid и статус доставки каждому получателю ===
+class DeliveryLog:
+    """Вызывается из потоков executor: запись идёт пачками, по транзакции на пачку получателей."""
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "run_id TEXT PRIMARY KEY, text TEXT NOT NULL, cursor TEXT NOT NULL DEFAULT '', "
+            "started REAL NOT NULL, finished REAL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS deliveries ("
+            "run_id TEXT NOT NULL, uid TEXT NOT NULL, status TEXT NOT NULL, error TEXT, at REAL NOT NULL, "
+            "PRIMARY KEY (run_id, uid))"
+        )
+
+    def open_run(self, run_id, text):
+        """(text, cursor, finished) рассылки; новая создаётся, у начатой берётся сохранённый текст."""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, text, started) VALUES (?, ?, ?)", (run_id, text, time.time())
+            )
+            return self.conn.execute("SELECT text, cursor, finished FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+
+    def done(self, run_id, uids):
+        """Из uids — кому уже отправлено, кто заблокировал бота или чей запрос оборвался ("sending")."""
+        marks = ",".join("?" * len(uids))
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT uid FROM deliveries WHERE run_id = ? AND status != 'failed' AND uid IN ({marks})",
+                (run_id, *uids),
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def failed(self, run_id, after, limit):
+        """Получатели со статусом "failed" (429, 5xx, сеть) по порядку uid — для повторной попытки."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT uid FROM deliveries WHERE run_id = ? AND status = 'failed' AND uid > ? ORDER BY uid LIMIT ?",
+                (run_id, after, limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def record(self, run_id, rows, cursor=None):
+        """rows — [(uid, status, error)] одной транзакцией, вместе с курсором, если он передан."""
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO deliveries (run_id, uid, status, error, at) VALUES (?, ?, ?, ?, ?)",
+                    [(run_id, uid, status, error, now) for uid, status, error in rows],
+                )
+                if cursor is not None:
+                    self.conn.execute("UPDATE runs SET cursor = ? WHERE run_id = ?", (cursor, run_id))
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def finish(self, run_id):
+        with self.lock:
+            self.conn.execute("UPDATE runs SET finished = ? WHERE run_id = ?", (time.time(), run_id))
+
+    def stats(self, run_id):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT status, COUNT(*) FROM deliveries WHERE run_id = ? GROUP BY status", (run_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class RedisDeliveryLog:
+    """То же в Redis, общее для всех процессов бота: рассылку, начатую одним процессом,
+    доделывает другой, если первый умер. Ключи рассылки живут ttl секунд после завершения.
+
+    <prefix>broadcast:<run_id> — hash text/cursor/started/finished, ...:status — hash uid -> статус,
+    ...:errors — hash uid -> ошибка, ...:failed — sorted set uid со статусом "failed" (по порядку uid).
+    """
+
+    def __init__(self, client, prefix="anatili:", ttl=7 * 86400):
+        self.client = client
+        self.prefix = prefix + "broadcast:"
+        self.ttl = ttl
+
+    def _keys(self, run_id):
+        run = self.prefix + run_id
+        return run, run + ":status", run + ":errors", run + ":failed"
+
+    def open_run(self, run_id, text):
+        run = self._keys(run_id)[0]
+        with self.client.pipeline() as pipe:
+            pipe.hsetnx(run, "text", text)
+            pipe.hsetnx(run, "started", time.time())
+            pipe.hmget(run, ["text", "cursor", "finished"])
+            text, cursor, finished = pipe.execute()[-1]
+        return text, cursor or "", float(finished) if finished else None
+
+    def done(self, run_id, uids):
+        statuses = self.client.hmget(self._keys(run_id)[1], uids)
+        return {uid for uid, status in zip(uids, statuses) if status and status != "failed"}
+
+    def failed(self, run_id, after, limit):
+        return self.client.zrangebylex(self._keys(run_id)[3], f"({after}" if after else "-", "+", start=0, num=limit)
+
+    def record(self, run_id, rows, cursor=None):
+        run, status, errors, failed = self._keys(run_id)
+        with self.client.pipeline() as pipe:
+            if rows:
+                pipe.hset(status, mapping={uid: state for uid, state, _ in rows})
+                if any(error for _, _, error in rows):
+                    pipe.hset(errors, mapping={uid: error for uid, _, error in rows if error})
+                if any(state == "failed" for _, state, _ in rows):
+                    pipe.zadd(failed, {uid: 0 for uid, state, _ in rows if state == "failed"})
+                if any(state != "failed" for _, state, _ in rows):
+                    pipe.zrem(failed, *(uid for uid, state, _ in rows if state != "failed"))
+            if cursor is not None:
+                pipe.hset(run, "cursor", cursor)
+            pipe.execute()
+
+    def finish(self, run_id):
+        keys = self._keys(run_id)
+        with self.client.pipeline() as pipe:
+            pipe.hset(keys[0], "finished", time.time())
+            for key in keys:
+                pipe.expire(key, self.ttl)
+            pipe.execute()
+
+    def stats(self, run_id):
+        return dict(Counter(self.client.hvals(self._keys(run_id)[1])))
+
+    def close(self):
+        pass  # клиент принадлежит RedisStore
+
+
+# === Рассылка ===
+class Broadcast:
+    """Рассылает текст всем пользователям из store пачками по uid.
+
+    Не больше concurrency запросов одновременно и не быстрее rate сообщений в секунду (запас
+    до общего лимита Telegram остаётся на ответы в чатах). Доставка не больше одного раза:
+    получатель отмечается "sending" до запроса, и при продолжении упавшей рассылки такие
+    получатели пропускаются. Отметки идут порциями по concurrency получателей, вместе со
+    статусами предыдущих — одна транзакция в executor на порцию; курсор пишется после каждой
+    пачки, так что упавшая рассылка продолжается с того же места. Временные ошибки ("failed":
+    429 после всех повторов, 5xx, сеть) повторяются до retries раз после основного прохода,
+    в том числе после перезапуска.
+    """
+
+    def __init__(self, bot, store, deliveries, rate=20, concurrency=10, batch=500, parse_mode="HTML", retries=2):
+        self.bot = bot
+        self.store = store
+        self.deliveries = deliveries
+        self.bucket = TokenBucket(rate, rate)
+        self.concurrency = concurrency
+        self.batch = batch
+        self.parse_mode = parse_mode
+        self.retries = retries
+
+    async def _send(self, uid, text):
+        await self.bucket.acquire()
+        try:
+            await self.bot.send_message(int(uid), text, parse_mode=self.parse_mode)
+        except TelegramForbiddenError as e:
+            # пользователь заблокировал бота
+            return uid, "blocked", e.message
+        except TelegramRetryAfter as e:
+            # OutboundLimiter уже исчерпал повторы: притормаживаем всю рассылку
+            self.bucket.pause(e.retry_after)
+            return uid, "failed", e.message
+        except (TelegramAPIError, ValueError) as e:
+            return uid, "failed", str(e)
+        return uid, "sent", None
+
+    async def _deliver(self, run_id, uids, text, counts, cursor=None):
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.concurrency)
+        finished, tasks = [], set()
+
+        async def send(uid):
+            try:
+                row = await self._send(uid, text)
+                counts[row[1]] += 1
+                finished.append(row)
+            finally:
+                slots.release()
+
+        try:
+            for start in range(0, len(uids), self.concurrency):
+                chunk = uids[start:start + self.concurrency]
+                rows, finished[:] = finished[:], []
+                # отмечаем до отправки: если процесс умрёт посреди запроса, повторно не шлём
+                rows += [(uid, "sending", None) for uid in chunk]
+                await loop.run_in_executor(None, self.deliveries.record, run_id, rows)
+                for uid in chunk:
+                    await slots.acquire()
+                    task = asyncio.create_task(send(uid))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        await loop.run_in_executor(None, self.deliveries.record, run_id, finished, cursor)
+
+    async def run(self, run_id, text):
+        loop = asyncio.get_running_loop()
+        text, cursor, finished = await loop.run_in_executor(None, self.deliveries.open_run, run_id, text)
+        if finished:
+            return await self.report(run_id, Counter(), 0.0)
+        if cursor:
+            log.info("broadcast %s: resuming after uid %s", run_id, cursor)
+        counts = Counter()
+        start = time.monotonic()
+        while True:
+            uids = await loop.run_in_executor(None, self.store.uids_after, cursor, self.batch)
+            if not uids:
+                break
+            done = await loop.run_in_executor(None, self.deliveries.done, run_id, uids)
+            counts["skipped"] += len(done)
+            cursor = uids[-1]
+            await self._deliver(run_id, [uid for uid in uids if uid not in done], text, counts, cursor)
+            log.info("broadcast %s: %s", run_id, dict(counts))
+        for attempt in range(self.retries):
+            after, retried = "", 0
+            while True:
+                uids = await loop.run_in_executor(None, self.deliveries.failed, run_id, after, self.batch)
+                if not uids:
+                    break
+                after = uids[-1]
+                retried += len(uids)
+                await self._deliver(run_id, uids, text, counts)
+            if not retried:
+                break
+            counts["retried"] += retried
+            log.info("broadcast %s: retried %d failed deliveries", run_id, retried)
+        await loop.run_in_executor(None, self.deliveries.finish, run_id)
+        return await self.report(run_id, counts, time.monotonic() - start)
+
+    async def report(self, run_id, counts, seconds):
+        attempted = counts["sent"] + counts["blocked"] + counts["failed"]
+        return {
+            "run_id": run_id,
+            **{key: counts[key] for key in ("sent", "blocked", "failed", "retried", "skipped")},
+            "seconds": round(seconds, 2),
+            "per_second": round(attempted / seconds, 1) if seconds else 0.0,
+            "total": await asyncio.get_running_loop().run_in_executor(None, self.deliveries.stats, run_id),
+        }
+
+
+async def run_daily(broadcast, content, at, now=datetime.datetime.now, lease=None):
+    """Каждый день в at ("ЧЧ:ММ") рассылает фразу дня; после перезапуска доделывает сегодняшнюю.
+
+    С lease (несколько процессов на общем store) рассылку ведёт тот, кому досталась аренда;
+    остальные ждут и, получив аренду, видят законченную рассылку или продолжают её с курсора.
+    """
+    hour, minute = map(int, at.split(":"))
+    while True:
+        current = now()
+        target = current.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if current < target:
+            await asyncio.sleep((target - current).total_seconds())
+            continue
+        day = current.date()
+        run_id = f"phrase-{day.isoformat()}"
+        phrase = daily_phrase(content.current, day)
+        if phrase:
+            try:
+                async with lease.hold() if lease else contextlib.nullcontext(True) as held:
+                    if held:
+                        report = await broadcast.run(run_id, templates.DAILY_PHRASE.render(phrase=phrase))
+                        log.info("broadcast %s: %s", run_id, report)
+                if not held:
+                    log.info("broadcast %s is running in another process", run_id)
+                    await asyncio.sleep(60)
+                    continue
+            except Exception:
+                log.exception("broadcast %s failed, will resume", run_id)
+                await asyncio.sleep(60)
+                continue
+        await asyncio.sleep(max(1.0, (target + datetime.timedelta(days=1) - now()).total_seconds()))
@@ -0,0 +1,140 @@
+import base64
+import logging
+
+log = logging.getLogger(__name__)
+
+# callback_data = код маршрута (заглавные буквы и цифры, фиксированной длины) + base64url(varint-поля).
+# Старый формат "name|1|2" (строчные имена) ещё разбирается, чтобы работали кнопки в уже
+# отправленных сообщениях.
+CODES = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+MAX_CALLBACK_BYTES = 64
+
+
+def _varints(values):
+    out = bytearray()
+    for value in values:
+        if value < 0:
+            raise ValueError(f"negative callback field: {value}")
+        while value > 0x7F:
+            out.append(value & 0x7F | 0x80)
+            value >>= 7
+        out.append(value)
+    return bytes(out)
+
+
+def _read_varints(raw):
+    values, value, shift = [], 0, 0
+    for byte in raw:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            if shift > 63:
+                raise ValueError("callback field too long")
+        else:
+            values.append(value)
+            value, shift = 0, 0
+    if shift:
+        raise ValueError("truncated callback field")
+    return values
+
+
+class StaleCallback(Exception):
+    """Номер из кнопки больше не существует: контент перезагружен или callback_data подделана."""
+
+
+def checked(items, index):
+    """items[index] для номера из callback_data (поля неотрицательны) или StaleCallback."""
+    if index >= len(items):
+        raise StaleCallback(f"index {index} out of range {len(items)}")
+    return items[index]
+
+
+class Route:
+    __slots__ = ("code", "name", "fields", "optional", "handler", "lock")
+
+    def __init__(self, code, name, fields, optional, handler, lock):
+        self.code = code
+        self.name = name
+        self.fields = fields
+        self.optional = optional
+        self.handler = handler
+        self.lock = lock
+
+    def validate(self, args):
+        required = len(self.fields) - self.optional
+        if not required <= len(args) <= len(self.fields):
+            raise ValueError(f"{self.name}: expected {required}..{len(self.fields)} fields, got {len(args)}")
+        return args
+
+
+class CallbackRouter:
+    """Все callback-кнопки бота: один поиск маршрута по первому символу вместо цепочки фильтров."""
+
+    def __init__(self, locks=None, code_width=1, stale_text=None):
+        self.routes = {}  # код -> Route
+        self.by_name = {}
+        self.locks = locks
+        self.code_width = code_width  # 1 символ — до 36 маршрутов
+        self.stale_text = stale_text  # ответ на кнопку, номер в которой уже не существует
+
+    def route(self, code, name, *fields, optional=0, lock=False):
+        """Регистрирует handler(call, *fields); последние optional полей можно не передавать."""
+        if len(code) != self.code_width or any(ch not in CODES for ch in code) or code in self.routes:
+            raise ValueError(f"bad or duplicate route code {code!r}")
+        if name in self.by_name:
+            raise ValueError(f"duplicate route name {name!r}")
+
+        def register(handler):
+            route = Route(code, name, fields, optional, handler, lock)
+            self.routes[code] = route
+            self.by_name[name] = route
+            return handler
+        return register
+
+    def pack(self, name, *args):
+        route = self.by_name[name]
+        route.validate(args)
+        data = route.code + base64.urlsafe_b64encode(_varints(args)).decode().rstrip("=")
+        if len(data.encode()) > MAX_CALLBACK_BYTES:
+            raise ValueError(f"callback_data for {name} is longer than {MAX_CALLBACK_BYTES} bytes")
+        return data
+
+    def unpack(self, data):
+        """(Route, поля) или ValueError для неизвестных и битых данных."""
+        if not data:
+            raise ValueError("empty callback data")
+        route = self.routes.get(data[:self.code_width])
+        if route is not None and "|" not in data:
+            payload = data[self.code_width:]
+            raw = base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4))
+            return route, route.validate(tuple(_read_varints(raw)))
+        # старый формат
+        name, *args = data.split("|")
+        route = self.by_name.get(name)
+        if route is None:
+            raise ValueError(f"unknown callback {name!r}")
+        return route, route.validate(tuple(int(arg) for arg in args))
+
+    def name_of(self, data):
+        route = self.routes.get(data[:self.code_width])
+        if route is not None and "|" not in data:
+            return route.name
+        name = data.split("|")[0]
+        return name if name in self.by_name else "unknown"
+
+    async def dispatch(self, call):
+        try:
+            route, args = self.unpack(call.data or "")
+        except (ValueError, TypeError) as e:
+            log.info("bad callback data %r: %s", call.data, e)
+            await call.answer()
+            return
+        try:
+            if route.lock and self.locks is not None:
+                async with self.locks.hold(call.from_user.id):
+                    return await route.handler(call, *args)
+            return await route.handler(call, *args)
+        except StaleCallback as e:
+            # остальные ошибки обработчика — баги, они уходят дальше в aiogram
+            log.info("stale callback %r: %r", call.data, e)
+            await call.answer(self.stale_text)
@@ -0,0 +1,167 @@
+import uuid
+import random
+import asyncio
+import logging
+import contextlib
+from collections import OrderedDict
+
+from aiogram import BaseMiddleware
+
+from storage import VersionConflict
+
+log = logging.getLogger(__name__)
+
+# Несколько процессов бота за одним вебхуком: Telegram может доставить апдейт повторно
+# (таймаут ответа, перезапуск процесса), и он попадёт в другой процесс.
+
+
+class SeenUpdates:
+    """update_id, уже взятые в обработку этим процессом (последние max_size)."""
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.ids = OrderedDict()
+
+    async def first(self, update_id):
+        if update_id in self.ids:
+            return False
+        self.ids[update_id] = None
+        if len(self.ids) > self.max_size:
+            self.ids.popitem(last=False)
+        return True
+
+    async def forget(self, update_id):
+        self.ids.pop(update_id, None)
+
+
+class RedisSeenUpdates:
+    """То же на всех процессах: SET NX с истечением, первый процесс забирает апдейт себе.
+
+    Клиент синхронный (общий с RedisStore), поэтому запросы идут из пула потоков.
+    """
+
+    def __init__(self, client, ttl=3600, prefix="anatili:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix + "update:"
+
+    async def first(self, update_id):
+        key = f"{self.prefix}{update_id}"
+        loop = asyncio.get_running_loop()
+        return bool(await loop.run_in_executor(None, lambda: self.client.set(key, 1, nx=True, ex=self.ttl)))
+
+    async def forget(self, update_id):
+        await asyncio.get_running_loop().run_in_executor(None, self.client.delete, f"{self.prefix}{update_id}")
+
+
+class RedisLease:
+    """Аренда фоновой задачи (ежедневная рассылка) одним процессом из всех.
+
+    Ключ с токеном владельца и истечением: пока процесс держит аренду, он продлевает её каждые
+    ttl/3 секунд; если процесс умер, через ttl аренду забирает другой. Запросы — из пула потоков.
+    """
+
+    def __init__(self, client, name, ttl=60, prefix="anatili:"):
+        import redis  # только при общем хранилище в Redis
+
+        self.redis = redis
+        self.client = client
+        self.key = f"{prefix}lease:{name}"
+        self.ttl = ttl
+        self.token = uuid.uuid4().hex
+
+    def _acquire(self):
+        return bool(self.client.set(self.key, self.token, nx=True, ex=self.ttl))
+
+    def _if_mine(self, action):
+        # продлить или снять, только если ключ всё ещё наш (WATCH/MULTI, как в RedisStore)
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(self.key)
+                if pipe.get(self.key) != self.token:
+                    return False
+                pipe.multi()
+                action(pipe)
+                pipe.execute()
+                return True
+            except self.redis.WatchError:
+                return False
+
+    async def _call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    async def _keep(self):
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            try:
+                mine = await self._call(self._if_mine, lambda pipe: pipe.expire(self.key, self.ttl))
+            except Exception:
+                log.exception("lease %s: renewal failed", self.key)
+                continue
+            if not mine:
+                log.error("lease %s lost to another process", self.key)
+                return
+
+    @contextlib.asynccontextmanager
+    async def hold(self):
+        """async with lease.hold() as held: held — True, если аренда досталась этому процессу."""
+        if not await self._call(self._acquire):
+            yield False
+            return
+        keeper = asyncio.create_task(self._keep())
+        try:
+            yield True
+        finally:
+            keeper.cancel()
+            await self._call(self._if_mine, lambda pipe: pipe.delete(self.key))
+
+
+class UpdateDedupMiddleware(BaseMiddleware):
+    """Outer-middleware на dp.update: повторно доставленный апдейт не обрабатывается второй раз."""
+
+    def __init__(self, seen):
+        self.seen = seen
+        self.duplicates = 0
+
+    async def __call__(self, handler, event, data):
+        if not await self.seen.first(event.update_id):
+            self.duplicates += 1
+            return None
+        try:
+            return await handler(event, data)
+        except BaseException:
+            # упал — пусть повторная доставка обработается заново
+            await self.seen.forget(event.update_id)
+            raise
+
+
+class ConflictRetryMiddleware(BaseMiddleware):
+    """Повторяет апдейт, если запись пользователя изменил другой процесс.
+
+    Хендлеры сохраняют запись до первого запроса к Telegram, поэтому при конфликте
+    пользователь ещё ничего не увидел; перед повтором запись выкидывается из кэша.
+    Между попытками — случайная пауза с растущим потолком (full jitter): процессы, столкнувшиеся
+    на одном пользователе, расходятся во времени, а не сталкиваются снова на следующей попытке.
+    """
+
+    def __init__(self, users, attempts=10, delay=0.005, max_delay=0.25, rng=random):
+        self.users = users
+        self.attempts = attempts
+        self.delay = delay
+        self.max_delay = max_delay
+        self.rng = rng
+        self.conflicts = 0
+        self.failures = 0
+
+    async def __call__(self, handler, event, data):
+        for attempt in range(self.attempts):
+            try:
+                return await handler(event, data)
+            except VersionConflict as e:
+                self.conflicts += 1
+                self.users.forget(e.uid)
+                if attempt == self.attempts - 1:
+                    self.failures += 1
+                    raise
+                log.debug("user %s changed concurrently, retrying update %s", e.uid, event.update_id)
+            await asyncio.sleep(self.rng.uniform(0, min(self.max_delay, self.delay * 2 ** attempt)))
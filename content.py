@@ -0,0 +1,368 @@
+import os
+import sys
+import json
+import asyncio
+import logging
+import contextlib
+
+log = logging.getLogger(__name__)
+
+# имя поля снимка -> файл в data/
+FILES = {
+    "phrases": "phrases.json",
+    "quotes": "quotes.json",
+    "grammar": "grammar.json",
+    "grammar_tasks": "grammar_tasks.json",
+    "words": "words_tasks.json",
+    "vocabulary": "words.json",
+    "reading_texts": "reading.json",       # тексты для раздела Чтение
+    "reading_tasks": "reading_tasks.json",  # задания для раздела Чтение
+}
+# медиа к словам и грамматике: путь относительно data/ (обычно data/media/...)
+AUDIO_EXTENSIONS = (".ogg", ".oga", ".mp3", ".m4a")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+class ContentError(ValueError):
+    """Файлы data/ не прошли проверку; errors — строки "файл: путь: что не так"."""
+
+    def __init__(self, errors):
+        super().__init__("invalid content:\n" + "\n".join(errors))
+        self.errors = errors
+
+
+# === Записи снимка ===
+class Record:
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class Phrase(Record):
+    __slots__ = ("kz", "ru")
+
+
+class GrammarTopic(Record):
+    __slots__ = ("title", "description", "file_text", "youtube", "audio", "image")  # youtube — кортеж ссылок
+
+
+class Question(Record):
+    __slots__ = ("id", "question", "options", "correct")  # correct — индекс в options
+
+
+class Word(Record):
+    __slots__ = ("kz", "ru", "example", "audio", "image")  # audio, image — путь в data/ или ""
+
+
+class ReadingLevel(Record):
+    __slots__ = ("level", "topics")
+
+
+class ReadingText(Record):
+    __slots__ = ("title", "description", "text")
+
+
+class ReadingTopic(Record):
+    __slots__ = ("id", "title", "tasks")
+
+
+class ReadingTask(Record):
+    __slots__ = ("question", "options", "correct")
+
+
+# === Проверка схемы и сборка записей ===
+class _Checker:
+    def __init__(self, filename):
+        self.filename = filename
+        self.errors = []
+
+    def fail(self, path, message):
+        self.errors.append(f"{self.filename}: {path or '<root>'}: {message}")
+
+    def items(self, value, path):
+        if not isinstance(value, list):
+            self.fail(path, "expected a list")
+            return []
+        return [(f"{path}[{i}]", item) for i, item in enumerate(value)]
+
+    def obj(self, value, path):
+        if not isinstance(value, dict):
+            self.fail(path, "expected an object")
+            return False
+        return True
+
+    def string(self, value, path, intern=True):
+        if not isinstance(value, str) or not value.strip():
+            self.fail(path, "expected a non-empty string")
+            return ""
+        # короткие повторяющиеся строки (варианты, заголовки) — одним объектом на весь снимок
+        return sys.intern(value) if intern else value
+
+    def text(self, obj, key, path, optional=False, intern=True):
+        value = obj.get(key)
+        if value is None and optional:
+            return ""
+        return self.string(value, f"{path}.{key}", intern)
+
+    def media(self, obj, key, path, extensions):
+        value = obj.get(key)
+        if value is None:
+            return ""
+        path = f"{path}.{key}"
+        if not isinstance(value, str) or not value.strip():
+            self.fail(path, "expected a file path")
+            return ""
+        name = os.path.normpath(value)
+        if os.path.isabs(name) or name.startswith(".."):
+            self.fail(path, "expected a path inside data/")
+            return ""
+        if not name.lower().endswith(extensions):
+            self.fail(path, f"expected one of {', '.join(extensions)}")
+            return ""
+        return name
+
+    def options(self, obj, path):
+        options = obj.get("options")
+        if not isinstance(options, list) or len(options) < 2:
+            self.fail(f"{path}.options", "expected a list of at least 2 options")
+            return ()
+        result = tuple(self.string(option, f"{path}.options[{i}]") for i, option in enumerate(options))
+        if len(set(result)) != len(result):
+            self.fail(f"{path}.options", "duplicate options")
+        return result
+
+
+def _phrases(raw, check):
+    return tuple(
+        Phrase(check.text(item, "kz", path), check.text(item, "ru", path, optional=True))
+        for path, item in check.items(raw, "") if check.obj(item, path)
+    )
+
+
+def _grammar(raw, check):
+    topics = []
+    for path, item in check.items(raw, ""):
+        if not check.obj(item, path):
+            continue
+        youtube = item.get("youtube") or ()
+        if isinstance(youtube, str):
+            youtube = (youtube,)
+        elif isinstance(youtube, list) and all(isinstance(link, str) and link for link in youtube):
+            youtube = tuple(youtube)
+        else:
+            check.fail(f"{path}.youtube", "expected a link or a list of links")
+            youtube = ()
+        topics.append(GrammarTopic(
+            check.text(item, "title", path),
+            check.text(item, "description", path, intern=False),
+            check.text(item, "file_text", path, intern=False),
+            youtube,
+            check.media(item, "audio", path, AUDIO_EXTENSIONS),
+            check.media(item, "image", path, IMAGE_EXTENSIONS),
+        ))
+    return tuple(topics)
+
+
+def _questions(raw, check, answer_key, root=""):
+    questions, seen = [], set()
+    for path, item in check.items(raw, root):
+        if not check.obj(item, path):
+            continue
+        qid = item.get("id")
+        if not isinstance(qid, int) or isinstance(qid, bool) or qid < 1:
+            check.fail(f"{path}.id", "expected a positive integer")
+            continue
+        if qid in seen:
+            check.fail(f"{path}.id", f"duplicate id {qid}")
+            continue
+        seen.add(qid)
+        options = check.options(item, path)
+        answer = item.get(answer_key)
+        if answer not in options:
+            check.fail(f"{path}.{answer_key}", f"{answer!r} is not one of the options")
+            continue
+        questions.append(Question(qid, check.text(item, "question", path), options, options.index(answer)))
+    return tuple(questions)
+
+
+def _grammar_tasks(raw, check):
+    return _questions(raw, check, "answer")
+
+
+def _words(raw, check):
+    if not raw:
+        return ()
+    if not check.obj(raw, ""):
+        return ()
+    return _questions(raw.get("words_tasks", []), check, "correct", "words_tasks")
+
+
+def _vocabulary(raw, check):
+    return tuple(
+        Word(check.text(item, "kz", path), check.text(item, "ru", path),
+             check.text(item, "example", path, optional=True, intern=False),
+             check.media(item, "audio", path, AUDIO_EXTENSIONS), check.media(item, "image", path, IMAGE_EXTENSIONS))
+        for path, item in check.items(raw, "") if check.obj(item, path)
+    )
+
+
+def _reading_texts(raw, check):
+    levels = []
+    for path, level in check.items(raw, ""):
+        if not check.obj(level, path):
+            continue
+        topics = tuple(
+            ReadingText(check.text(t, "title", tpath), check.text(t, "description", tpath, optional=True, intern=False),
+                        check.text(t, "text", tpath, intern=False))
+            for tpath, t in check.items(level.get("topics"), f"{path}.topics") if check.obj(t, tpath)
+        )
+        levels.append(ReadingLevel(check.text(level, "level", path), topics))
+    return tuple(levels)
+
+
+def _reading_tasks(raw, check):
+    topics = []
+    for path, topic in check.items(raw, ""):
+        if not check.obj(topic, path):
+            continue
+        tasks = []
+        for tpath, task in check.items(topic.get("tasks"), f"{path}.tasks"):
+            if not check.obj(task, tpath):
+                continue
+            options = check.options(task, tpath)
+            correct = task.get("correct_option")
+            if not isinstance(correct, int) or isinstance(correct, bool) or not 0 <= correct < len(options):
+                check.fail(f"{tpath}.correct_option", f"{correct!r} is out of range for {len(options)} options")
+                continue
+            tasks.append(ReadingTask(check.text(task, "question", tpath), options, correct))
+        if not tasks:
+            check.fail(f"{path}.tasks", "no valid tasks")
+        topics.append(ReadingTopic(str(topic.get("id", "")), check.text(topic, "title", path), tuple(tasks)))
+    return tuple(topics)
+
+
+COMPILERS = {
+    "phrases": _phrases,
+    "quotes": _phrases,
+    "grammar": _grammar,
+    "grammar_tasks": _grammar_tasks,
+    "words": _words,
+    "vocabulary": _vocabulary,
+    "reading_texts": _reading_texts,
+    "reading_tasks": _reading_tasks,
+}
+
+
+def compile_sources(sources):
+    """{имя файла: bytes или None} -> {поле снимка: кортеж записей}; ContentError со всеми ошибками."""
+    data, errors = {}, []
+    for name, filename in FILES.items():
+        check = _Checker(filename)
+        raw = sources.get(filename)
+        try:
+            value = json.loads(raw) if raw is not None else []
+        except ValueError as e:
+            errors.append(f"{filename}: {e}")
+            continue
+        data[name] = COMPILERS[name](value, check)
+        errors += check.errors
+    if errors:
+        raise ContentError(errors)
+    return data
+
+
+def read_sources(data_dir):
+    sources = {}
+    for filename in FILES.values():
+        try:
+            with open(os.path.join(data_dir, filename), "rb") as f:
+                sources[filename] = f.read()
+        except FileNotFoundError:
+            sources[filename] = None
+    return sources
+
+
+class Content:
+    """Неизменяемый снимок всех файлов data/ одной версии."""
+
+    def __init__(self, version, data):
+        self.version = version
+        for name in FILES:
+            setattr(self, name, data[name])
+        self._cache = {}
+
+    def cached(self, key, build):
+        # производные структуры (клавиатуры, индексы) живут и умирают вместе со снимком
+        if key not in self._cache:
+            self._cache[key] = build(self)
+        return self._cache[key]
+
+
+class ContentRegistry:
+    def __init__(self, data_dir, timer=contextlib.nullcontext):
+        self.data_dir = data_dir
+        self.timer = timer
+        self.mtimes = {}
+        self.version = 0
+        self.current = None
+        self.warmers = []
+        self.reload_if_changed()
+
+    def on_load(self, build):
+        """build(снимок) вызывается для каждой новой версии до того, как она станет текущей."""
+        self.warmers.append(build)
+        if self.current:
+            build(self.current)
+
+    def _scan(self):
+        mtimes = {}
+        for filename in FILES.values():
+            try:
+                mtimes[filename] = os.stat(os.path.join(self.data_dir, filename)).st_mtime_ns
+            except FileNotFoundError:
+                mtimes[filename] = None
+        return mtimes
+
+    def reload_if_changed(self):
+        mtimes = self._scan()
+        if mtimes == self.mtimes:
+            return False
+        # битый файл сообщаем один раз, следующая правка снова изменит mtime
+        self.mtimes = mtimes
+        with self.timer("content_load"):
+            data = compile_sources(read_sources(self.data_dir))
+        snapshot = Content(self.version + 1, data)
+        for build in self.warmers:
+            build(snapshot)
+        self.version += 1
+        # одно присваивание: хендлеры видят либо старую версию целиком, либо новую
+        self.current = snapshot
+        return True
+
+    async def watch(self, interval=5):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await loop.run_in_executor(None, self.reload_if_changed):
+                    log.info("content reloaded, version %s", self.version)
+            except Exception:
+                log.exception("content reload failed, keeping version %s", self.version)
+
+
+if __name__ == "__main__":
+    # python content.py check [data_dir]
+    if len(sys.argv) not in (2, 3) or sys.argv[1] != "check":
+        sys.exit("usage: python content.py check [data_dir]")
+    data_dir = sys.argv[2] if len(sys.argv) == 3 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    try:
+        data = compile_sources(read_sources(data_dir))
+    except ContentError as e:
+        sys.exit(str(e))
+    print(", ".join(f"{name}: {len(value)}" for name, value in data.items()))
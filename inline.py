@@ -0,0 +1,119 @@
+import bisect
+from collections import OrderedDict
+
+from aiogram.types import InlineQueryResultArticle, InputTextMessageContent
+
+import templates
+from search import WORD, normalize
+
+# Inline-режим (@bot кіт...): ответ на каждое нажатие клавиши, поэтому только поиск по началу.
+# Ключи — нормализованные казахская и русская формы (как в /search) и их хвосты с начала каждого
+# слова, в двух отсортированных массивах: совпадения с начала формы идут раньше совпадений внутри.
+PAGE = 20  # Telegram принимает до 50 результатов за ответ
+CACHE_SIZE = 2048
+
+
+def form(text):
+    return " ".join(WORD.findall(normalize(text)))
+
+
+class Entry:
+    __slots__ = ("kind", "kz", "ru", "example")
+
+    def __init__(self, kind, kz, ru, example=""):
+        self.kind = kind  # word / phrase
+        self.kz = kz
+        self.ru = ru
+        self.example = example
+
+
+def content_entries(c):
+    entries = [Entry("word", w.kz, w.ru, w.example) for w in c.vocabulary]
+    entries += [Entry("phrase", p.kz, p.ru) for p in c.phrases]
+    return entries
+
+
+def article_text(entry):
+    text = templates.INLINE_ENTRY.render(kz=entry.kz)
+    if entry.ru:
+        text += templates.INLINE_TRANSLATION.render(ru=entry.ru)
+    if entry.example:
+        text += templates.INLINE_EXAMPLE.render(example=entry.example)
+    return text
+
+
+def article(entry_id, entry):
+    text = article_text(entry)
+    return InlineQueryResultArticle(
+        id=f"{entry.kind[0]}{entry_id}",
+        title=entry.kz,
+        description=entry.ru or None,
+        input_message_content=InputTextMessageContent(message_text=text, parse_mode="HTML"),
+    )
+
+
+class InlineDictionary:
+    def __init__(self, entries, page=PAGE, cache_size=CACHE_SIZE):
+        self.entries = entries
+        self.page = page
+        heads, inner = [], []
+        for entry_id, entry in enumerate(entries):
+            for text in (entry.kz, entry.ru):
+                key = form(text)
+                if not key:
+                    continue
+                heads.append((key, entry_id))
+                for i, ch in enumerate(key):
+                    if ch == " ":
+                        inner.append((key[i + 1:], entry_id))
+        heads.sort()
+        inner.sort()
+        # параллельные массивы: bisect идёт по строкам без сравнения кортежей
+        self.heads = ([key for key, _ in heads], [entry_id for _, entry_id in heads])
+        self.inner = ([key for key, _ in inner], [entry_id for _, entry_id in inner])
+        # (запрос, смещение) -> (результаты, next_offset); живёт вместе со снимком контента
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+
+    def _matches(self, prefix):
+        seen = set()
+        for keys, ids in (self.heads, self.inner):
+            i = bisect.bisect_left(keys, prefix)
+            while i < len(keys) and keys[i].startswith(prefix):
+                if ids[i] not in seen:
+                    seen.add(ids[i])
+                    yield ids[i]
+                i += 1
+
+    def lookup(self, prefix, offset=0):
+        """(id записей на странице, есть ли следующая страница); prefix уже прошёл через form()."""
+        found = []
+        for entry_id in self._matches(prefix):
+            found.append(entry_id)
+            if len(found) > offset + self.page:
+                break
+        return found[offset:offset + self.page], len(found) > offset + self.page
+
+    def answer(self, query, offset=""):
+        """(статьи для answer_inline_query, next_offset) — готовый ответ Telegram, из кэша, если был."""
+        start = int(offset) if offset.isdigit() else 0
+        key = (form(query), start)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return cached
+        self.misses += 1
+        ids, more = self.lookup(key[0], start)
+        results = [article(entry_id, self.entries[entry_id]) for entry_id in ids]
+        # пустой next_offset — результатов больше нет, Telegram не будет просить следующую страницу
+        result = self.cache[key] = results, str(start + len(ids)) if more else ""
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return result
+
+
+def build_index(c):
+    return InlineDictionary(content_entries(c))
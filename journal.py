@@ -0,0 +1,230 @@
+import os
+import re
+import time
+import asyncio
+import logging
+import sqlite3
+import threading
+import contextlib
+
+log = logging.getLogger(__name__)
+
+# Журнал ответов: одна строка на ответ, файлы-сегменты answers-<номер>.log только дописываются.
+#   <время>\t<uid>\t<раздел>\t<вопрос>\t<1|0>\t<xp>\n
+# Закрытые сегменты сворачиваются в снимок (SQLite, одна строка на пользователя) и удаляются;
+# в снимке хранится номер последнего свёрнутого сегмента, так что свёртка идемпотентна.
+SEGMENT = re.compile(r"answers-(\d{8})\.log$")
+SEGMENT_BYTES = 4 * 1024 * 1024
+
+
+def segment_name(seq):
+    return f"answers-{seq:08d}.log"
+
+
+def parse_line(line):
+    """(uid, верно, xp, время) или None для оборванной или испорченной строки."""
+    parts = line.split("\t")
+    if len(parts) != 6 or parts[4] not in ("0", "1"):
+        return None
+    try:
+        return parts[1], parts[4] == "1", int(parts[5]), int(parts[0])
+    except ValueError:
+        return None
+
+
+def fold(totals, uid, correct, xp, at):
+    t = totals.get(uid)
+    if t is None:
+        totals[uid] = [1, int(correct), xp, at]
+    else:
+        t[0] += 1
+        t[1] += correct
+        t[2] += xp
+        t[3] = max(t[3], at)
+
+
+def merge(totals, other):
+    for uid, (answers, correct, xp, at) in other.items():
+        t = totals.get(uid)
+        if t is None:
+            totals[uid] = [answers, correct, xp, at]
+        else:
+            t[0] += answers
+            t[1] += correct
+            t[2] += xp
+            t[3] = max(t[3], at)
+
+
+def read_segment(path):
+    """{uid: [ответов, верных, xp, время последнего]} по одному сегменту."""
+    totals = {}
+    with open(path, "rb") as f:
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break  # недописанная строка после падения
+            event = parse_line(raw.decode("utf-8", "replace").rstrip("\n"))
+            if event is not None:
+                fold(totals, *event)
+    return totals
+
+
+class AnswerStats:
+    __slots__ = ("answers", "correct", "xp", "last")
+
+    def __init__(self, answers=0, correct=0, xp=0, last=0):
+        self.answers = answers
+        self.correct = correct
+        self.xp = xp
+        self.last = last
+
+
+class Journal:
+    """Дописывает ответы пачками с fsync, режет сегменты по размеру и сворачивает закрытые в снимок."""
+
+    def __init__(self, path, segment_bytes=SEGMENT_BYTES, interval_ms=200, max_pending=500,
+                 timer=contextlib.nullcontext):
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.interval = interval_ms / 1000
+        self.max_pending = max_pending
+        self.timer = timer
+        os.makedirs(path, exist_ok=True)
+        self.lock = threading.Lock()  # снимок и unfolded меняются в потоке свёртки
+        self.conn = sqlite3.connect(os.path.join(path, "snapshot.db"), check_same_thread=False,
+                                    isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS totals (uid TEXT PRIMARY KEY, answers INTEGER NOT NULL, "
+            "correct INTEGER NOT NULL, xp INTEGER NOT NULL, last INTEGER NOT NULL)"
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self.pending = []  # строки, ещё не записанные в сегмент
+        self.pending_totals = {}  # их итоги по пользователям
+        self.writing_totals = {}  # итоги пачки, которая сейчас пишется
+        self.unfolded = {}  # номер сегмента -> итоги его ответов, пока он не свёрнут в снимок
+        self.wakeup = asyncio.Event()
+        self.write_lock = asyncio.Lock()
+        self.task = None
+        self.stopping = False
+        # старт: снимок + хвост журнала; всё, что осталось от прошлого запуска, сворачивается
+        segments = self.segments()
+        for seq in segments:
+            self._compact(seq)
+        self.seq = self.folded() + 1
+        self.file = open(os.path.join(path, segment_name(self.seq)), "ab")
+
+    def segments(self):
+        return sorted(int(m.group(1)) for m in map(SEGMENT.match, os.listdir(self.path)) if m)
+
+    def folded(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'folded'").fetchone()
+        return row[0] if row else 0
+
+    def record(self, uid, section, item, correct, xp=0, at=None):
+        at = int(time.time()) if at is None else at
+        self.pending.append(f"{at}\t{uid}\t{section}\t{item}\t{int(correct)}\t{xp}\n")
+        fold(self.pending_totals, uid, correct, xp, at)
+        if len(self.pending) >= self.max_pending:
+            self.wakeup.set()
+
+    def stats(self, uid):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT answers, correct, xp, last FROM totals WHERE uid = ?", (uid,)
+            ).fetchone()
+            s = AnswerStats(*row) if row else AnswerStats()
+            for totals in (*self.unfolded.values(), self.writing_totals, self.pending_totals):
+                t = totals.get(uid)
+                if t:
+                    s.answers += t[0]
+                    s.correct += t[1]
+                    s.xp += t[2]
+                    s.last = max(s.last, t[3])
+        return s
+
+    def _write(self, data):
+        """Дописать пачку и fsync; номер закрытого сегмента, если текущий перерос segment_bytes."""
+        self.file.write(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        if self.file.tell() < self.segment_bytes:
+            return None
+        self.file.close()
+        closed = self.seq
+        self.file = open(os.path.join(self.path, segment_name(closed + 1)), "ab")
+        return closed
+
+    def _compact(self, seq):
+        """Свернуть сегмент в снимок одной транзакцией и удалить его."""
+        path = os.path.join(self.path, segment_name(seq))
+        if seq > self.folded():
+            totals = read_segment(path)
+            with self.lock:
+                self.conn.execute("BEGIN")
+                try:
+                    self.conn.executemany(
+                        "INSERT INTO totals (uid, answers, correct, xp, last) VALUES (?, ?, ?, ?, ?) "
+                        "ON CONFLICT(uid) DO UPDATE SET answers = answers + excluded.answers, "
+                        "correct = correct + excluded.correct, xp = xp + excluded.xp, "
+                        "last = MAX(last, excluded.last)",
+                        [(uid, *t) for uid, t in totals.items()],
+                    )
+                    self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('folded', ?)", (seq,))
+                except BaseException:
+                    self.conn.execute("ROLLBACK")
+                    raise
+                self.conn.execute("COMMIT")
+                self.unfolded.pop(seq, None)
+        os.remove(path)
+
+    async def flush(self):
+        async with self.write_lock:
+            if not self.pending:
+                return
+            lines, self.pending = self.pending, []
+            self.writing_totals, self.pending_totals = self.pending_totals, {}
+            seq = self.seq
+            loop = asyncio.get_running_loop()
+            try:
+                with self.timer("journal_write"):
+                    closed = await loop.run_in_executor(None, self._write, "".join(lines).encode("utf-8"))
+            except Exception:
+                self.pending[:0] = lines
+                merge(self.pending_totals, self.writing_totals)
+                self.writing_totals = {}
+                raise
+            merge(self.unfolded.setdefault(seq, {}), self.writing_totals)
+            self.writing_totals = {}
+            if closed is not None:
+                # новые ответы уже идут в следующий сегмент, закрытый сворачивается в фоне
+                self.seq = closed + 1
+                with self.timer("journal_compact"):
+                    await loop.run_in_executor(None, self._compact, closed)
+
+    async def run(self):
+        while not self.stopping:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                log.exception("answer journal write failed, will retry")
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        # без cancel: отменённая пачка всё равно дописалась бы в потоке и попала в журнал дважды
+        if self.task:
+            self.stopping = True
+            self.wakeup.set()
+            await self.task
+            self.task = None
+        await self.flush()
+
+    def close(self):
+        self.file.close()
+        self.conn.close()
@@ -0,0 +1,150 @@
+import datetime
+
+from sortedcontainers import SortedList
+
+
+def week_key(day=None):
+    year, week, _ = (day or datetime.date.today()).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+class Leaderboard:
+    """Рейтинг по XP: обновление, топ-N и место пользователя за O(log n)."""
+
+    def __init__(self):
+        self.order = SortedList()  # (-xp, uid) — больше XP раньше, при равенстве по uid
+        self.xp = {}  # uid -> xp
+
+    def set(self, uid, xp):
+        old = self.xp.get(uid)
+        if old == xp:
+            return
+        if old is not None:
+            self.order.remove((-old, uid))
+        if xp > 0:
+            self.xp[uid] = xp
+            self.order.add((-xp, uid))
+        else:
+            self.xp.pop(uid, None)
+
+    def top(self, n):
+        return [(uid, -neg) for neg, uid in self.order.islice(0, n)]
+
+    def rank(self, uid):
+        """Место с 1, или None, если у пользователя ещё нет XP."""
+        xp = self.xp.get(uid)
+        if xp is None:
+            return None
+        return self.order.bisect_left((-xp, uid)) + 1
+
+    def count_above(self, xp):
+        """Сколько пользователей набрали больше xp."""
+        return self.order.bisect_left((-xp, ""))
+
+    def __len__(self):
+        return len(self.order)
+
+
+class XpCounts:
+    """Сколько пользователей набрало каждое значение XP (дерево Фенвика): сдвиг и
+    «сколько больше xp» за O(log max_xp) без перебора пользователей."""
+
+    def __init__(self, counts=()):
+        """counts — пары (xp, сколько пользователей), xp > 0; дерево строится за линейное время."""
+        counts = list(counts)
+        size = 1
+        while size < max((xp for xp, _ in counts), default=1):
+            size *= 2
+        self.tree = [0] * (size + 1)
+        self.total = 0
+        for xp, n in counts:
+            self.tree[xp] += n
+            self.total += n
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                self.tree[parent] += self.tree[i]
+
+    def add(self, xp, delta):
+        size = len(self.tree) - 1
+        while xp > size:
+            # размер — степень двойки: новый корень покрывает всё старое дерево, остальные узлы пусты
+            self.tree += [0] * size
+            self.tree[2 * size] = self.tree[size]
+            size *= 2
+        self.total += delta
+        while xp <= size:
+            self.tree[xp] += delta
+            xp += xp & -xp
+
+    def count_above(self, xp):
+        """Сколько пользователей набрали больше xp."""
+        xp = min(xp, len(self.tree) - 1)
+        upto = 0
+        while xp > 0:
+            upto += self.tree[xp]
+            xp -= xp & -xp
+        return self.total - upto
+
+    def __len__(self):
+        return self.total
+
+
+def board_xp(user, week=None):
+    """XP пользователя в общем рейтинге (week=None) или в рейтинге недели week."""
+    if week is None:
+        return user.get("xp", 0)
+    return user.get("week_xp", 0) if user.get("week") == week else 0
+
+
+class Board:
+    """Один рейтинг поверх store: топ и место считаются индексом store, записи не читаются."""
+
+    def __init__(self, store, week=None):
+        self.store = store
+        self.week = week
+
+    def xp_of(self, user):
+        return board_xp(user, self.week)
+
+    def top(self, n):
+        """[(uid, имя, xp)] — первые n мест."""
+        return self.store.top(self.week, n)
+
+    def rank(self, user):
+        """Место с 1 (при равном XP — одно место на всех), или None, если XP ещё нет.
+
+        Считается по переданной записи, а не по store: при WriteBehind store отстаёт
+        на интервал сброса, а своё место пользователь должен видеть сразу.
+        """
+        xp = self.xp_of(user)
+        return self.store.count_above(self.week, xp) + 1 if xp > 0 else None
+
+    def __len__(self):
+        return self.store.ranked(self.week)
+
+
+class Leaderboards:
+    """Общий рейтинг и рейтинг текущей недели.
+
+    Недельный XP хранится в записи пользователя вместе с ключом недели ("week", "week_xp").
+    Рейтинг ведёт сам store по записям, которые в него пишутся (в SQLite — таблица scores с
+    индексом по XP), поэтому при старте ничего не перебирается, а память не растёт с числом
+    пользователей. С началом новой недели недельный рейтинг просто берётся по новому ключу:
+    week_xp прошлой недели обнуляются лениво при следующем начислении.
+    """
+
+    def __init__(self, store, today=week_key):
+        self.store = store
+        self.today = today
+
+    def add_xp(self, uid, user, amount):
+        week = self.today()
+        if user.get("week") != week:
+            user["week"] = week
+            user["week_xp"] = 0
+        user["xp"] += amount
+        user["week_xp"] += amount
+
+    def board(self, weekly):
+        return Board(self.store, self.today() if weekly else None)
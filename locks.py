@@ -0,0 +1,24 @@
+import asyncio
+import contextlib
+
+
+class UserLocks:
+    """asyncio.Lock на пользователя; запись живёт, только пока её кто-то держит или ждёт."""
+
+    def __init__(self):
+        self.locks = {}  # uid -> [lock, сколько держат/ждут]
+
+    @contextlib.asynccontextmanager
+    async def hold(self, uid):
+        entry = self.locks.get(uid)
+        if entry is None:
+            entry = self.locks[uid] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self.locks[uid]
+
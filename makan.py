@@ -1,48 +1,166 @@
 import os
-import json
 import random
 import datetime
-from aiogram import Bot, Dispatcher, F
+from aiogram import Bot, Dispatcher
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from aiogram.filters import Command
-from aiogram.types import Message, CallbackQuery
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message, CallbackQuery, InlineQuery
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
 from dotenv import load_dotenv
 import asyncio
+import signal
+from content import ContentRegistry
+from bitset import QuestionSet, get_bits, mark
+import srs
+from storage import open_store, migrate_json, store_call, JsonStore, WriteBehind, UserCache
+from locks import UserLocks
+from callbacks import CallbackRouter, checked
+from sender import OutboundLimiter
+from pages import split_html
+import templates
+import search
+import inline
+import quiz
+from leaderboard import Leaderboards
+from broadcast import Broadcast, DeliveryLog, RedisDeliveryLog, run_daily
+from journal import Journal
+from assets import Assets
+from cluster import SeenUpdates, RedisSeenUpdates, RedisLease, UpdateDedupMiddleware, ConflictRetryMiddleware
+from metrics import HandlerMetricsMiddleware, ApiMetricsMiddleware, metrics_app, timed, registry
 
 load_dotenv()
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+# лимиты Telegram: сообщений в секунду всего и на один чат
+TG_GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", "30"))
+TG_CHAT_RATE = float(os.getenv("TG_CHAT_RATE", "1"))
+TG_CHAT_BURST = int(os.getenv("TG_CHAT_BURST", "3"))
+
 bot = Bot(token=BOT_TOKEN)
+outbound = OutboundLimiter(TG_GLOBAL_RATE, TG_CHAT_RATE, TG_CHAT_BURST)
+bot.session.middleware(outbound)
+bot.session.middleware(ApiMetricsMiddleware())
 dp = Dispatcher()
+# маршруты, меняющие прогресс (lock=True), для одного пользователя идут по очереди
+user_locks = UserLocks()
+router = CallbackRouter(user_locks, stale_text="♻️ Мәзір ескірді, қайта ашыңыз")
+dp.update.outer_middleware(HandlerMetricsMiddleware(callback_label=router.name_of))
+
+# "polling" (по умолчанию) или "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # публичный https-адрес, который Telegram будет вызывать
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")  # обязателен: без него на вебхук может писать кто угодно
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+# локальный /metrics в формате Prometheus; 0 — выключить
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9101"))
 
 BASE_DIR = os.path.dirname(__file__)
 DATA_DIR = os.path.join(BASE_DIR, "data")
 USER_DATA_FILE = os.path.join(BASE_DIR, "user_data.json")
-
-def load_json(filename):
-    path = os.path.join(DATA_DIR, filename)
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return []
-
-def load_user_data():
-    if os.path.exists(USER_DATA_FILE):
-        with open(USER_DATA_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
-
-def save_user_data(data):
-    with open(USER_DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-PHRASES = load_json("phrases.json")
-GRAMMAR = load_json("grammar.json")
-WORDS = load_json("words_tasks.json")
-READING_TEXTS = load_json("reading.json")       # тексты для раздела Чтение
-READING_TASKS = load_json("reading_tasks.json")  # задания для раздела Чтение
-
-user_data = load_user_data()
+# "sqlite:<path>" (по умолчанию), "json:<path>" для старого user_data.json
+# или "redis://<host>:<port>/<db>" — общее хранилище для нескольких процессов бота
+USER_STORE = os.getenv("USER_STORE", "sqlite:" + os.path.join(BASE_DIR, "user_data.db"))
+# 0 — писать сразу на каждый ответ, иначе сбрасывать пачкой раз в N мс или после M изменений
+FLUSH_INTERVAL_MS = int(os.getenv("FLUSH_INTERVAL_MS", "500"))
+FLUSH_MAX_DIRTY = int(os.getenv("FLUSH_MAX_DIRTY", "200"))
+# в памяти держатся только активные пользователи: не больше USER_CACHE_SIZE и не дольше USER_CACHE_TTL секунд
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "3600"))
+
+# ежедневная рассылка фразы дня в BROADCAST_AT ("09:00"); пусто — выключена
+# (с Redis журнал рассылок общий, и рассылку ведёт один процесс — BROADCAST_DB не нужен)
+BROADCAST_AT = os.getenv("BROADCAST_AT", "")
+BROADCAST_DB = os.getenv("BROADCAST_DB", os.path.join(BASE_DIR, "broadcast.db"))
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "20"))
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "10"))
+
+# журнал всех ответов (сегменты + снимок итогов по пользователям); пусто — не вести.
+# Журнал пишет один процесс, поэтому с общим store (Redis) по умолчанию выключен
+JOURNAL_DIR = os.getenv("JOURNAL_DIR")
+JOURNAL_SEGMENT_KB = int(os.getenv("JOURNAL_SEGMENT_KB", "4096"))
+
+# чат (id), куда при старте заранее загружаются медиа из data/; пусто — загрузка при первой отправке
+MEDIA_WARM_CHAT = os.getenv("MEDIA_WARM_CHAT", "")
+
+store = open_store(USER_STORE)
+if JOURNAL_DIR is None:
+    JOURNAL_DIR = "" if store.shared else os.path.join(BASE_DIR, "journal")
+elif JOURNAL_DIR and store.shared:
+    # у каждого процесса был бы свой журнал с частью ответов, и статистика в «Прогресс» врала бы
+    raise RuntimeError("JOURNAL_DIR is per-process and cannot be used with a shared USER_STORE")
+# общее хранилище пишется сразу: конфликт версий должен всплыть до ответа пользователю
+writer = WriteBehind(store, FLUSH_INTERVAL_MS, FLUSH_MAX_DIRTY, timer=timed) \
+    if FLUSH_INTERVAL_MS > 0 and not store.shared else None
+
+users = UserCache(store, writer, USER_CACHE_SIZE, USER_CACHE_TTL)
+registry.collect("anatili_user_cache_hits_total", "counter", lambda: users.hits)
+registry.collect("anatili_user_cache_misses_total", "counter", lambda: users.misses)
+registry.collect("anatili_user_cache_evictions_total", "counter", lambda: users.evictions)
+registry.collect("anatili_user_cache_size", "gauge", lambda: len(users))
+
+# повторно доставленные апдейты отбрасываются (в Redis — на всех процессах сразу),
+# апдейт, проигравший гонку за запись пользователя другому процессу, обрабатывается заново
+dedup = UpdateDedupMiddleware(RedisSeenUpdates(store.client) if store.shared else SeenUpdates())
+retry = ConflictRetryMiddleware(users)
+dp.update.outer_middleware(dedup)
+dp.update.outer_middleware(retry)
+registry.collect("anatili_duplicate_updates_total", "counter", lambda: dedup.duplicates)
+registry.collect("anatili_user_conflicts_total", "counter", lambda: retry.conflicts)
+registry.collect("anatili_user_conflict_failures_total", "counter", lambda: retry.failures)
+
+def migrate_user_data():
+    # первый запуск на SQLite: переносим старый user_data.json
+    if not isinstance(store, JsonStore) and store.count() == 0 and os.path.exists(USER_DATA_FILE):
+        migrate_json(USER_DATA_FILE, store)
+
+async def save_user_data(uid, user):
+    # user — та же запись, которую изменил обработчик: кэш мог её уже вытеснить или заменить
+    with timed("storage"):
+        if writer:
+            writer.mark(uid, user)
+        else:
+            await store_call(store, store.put, uid, user)
+
+# все файлы data/ загружаются один раз; правки подхватываются по mtime без перезапуска
+content = ContentRegistry(DATA_DIR, timer=timed)
+CONTENT_RELOAD_INTERVAL = int(os.getenv("CONTENT_RELOAD_INTERVAL", "5"))
+
+migrate_user_data()
+# рейтинги ведёт store (в SQLite — индексированная таблица scores): при старте записи не перебираются
+leaderboards = Leaderboards(store)
+LEADERBOARD_SIZE = 10
+journal = Journal(JOURNAL_DIR, JOURNAL_SEGMENT_KB * 1024, timer=timed) if JOURNAL_DIR else None
+
+# озвучка и картинки: файл загружается в Telegram один раз, дальше уходит по file_id
+assets = Assets(store, DATA_DIR)
+registry.collect("anatili_media_sent_by_file_id_total", "counter", lambda: assets.hits)
+registry.collect("anatili_media_uploads_total", "counter", lambda: assets.uploads)
+registry.collect("anatili_media_uploaded_bytes_total", "counter", lambda: assets.uploaded_bytes)
+
+def media_names(c):
+    return [name for item in (*c.vocabulary, *c.grammar) for name in (item.image, item.audio) if name]
+
+def media_button(kb, item, route, idx):
+    if item.audio:
+        kb.button(text="🔊 Тыңдау", callback_data=router.pack(route, idx))
+    elif item.image:
+        kb.button(text="🖼 Сурет", callback_data=router.pack(route, idx))
+
+async def send_media(call, item, caption):
+    chat_id = call.message.chat.id
+    try:
+        if item.image:
+            await assets.send(call.bot, chat_id, item.image, caption=caption)
+        if item.audio:
+            await assets.send(call.bot, chat_id, item.audio, caption=None if item.image else caption)
+    except FileNotFoundError:
+        await call.answer("Файл табылмады", show_alert=True)
+        return
+    await call.answer()
 
 topics = {
     "🌿 Адам және өмір": {
@@ -54,375 +172,848 @@ topics = {
         # … добавьте остальные
     }
 }
+# в callback_data тема передаётся номером: полное название с эмодзи не влезает в 64 байта
+topic_names = list(topics)
+
+def build_pages(c):
+    # длинные тексты делятся на страницы один раз при загрузке версии контента
+    return {
+        "grammar": [split_html(item.file_text) for item in c.grammar],
+        "reading": [[split_html(t.text) for t in level.topics] for level in c.reading_texts],
+    }
 
-def main_menu():
+content.on_load(lambda c: c.cached("pages", build_pages))
+
+# текст из data/, экранированный для HTML один раз на версию контента
+content.on_load(lambda c: c.cached("html", templates.escape_content))
+
+def texts(c):
+    return c.cached("html", templates.escape_content)
+
+def screen(build, *args):
+    """Текст и клавиатура статического экрана, собранные один раз на версию контента."""
+    c = content.current
+    screens = c.cached("screens", lambda c: {})
+    key = (build, *args)
+    if key not in screens:
+        screens[key] = build(c, *args)
+    return screens[key]
+
+def main_screen(c):
     kb = InlineKeyboardBuilder()
-    kb.button(text="📚 Сөздер", callback_data="menu_words")
-    kb.button(text="✏️ Грамматика",callback_data="menu_grammar")
-    kb.button(text="📖 Чтение",callback_data="menu_reading")
-    kb.button(text="🧠 Задания",callback_data="menu_tasks")
-    kb.button(text="📈 Прогресс",callback_data="menu_progress")
+    kb.button(text="📚 Сөздер", callback_data=router.pack("menu_words"))
+    kb.button(text="✏️ Грамматика",callback_data=router.pack("menu_grammar"))
+    kb.button(text="📖 Чтение",callback_data=router.pack("menu_reading"))
+    kb.button(text="🧠 Задания",callback_data=router.pack("menu_tasks"))
+    kb.button(text="📈 Прогресс",callback_data=router.pack("menu_progress"))
     kb.adjust(2,2)
-    return kb.as_markup()
+    return dict(text=templates.MAIN_MENU.render(), parse_mode="HTML", reply_markup=kb.as_markup())
+
+def main_menu():
+    return screen(main_screen)["reply_markup"]
 
 @dp.message(Command("start"))
 async def start(message: Message):
     hour = datetime.datetime.now().hour
     greeting = "🌅 Қайырлы таң!" if hour < 12 else ("🌇 Қайырлы кеш!" if hour < 18 else "🌙 Қайырлы түн!")
-    phrase = random.choice(PHRASES)["kz"] if PHRASES else "Білім — табысқа бастар жол."
+    c = content.current
+    phrase = random.choice(c.phrases).kz if c.phrases else "Білім — табысқа бастар жол."
     await message.answer(
-        f"✨ *AnaTili Bot 🇰🇿*\n{greeting}\n\n"
-        f"💬 Күннің дәйексөзі:\n_{phrase}_\n\n"
-        "📚 Сөздер — Quizlet сілтемелері\n"
-        "✏️ Грамматика — ережелер мен бейне\n"
-        "📖 Чтение — мәтіндер деңгеймен\n"
-        "📈 Прогресс — сенің жетістігің",
-        parse_mode="Markdown",
+        templates.START.render(greeting=greeting, phrase=texts(c)[phrase]),
+        parse_mode="HTML",
         reply_markup=main_menu()
     )
 
-@dp.callback_query(F.data == "menu_words")
-async def show_topics(call: CallbackQuery):
+SEARCH_LIMIT = 8
+SEARCH_ICONS = {"word": "📚", "phrase": "💬", "grammar": "✏️", "reading": "📖"}
+
+content.on_load(lambda c: c.cached("search", search.build_index))
+content.on_load(lambda c: c.cached("quiz", quiz.build_bank))
+content.on_load(lambda c: c.cached("inline", inline.build_index))
+
+@dp.message(Command("search"))
+async def search_command(message: Message, command: CommandObject):
+    query = (command.args or "").strip()
+    if not query:
+        await message.answer("🔎 Іздеу: /search <сөз>\nМысалы: /search кітап")
+        return
+    with timed("search"):
+        results = content.current.cached("search", search.build_index).search(query, SEARCH_LIMIT)
+    if not results:
+        await message.answer(templates.SEARCH_EMPTY.render(query=query), parse_mode="HTML")
+        return
+    lines = [templates.SEARCH_RESULTS.render(query=query)]
+    kb = InlineKeyboardBuilder()
+    for _, doc in results:
+        icon = SEARCH_ICONS[doc.kind]
+        if doc.ref:
+            lines.append(templates.SEARCH_LINK.render(icon=icon, title=doc.title))
+            kb.button(text=f"{icon} {doc.title}", callback_data=router.pack(*doc.ref))
+        else:
+            lines.append(templates.SEARCH_ENTRY.render(icon=icon, title=doc.title, body=doc.body))
+    kb.adjust(1)
+    await message.answer("\n".join(lines), parse_mode="HTML", reply_markup=kb.as_markup())
+
+# результаты одинаковы для всех, поэтому Telegram может кэшировать их у себя INLINE_CACHE_TIME секунд
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "300"))
+
+def inline_index():
+    # кэш ответов живёт вместе с версией контента: счётчики сбрасываются при перезагрузке data/
+    return content.current.cached("inline", inline.build_index)
+
+registry.collect("anatili_inline_cache_hits_total", "counter", lambda: inline_index().hits)
+registry.collect("anatili_inline_cache_misses_total", "counter", lambda: inline_index().misses)
+
+@dp.inline_query()
+async def inline_lookup(query: InlineQuery):
+    with timed("inline"):
+        results, next_offset = inline_index().answer(query.query, query.offset)
+    await query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=False, next_offset=next_offset)
+
+# все callback-кнопки разбирает router: один хендлер вместо цепочки F.data-фильтров
+@dp.callback_query()
+async def on_callback(call: CallbackQuery):
+    await router.dispatch(call)
+
+def topics_screen(c):
     kb = InlineKeyboardBuilder()
-    for t in topics.keys():
-        kb.button(text=t, callback_data=f"topic|{t}")
-    kb.button(text="⬅️ Артқа", callback_data="menu_back")
+    for i, t in enumerate(topic_names):
+        kb.button(text=t, callback_data=router.pack("topic", i))
+    kb.button(text="⬅️ Артқа", callback_data=router.pack("menu_back"))
     kb.adjust(1)
-    await call.message.edit_text("📘 *Quizlet тақырыптары:*", parse_mode="Markdown", reply_markup=kb.as_markup())
+    return dict(text=templates.QUIZLET_TOPICS.render(), parse_mode="HTML", reply_markup=kb.as_markup())
+
+@router.route("W", "menu_words")
+async def show_topics(call: CallbackQuery):
+    await call.message.edit_text(**screen(topics_screen))
     await call.answer()
 
-@dp.callback_query(F.data.startswith("topic|"))
-async def show_subtopics(call: CallbackQuery):
-    topic_name = call.data.split("|")[1]
-    subtopics = topics.get(topic_name, {})
+def subtopics_screen(c, topic_idx):
+    topic_name = topic_names[topic_idx]
     kb = InlineKeyboardBuilder()
-    for sub, link in subtopics.items():
+    for sub, link in topics[topic_name].items():
         kb.button(text=sub, url=link)
-    kb.button(text="⬅️ Артқа", callback_data="menu_words")
+    kb.button(text="⬅️ Артқа", callback_data=router.pack("menu_words"))
     kb.adjust(1)
-    await call.message.edit_text(f"✨ *{topic_name}* тақырыптары:", parse_mode="Markdown", reply_markup=kb.as_markup())
+    return dict(text=templates.QUIZLET_SUBTOPICS.render(topic=topic_name), parse_mode="HTML", reply_markup=kb.as_markup())
+
+@router.route("Q", "topic", "topic")
+async def show_subtopics(call: CallbackQuery, topic_idx):
+    if topic_idx >= len(topic_names):
+        await call.answer()
+        return
+    await call.message.edit_text(**screen(subtopics_screen, topic_idx))
     await call.answer()
 
-@dp.callback_query(F.data == "menu_grammar")
-async def show_grammar_menu(call: CallbackQuery):
-    grammar = GRAMMAR
+def grammar_menu_screen(c):
     kb = InlineKeyboardBuilder()
-    for i, item in enumerate(grammar):
-        kb.button(text=item["title"], callback_data=f"grammar|{i}")
-    kb.button(text="⬅️ Артқа", callback_data="menu_back")
+    for i, item in enumerate(c.grammar):
+        kb.button(text=item.title, callback_data=router.pack("grammar", i))
+    kb.button(text="⬅️ Артқа", callback_data=router.pack("menu_back"))
     kb.adjust(1)
-    await call.message.edit_text("📘 *Грамматика тақырыптары:*", parse_mode="Markdown", reply_markup=kb.as_markup())
+    return dict(text=templates.GRAMMAR_MENU.render(), parse_mode="HTML", reply_markup=kb.as_markup())
+
+@router.route("G", "menu_grammar")
+async def show_grammar_menu(call: CallbackQuery):
+    await call.message.edit_text(**screen(grammar_menu_screen))
     await call.answer()
 
-@dp.callback_query(F.data.startswith("grammar|"))
-async def show_grammar_topic(call: CallbackQuery):
-    idx = int(call.data.split("|")[1])
-    item = GRAMMAR[idx]
+def grammar_topic_screen(c, idx):
+    item = c.grammar[idx]
     kb = InlineKeyboardBuilder()
-    kb.button(text="📖 Оқу", callback_data=f"grammar_file|{idx}")
-    youtube_links = item.get("youtube")
-    if youtube_links:
-        if isinstance(youtube_links, list):
-            for i, link in enumerate(youtube_links, start=1):
-                kb.button(text=f"🎥 Видео {i}", url=link)
-        else:
-            kb.button(text="🎥 Видео", url=youtube_links)
-    kb.button(text="⬅️ Артқа", callback_data="menu_grammar")
+    kb.button(text="📖 Оқу", callback_data=router.pack("grammar_file", idx))
+    if len(item.youtube) == 1:
+        kb.button(text="🎥 Видео", url=item.youtube[0])
+    else:
+        for i, link in enumerate(item.youtube, start=1):
+            kb.button(text=f"🎥 Видео {i}", url=link)
+    media_button(kb, item, "grammar_media", idx)
+    kb.button(text="⬅️ Артқа", callback_data=router.pack("menu_grammar"))
     kb.adjust(1)
-    await call.message.edit_text(
-        f"🧩 <b>{item['title']}</b>\n\n{item['description']}",
+    return dict(
+        text=templates.GRAMMAR_TOPIC.render(title=texts(c)[item.title], description=texts(c)[item.description]),
         parse_mode="HTML",
         reply_markup=kb.as_markup()
     )
+
+@router.route("H", "grammar", "grammar")
+async def show_grammar_topic(call: CallbackQuery, idx):
+    checked(content.current.grammar, idx)
+    await call.message.edit_text(**screen(grammar_topic_screen, idx))
     await call.answer()
 
-@dp.callback_query(F.data.startswith("grammar_file|"))
-async def open_grammar_file(call: CallbackQuery):
-    idx = int(call.data.split("|")[1])
-    item = GRAMMAR[idx]
+@router.route("Y", "grammar_media", "grammar")
+async def show_grammar_media(call: CallbackQuery, idx):
+    grammar = content.current.grammar
+    if idx >= len(grammar):
+        await call.answer()
+        return
+    await send_media(call, grammar[idx], grammar[idx].title)
+
+def page_buttons(kb, route, args, page, total):
+    count = 0
+    if page > 0:
+        kb.button(text="◀️", callback_data=router.pack(route, *args, page - 1))
+        count += 1
+    if page < total - 1:
+        kb.button(text="▶️", callback_data=router.pack(route, *args, page + 1))
+        count += 1
+    return count
+
+def page_counter(page, total):
+    return templates.PAGE_COUNTER.render(page=page + 1, total=total) if total > 1 else ""
+
+def grammar_file_screen(c, idx, page):
+    item = c.grammar[idx]
+    pages = c.cached("pages", build_pages)["grammar"][idx]
     kb = InlineKeyboardBuilder()
-    kb.button(text="⬅️ Артқа", callback_data=f"grammar|{idx}")
-    kb.adjust(1)
-    await call.message.edit_text(f"📘 <b>{item['title']}</b>\n\n{item['file_text']}", parse_mode="HTML", reply_markup=kb.as_markup())
+    nav = page_buttons(kb, "grammar_file", (idx,), page, len(pages))
+    kb.button(text="⬅️ Артқа", callback_data=router.pack("grammar", idx))
+    kb.adjust(*([nav] if nav else []), 1)
+    return dict(
+        text=templates.GRAMMAR_PAGE.render(
+            title=texts(c)[item.title], counter=page_counter(page, len(pages)), page=templates.Markup(pages[page])
+        ),
+        parse_mode="HTML",
+        reply_markup=kb.as_markup()
+    )
+
+@router.route("F", "grammar_file", "grammar", "page", optional=1)
+async def open_grammar_file(call: CallbackQuery, idx, page=0):
+    # страница из старой кнопки: после перезагрузки текст мог стать короче
+    page = min(page, len(checked(content.current.cached("pages", build_pages)["grammar"], idx)) - 1)
+    await call.message.edit_text(**screen(grammar_file_screen, idx, page))
     await call.answer()
 
-@dp.callback_query(F.data == "menu_reading")
-async def show_reading_levels(call: CallbackQuery):
+def reading_levels_screen(c):
     kb = InlineKeyboardBuilder()
-    for i, level in enumerate(READING_TEXTS):
-        kb.button(text=level["level"], callback_data=f"reading_level|{i}")
-    kb.button(text="⬅️ Артқа", callback_data="menu_back")
+    for i, level in enumerate(c.reading_texts):
+        kb.button(text=level.level, callback_data=router.pack("reading_level", i))
+    kb.button(text="⬅️ Артқа", callback_data=router.pack("menu_back"))
     kb.adjust(1)
-    await call.message.edit_text("📖 *Оқу деңгейін таңда:*", parse_mode="Markdown", reply_markup=kb.as_markup())
+    return dict(text=templates.READING_LEVELS.render(), parse_mode="HTML", reply_markup=kb.as_markup())
+
+@router.route("R", "menu_reading")
+async def show_reading_levels(call: CallbackQuery):
+    await call.message.edit_text(**screen(reading_levels_screen))
     await call.answer()
 
-@dp.callback_query(F.data.startswith("reading_level|"))
-async def show_reading_topics(call: CallbackQuery):
-    _, level_idx = call.data.split("|")
-    level_idx = int(level_idx)
-    topics = READING_TEXTS[level_idx]["topics"]
+def reading_topics_screen(c, level_idx):
     kb = InlineKeyboardBuilder()
-    for i, t in enumerate(topics):
-        kb.button(text=t["title"], callback_data=f"reading_text|{level_idx}|{i}")
-    kb.button(text="⬅️ Артқа", callback_data="menu_reading")
+    for i, t in enumerate(c.reading_texts[level_idx].topics):
+        kb.button(text=t.title, callback_data=router.pack("reading_text", level_idx, i))
+    kb.button(text="⬅️ Артқа", callback_data=router.pack("menu_reading"))
     kb.adjust(1)
-    await call.message.edit_text("📘 *Тақырыпты таңда:*", parse_mode="Markdown", reply_markup=kb.as_markup())
+    return dict(text=templates.READING_TOPICS.render(), parse_mode="HTML", reply_markup=kb.as_markup())
+
+@router.route("L", "reading_level", "level")
+async def show_reading_topics(call: CallbackQuery, level_idx):
+    checked(content.current.reading_texts, level_idx)
+    await call.message.edit_text(**screen(reading_topics_screen, level_idx))
     await call.answer()
 
-@dp.callback_query(F.data.startswith("reading_text|"))
-async def show_reading_text(call: CallbackQuery):
-    _, level_idx, topic_idx = call.data.split("|")
-    level_idx, topic_idx = int(level_idx), int(topic_idx)
-    topic = READING_TEXTS[level_idx]["topics"][topic_idx]
+def reading_text_screen(c, level_idx, topic_idx, page):
+    topic = c.reading_texts[level_idx].topics[topic_idx]
+    pages = c.cached("pages", build_pages)["reading"][level_idx][topic_idx]
     kb = InlineKeyboardBuilder()
-    kb.button(text="⬅️ Артқа", callback_data=f"reading_level|{level_idx}")
-    kb.adjust(1)
-    await call.message.edit_text(
-        f"📖 <b>{topic['title']}</b>\n\n{topic['text']}",
+    nav = page_buttons(kb, "reading_text", (level_idx, topic_idx), page, len(pages))
+    kb.button(text="⬅️ Артқа", callback_data=router.pack("reading_level", level_idx))
+    kb.adjust(*([nav] if nav else []), 1)
+    return dict(
+        text=templates.READING_PAGE.render(
+            title=texts(c)[topic.title], counter=page_counter(page, len(pages)), page=templates.Markup(pages[page])
+        ),
         parse_mode="HTML",
         reply_markup=kb.as_markup()
     )
+
+@router.route("X", "reading_text", "level", "topic", "page", optional=1)
+async def show_reading_text(call: CallbackQuery, level_idx, topic_idx, page=0):
+    level = checked(content.current.cached("pages", build_pages)["reading"], level_idx)
+    page = min(page, len(checked(level, topic_idx)) - 1)
+    await call.message.edit_text(**screen(reading_text_screen, level_idx, topic_idx, page))
     await call.answer()
 
 
-@dp.callback_query(F.data == "menu_tasks")
-async def menu_tasks(call: CallbackQuery):
+def tasks_screen(c):
     kb = InlineKeyboardBuilder()
-    kb.button(text="🧩 Сөздер", callback_data="task_words")
-    kb.button(text="📘 Грамматика", callback_data="task_grammar")
-    kb.button(text="📖 Чтение", callback_data="task_reading")
-    kb.button(text="⬅️ Артқа", callback_data="menu_back")
-    kb.adjust(2,1)
-    await call.message.edit_text(
-        "🧠 *Тапсырмалар бөлімі*\n\n"
-        "🧩 Сөздер — сөздік тесттер\n"
-        "📘 Грамматика — сұрақтарға жауап беріңіз\n"
-        "📖 Чтение — мәтіндермен жұмыс\n",
-        parse_mode="Markdown",
+    kb.button(text="🧩 Сөздер", callback_data=router.pack("task_words"))
+    kb.button(text="📘 Грамматика", callback_data=router.pack("task_grammar"))
+    kb.button(text="📖 Чтение", callback_data=router.pack("task_reading"))
+    kb.button(text="🔤 Сөздік", callback_data=router.pack("task_vocab"))
+    kb.button(text="⬅️ Артқа", callback_data=router.pack("menu_back"))
+    kb.adjust(2,2,1)
+    return dict(
+        text=templates.TASKS.render(),
+        parse_mode="HTML",
         reply_markup=kb.as_markup()
     )
+
+@router.route("T", "menu_tasks")
+async def menu_tasks(call: CallbackQuery):
+    await call.message.edit_text(**screen(tasks_screen))
     await call.answer()
 
-def get_user(uid: str):
-    if uid not in user_data:
-        user_data[uid] = {
-            "used_words": [],
-            "used_grammar": [],
+def word_questions(c):
+    return c.cached("word_questions", lambda c: QuestionSet(c.words))
+
+def grammar_questions(c):
+    return c.cached("grammar_questions", lambda c: QuestionSet(c.grammar_tasks))
+
+async def get_user(uid: str):
+    user = await users.fetch(uid)
+    if user is None:
+        user = {
+            "words_done": "",
+            "grammar_done": "",
             "used_reading": {},
             "score": 0,
             "xp": 0
         }
-    user_data[uid].setdefault("used_words", [])
-    user_data[uid].setdefault("used_grammar", [])
-    user_data[uid].setdefault("used_reading", {})
-    user_data[uid].setdefault("score", 0)
-    user_data[uid].setdefault("xp", 0)
-    return user_data[uid]
-
-@dp.callback_query(F.data == "task_words")
+        users.put(uid, user)
+    # старые записи: списки текстов вопросов -> битовые маски по id
+    c = content.current
+    migrated = word_questions(c).migrate(user, "used_words", "words_done")
+    migrated = grammar_questions(c).migrate(user, "used_grammar", "grammar_done") or migrated
+    user.setdefault("words_done", "")
+    user.setdefault("grammar_done", "")
+    user.setdefault("used_reading", {})
+    user.setdefault("score", 0)
+    user.setdefault("xp", 0)
+    migrated = seed_deck(user, word_questions(c), "w", "words_done") or migrated
+    migrated = seed_deck(user, grammar_questions(c), "g", "grammar_done") or migrated
+    if migrated:
+        await save_user_data(uid, user)
+    return user
+
+def seed_deck(user, questions, section, done_key):
+    # записи до интервальных повторений: пройденные вопросы ставятся в колоду один раз
+    if section in user.get("srs", {}):
+        return False
+    bits = get_bits(user, done_key)
+    if not bits:
+        return False
+    srs.seed(srs.deck(user, section), [qid for qid in questions.ids if bits >> qid & 1], srs.now())
+    return True
+
+def pick_question(user, questions, section, done_key):
+    """Сначала просроченные повторения, потом новые вопросы, потом повторение наперёд."""
+    d = srs.deck(user, section)
+    qid = srs.next_due(d, srs.now(), questions.by_id)
+    if qid is None:
+        qid = questions.pick_unanswered(get_bits(user, done_key))
+    if qid is None:
+        qid = srs.earliest(d, questions.by_id)
+    return qid
+
+def record_answer(user, section, done_key, qid, correct):
+    mark(user, done_key, qid)
+    srs.record(srs.deck(user, section), qid, correct, srs.now())
+
+def log_answer(uid, section, item, correct, xp=10):
+    if journal:
+        journal.record(uid, section, item, correct, xp if correct else 0)
+
+def award(call, uid, user, xp=10):
+    # имя нужно только для таблицы рейтинга
+    user["name"] = call.from_user.first_name
+    leaderboards.add_xp(uid, user, xp)
+    user["score"] += 1
+
+@router.route("A", "task_words", lock=True)
 async def task_words(call: CallbackQuery):
-    data = WORDS.get("words_tasks", [])
+    questions = word_questions(content.current)
     uid = str(call.from_user.id)
-    user = get_user(uid)
+    user = await get_user(uid)
 
-    available = [i for i, q in enumerate(data) if q["question"] not in user["used_words"]]
-    if not available:
+    qid = pick_question(user, questions, "w", "words_done")
+    if qid is None:
         await call.message.edit_text("✅ Барлық сөздер сұрақтары өтілді!", reply_markup=main_menu())
         await call.answer()
         return
 
-    q_index = random.choice(available)
-    q = data[q_index]
-    user["used_words"].append(q["question"])
-    save_user_data(user_data)
+    q = questions.by_id[qid]
+    user["pending"] = f"w{qid}"
+    await save_user_data(uid, user)
+
+    kb = InlineKeyboardBuilder()
+    for opt_index, opt in enumerate(q.options):
+        kb.button(text=opt, callback_data=router.pack("task_words_answer", qid, opt_index))
+    kb.button(text="⬅️ Артқа", callback_data=router.pack("menu_tasks"))
+    kb.adjust(1)
+    text = templates.WORD_QUESTION.render(question=texts(content.current)[q.question])
+    await call.message.edit_text(text, parse_mode="HTML", reply_markup=kb.as_markup())
+    await call.answer()
+
+@router.route("B", "task_words_answer", "question", "option", lock=True)
+async def task_words_answer(call: CallbackQuery, qid, opt_index):
+    q = word_questions(content.current).by_id.get(qid)
+    if q is None or opt_index >= len(q.options):
+        await call.answer()
+        return
+    is_correct = opt_index == q.correct
+    correct = q.options[q.correct]
+
+    uid = str(call.from_user.id)
+    user = await get_user(uid)
+    # ответ засчитывается один раз: двойной тап по кнопке ничего не начисляет
+    if user.get("pending") != f"w{qid}":
+        await call.answer()
+        return
+    del user["pending"]
+    record_answer(user, "w", "words_done", qid, is_correct)
+
+    if is_correct:
+        award(call, uid, user)
+        text = templates.RIGHT.render(answer=texts(content.current)[correct], xp=10)
+    else:
+        text = templates.WRONG.render(answer=texts(content.current)[correct])
+
+    await save_user_data(uid, user)
+    log_answer(uid, "w", qid, is_correct)
 
     kb = InlineKeyboardBuilder()
-    for opt_index, opt in enumerate(q["options"]):
-        kb.button(text=opt, callback_data=f"task_words_answer|{q_index}|{opt_index}")
-    kb.button(text="⬅️ Артқа", callback_data="menu_tasks")
+    if not is_correct:
+        kb.button(text="🔄 Қайтадан", callback_data=router.pack("task_words"))
+    kb.button(text="▶️ Келесі", callback_data=router.pack("task_words"))
+    kb.button(text="⬅️ Артқа", callback_data=router.pack("menu_tasks"))
     kb.adjust(1)
-    await call.message.edit_text(f"🧩 *{q['question']}*", parse_mode="Markdown", reply_markup=kb.as_markup())
+    await call.message.edit_text(text, parse_mode="HTML", reply_markup=kb.as_markup())
     await call.answer()
 
-@dp.callback_query(F.data.startswith("task_words_answer|"))
-async def task_words_answer(call: CallbackQuery):
-    _, q_index, opt_index = call.data.split("|")
-    q_index, opt_index = int(q_index), int(opt_index)
-    q = WORDS["words_tasks"][q_index]
-    chosen = q["options"][opt_index]
-    correct = q["correct"]
+VOCAB_TITLES = {
+    quiz.KZ_RU: "Аудармасын таңда",
+    quiz.RU_KZ: "Қазақша қалай болады?",
+    quiz.CLOZE: "Бос орынды толтыр",
+}
 
+@router.route("V", "task_vocab", lock=True)
+async def task_vocab(call: CallbackQuery):
+    bank = content.current.cached("quiz", quiz.build_bank)
+    if not bank:
+        await call.message.edit_text("Сөздік бос.", reply_markup=main_menu())
+        await call.answer()
+        return
     uid = str(call.from_user.id)
-    user = get_user(uid)
+    user = await get_user(uid)
+
+    # сначала слова, которые пора повторить, иначе случайное слово словаря
+    due = srs.next_due(srs.deck(user, "v", key=str), srs.now(), bank.index)
+    q = bank.generate(None if due is None else bank.index[due])
+    user["pending"] = f"v{q.kind}.{bank.kz[q.word]}"
+    await save_user_data(uid, user)
+
+    kb = InlineKeyboardBuilder()
+    for word_idx, opt in q.options:
+        kb.button(text=opt, callback_data=router.pack("task_vocab_answer", q.kind, q.word, word_idx))
+    kb.button(text="⬅️ Артқа", callback_data=router.pack("menu_tasks"))
+    kb.adjust(1)
+    # prompt задания «вставь слово» собирается на лету и экранируется здесь же
+    t = texts(content.current)
+    text = templates.VOCAB_QUESTION.render(title=VOCAB_TITLES[q.kind], prompt=t[q.prompt])
+    if q.hint:
+        text += templates.VOCAB_HINT.render(hint=t[q.hint])
+    await call.message.edit_text(text, parse_mode="HTML", reply_markup=kb.as_markup())
+    await call.answer()
 
-    if chosen == correct:
-        user["xp"] += 10
-        user["score"] += 1
-        text = f"✅ Дұрыс! *{correct}* (+10 XP)"
+@router.route("U", "task_vocab_answer", "kind", "word", "option", lock=True)
+async def task_vocab_answer(call: CallbackQuery, kind, word_idx, chosen):
+    bank = content.current.cached("quiz", quiz.build_bank)
+    if kind not in VOCAB_TITLES or word_idx >= len(bank.words) or chosen >= len(bank.words):
+        await call.answer()
+        return
+    uid = str(call.from_user.id)
+    user = await get_user(uid)
+    # номер слова в кнопке сверяется со словом вопроса: после перезагрузки words.json он мог сдвинуться
+    w = bank.words[word_idx]
+    if user.get("pending") != f"v{kind}.{w.kz}":
+        await call.answer()
+        return
+    del user["pending"]
+
+    is_correct = bank.is_correct(kind, word_idx, chosen)
+    srs.record(srs.deck(user, "v", key=str), w.kz, is_correct, srs.now())
+    t = texts(content.current)
+    if is_correct:
+        award(call, uid, user, xp=5)
+        text = templates.VOCAB_RIGHT.render(kz=t[w.kz], ru=t[w.ru], xp=5)
     else:
-        text = f"❌ Қате. Дұрыс жауап: *{correct}*"
+        text = templates.VOCAB_WRONG.render(kz=t[w.kz], ru=t[w.ru])
+    if w.example:
+        text += templates.EXAMPLE.render(example=t[w.example])
 
-    save_user_data(user_data)
+    await save_user_data(uid, user)
+    log_answer(uid, "v", w.kz, is_correct, xp=5)
 
     kb = InlineKeyboardBuilder()
-    if chosen != correct:
-        kb.button(text="🔄 Қайтадан", callback_data="task_words")
-    kb.button(text="▶️ Келесі", callback_data="task_words")
-    kb.button(text="⬅️ Артқа", callback_data="menu_tasks")
+    media_button(kb, w, "word_media", word_idx)
+    kb.button(text="▶️ Келесі", callback_data=router.pack("task_vocab"))
+    kb.button(text="⬅️ Артқа", callback_data=router.pack("menu_tasks"))
     kb.adjust(1)
-    await call.message.edit_text(text, parse_mode="Markdown", reply_markup=kb.as_markup())
+    await call.message.edit_text(text, parse_mode="HTML", reply_markup=kb.as_markup())
     await call.answer()
 
-@dp.callback_query(F.data == "task_grammar")
+@router.route("I", "word_media", "word")
+async def show_word_media(call: CallbackQuery, word_idx):
+    words = content.current.vocabulary
+    if word_idx >= len(words):
+        await call.answer()
+        return
+    await send_media(call, words[word_idx], f"{words[word_idx].kz} — {words[word_idx].ru}")
+
+@router.route("C", "task_grammar", lock=True)
 async def task_grammar(call: CallbackQuery):
-    data = load_json("grammar_tasks.json")
+    questions = grammar_questions(content.current)
     uid = str(call.from_user.id)
-    user = get_user(uid)
+    user = await get_user(uid)
 
-    available = [i for i, q in enumerate(data) if q["question"] not in user["used_grammar"]]
-    if not available:
+    qid = pick_question(user, questions, "g", "grammar_done")
+    if qid is None:
         await call.message.edit_text("✅ Барлық грамматика сұрақтары өтілді!", reply_markup=main_menu())
         await call.answer()
         return
 
-    q_index = random.choice(available)
-    q = data[q_index]
-    user["used_grammar"].append(q["question"])
-    save_user_data(user_data)
+    q = questions.by_id[qid]
+    user["pending"] = f"g{qid}"
+    await save_user_data(uid, user)
 
     kb = InlineKeyboardBuilder()
-    for opt_index, opt in enumerate(q["options"]):
-        kb.button(text=opt, callback_data=f"task_grammar_answer|{q_index}|{opt_index}")
-    kb.button(text="⬅️ Артқа", callback_data="menu_tasks")
+    for opt_index, opt in enumerate(q.options):
+        kb.button(text=opt, callback_data=router.pack("task_grammar_answer", qid, opt_index))
+    kb.button(text="⬅️ Артқа", callback_data=router.pack("menu_tasks"))
     kb.adjust(1)
-    await call.message.edit_text(f"📘 *{q['question']}*", parse_mode="Markdown", reply_markup=kb.as_markup())
+    text = templates.GRAMMAR_QUESTION.render(question=texts(content.current)[q.question])
+    await call.message.edit_text(text, parse_mode="HTML", reply_markup=kb.as_markup())
     await call.answer()
 
-@dp.callback_query(F.data.startswith("task_grammar_answer|"))
-async def task_grammar_answer(call: CallbackQuery):
-    _, q_index, opt_index = call.data.split("|")
-    q_index, opt_index = int(q_index), int(opt_index)
-    data = load_json("grammar_tasks.json")
-    q = data[q_index]
-    chosen = q["options"][opt_index]
-    correct = q["answer"]
+@router.route("D", "task_grammar_answer", "question", "option", lock=True)
+async def task_grammar_answer(call: CallbackQuery, qid, opt_index):
+    q = grammar_questions(content.current).by_id.get(qid)
+    if q is None or opt_index >= len(q.options):
+        await call.answer()
+        return
+    is_correct = opt_index == q.correct
+    correct = q.options[q.correct]
 
     uid = str(call.from_user.id)
-    user = get_user(uid)
+    user = await get_user(uid)
+    # ответ засчитывается один раз: двойной тап по кнопке ничего не начисляет
+    if user.get("pending") != f"g{qid}":
+        await call.answer()
+        return
+    del user["pending"]
+    record_answer(user, "g", "grammar_done", qid, is_correct)
 
-    if chosen == correct:
-        user["xp"] += 10
-        user["score"] += 1
-        text = f"✅ Дұрыс! *{correct}* (+10 XP)"
+    if is_correct:
+        award(call, uid, user)
+        text = templates.RIGHT.render(answer=texts(content.current)[correct], xp=10)
     else:
-        text = f"❌ Қате. Дұрыс жауап: *{correct}*"
+        text = templates.WRONG.render(answer=texts(content.current)[correct])
 
-    save_user_data(user_data)
+    await save_user_data(uid, user)
+    log_answer(uid, "g", qid, is_correct)
 
     kb = InlineKeyboardBuilder()
-    if chosen != correct:
-        kb.button(text="🔄 Қайтадан", callback_data="task_grammar")
-    kb.button(text="▶️ Келесі", callback_data="task_grammar")
-    kb.button(text="⬅️ Артқа", callback_data="menu_tasks")
+    if not is_correct:
+        kb.button(text="🔄 Қайтадан", callback_data=router.pack("task_grammar"))
+    kb.button(text="▶️ Келесі", callback_data=router.pack("task_grammar"))
+    kb.button(text="⬅️ Артқа", callback_data=router.pack("menu_tasks"))
     kb.adjust(1)
-    await call.message.edit_text(text, parse_mode="Markdown", reply_markup=kb.as_markup())
+    await call.message.edit_text(text, parse_mode="HTML", reply_markup=kb.as_markup())
     await call.answer()
 
-@dp.callback_query(F.data == "task_reading")
-async def task_reading(call: CallbackQuery):
+# прогресс по теме: used_reading[id темы] = [номер текущего задания, ошибок, когда пройдена (0 — нет)]
+def reading_key(topic, topic_idx):
+    return topic.id or str(topic_idx)
+
+def reading_progress(user, topic, topic_idx):
+    progress = user["used_reading"].get(reading_key(topic, topic_idx))
+    if not isinstance(progress, list) or len(progress) != 3:
+        return [0, 0, 0]
+    # в новой версии контента заданий могло стать меньше: если решены все оставшиеся, тема
+    # пройдена (1 — время неизвестно), иначе «Жалғастыру» вёл бы обратно на этот же экран
+    task = min(progress[0], len(topic.tasks))
+    finished = progress[2] or int(task == len(topic.tasks))
+    return [task, progress[1], finished]
+
+def reading_status(progress, topic):
+    task, mistakes, finished = progress
+    if finished:
+        return "✅"
+    if task:
+        return f"⏯ {task}/{len(topic.tasks)}"
+    return ""
+
+def reading_tasks_screen(c, user):
     kb = InlineKeyboardBuilder()
-    for i, topic in enumerate(READING_TASKS):
-        kb.button(text=topic["title"], callback_data=f"task_reading_topic|{i}")
-    kb.button(text="⬅️ Артқа", callback_data="menu_tasks")
+    for i, topic in enumerate(c.reading_tasks):
+        # статус темы — одна запись used_reading, задания не перебираются
+        status = reading_status(reading_progress(user, topic, i), topic)
+        kb.button(text=f"{status} {topic.title}".strip(), callback_data=router.pack("task_reading_topic", i))
+    kb.button(text="⬅️ Артқа", callback_data=router.pack("menu_tasks"))
     kb.adjust(1)
-    await call.message.edit_text("🧠 *Reading – задания:*", parse_mode="Markdown", reply_markup=kb.as_markup())
+    return dict(text=templates.READING_TASKS.render(), parse_mode="HTML", reply_markup=kb.as_markup())
+
+@router.route("E", "task_reading")
+async def task_reading(call: CallbackQuery):
+    user = await get_user(str(call.from_user.id))
+    await call.message.edit_text(**reading_tasks_screen(content.current, user))
     await call.answer()
 
-@dp.callback_query(F.data.startswith("task_reading_topic|"))
-async def task_reading_topic(call: CallbackQuery):
-    _, topic_idx = call.data.split("|")
-    topic_idx = int(topic_idx)
+def reading_task_topic_screen(c, user, topic_idx):
+    topic = c.reading_tasks[topic_idx]
+    task, mistakes, finished = reading_progress(user, topic, topic_idx)
     kb = InlineKeyboardBuilder()
-    kb.button(text="▶️ Бастау", callback_data=f"task_reading_question|{topic_idx}|0")
-    kb.button(text="⬅️ Артқа", callback_data="task_reading")
+    text = templates.READING_TASK_TOPIC.render(title=texts(c)[topic.title], id=texts(c)[topic.id])
+    if finished:
+        text += templates.READING_TOPIC_DONE.render(total=len(topic.tasks), mistakes=mistakes)
+        kb.button(text="🔄 Қайта бастау", callback_data=router.pack("task_reading_restart", topic_idx))
+    elif task:
+        text += templates.READING_TOPIC_STARTED.render(done=task, total=len(topic.tasks))
+        kb.button(text="⏯ Жалғастыру", callback_data=router.pack("task_reading_question", topic_idx, task))
+        kb.button(text="🔄 Қайта бастау", callback_data=router.pack("task_reading_restart", topic_idx))
+    else:
+        kb.button(text="▶️ Бастау", callback_data=router.pack("task_reading_question", topic_idx, 0))
+    kb.button(text="⬅️ Артқа", callback_data=router.pack("task_reading"))
     kb.adjust(1)
-    topic = READING_TASKS[topic_idx]
-    await call.message.edit_text(f"📘 <b>{topic['title']}</b>\n\n{topic.get('id','')}", parse_mode="HTML", reply_markup=kb.as_markup())
+    return dict(text=text, parse_mode="HTML", reply_markup=kb.as_markup())
+
+@router.route("J", "task_reading_topic", "topic")
+async def task_reading_topic(call: CallbackQuery, topic_idx):
+    checked(content.current.reading_tasks, topic_idx)
+    user = await get_user(str(call.from_user.id))
+    await call.message.edit_text(**reading_task_topic_screen(content.current, user, topic_idx))
     await call.answer()
 
-@dp.callback_query(F.data.startswith("task_reading_question|"))
-async def task_reading_question(call: CallbackQuery):
-    _, topic_idx, task_idx = call.data.split("|")
-    topic_idx, task_idx = int(topic_idx), int(task_idx)
-    topic = READING_TASKS[topic_idx]
-    task = topic["tasks"][task_idx]
+async def ask_reading_task(call, uid, user, topic_idx):
+    topic = content.current.reading_tasks[topic_idx]
+    task_idx = reading_progress(user, topic, topic_idx)[0]
+    if task_idx >= len(topic.tasks):
+        # тема уже пройдена (старая кнопка «Келесі»): показываем итог
+        await call.message.edit_text(**reading_task_topic_screen(content.current, user, topic_idx))
+        await call.answer()
+        return
+    task = topic.tasks[task_idx]
+    user["pending"] = f"r{topic_idx}.{task_idx}"
+    await save_user_data(uid, user)
     kb = InlineKeyboardBuilder()
-    for opt_idx, opt in enumerate(task["options"]):
-        kb.button(text=opt, callback_data=f"task_reading_answer|{topic_idx}|{task_idx}|{opt_idx}")
-    kb.button(text="⬅️ Артқа", callback_data="task_reading")
+    for opt_idx, opt in enumerate(task.options):
+        kb.button(text=opt, callback_data=router.pack("task_reading_answer", topic_idx, task_idx, opt_idx))
+    kb.button(text="⬅️ Артқа", callback_data=router.pack("task_reading"))
     kb.adjust(1)
-    await call.message.edit_text(f"📝 {task['question']}", parse_mode="Markdown", reply_markup=kb.as_markup())
+    text = templates.READING_QUESTION.render(
+        number=task_idx + 1, total=len(topic.tasks), question=texts(content.current)[task.question]
+    )
+    await call.message.edit_text(text, parse_mode="HTML", reply_markup=kb.as_markup())
     await call.answer()
 
-@dp.callback_query(F.data.startswith("task_reading_answer|"))
-async def task_reading_answer(call: CallbackQuery):
-    _, topic_idx, task_idx, opt_idx = call.data.split("|")
-    topic_idx, task_idx, opt_idx = int(topic_idx), int(task_idx), int(opt_idx)
-    topic = READING_TASKS[topic_idx]
-    task = topic["tasks"][task_idx]
+@router.route("K", "task_reading_question", "topic", "task", lock=True)
+async def task_reading_question(call: CallbackQuery, topic_idx, task_idx):
+    # номер задания в кнопке может быть устаревшим: продолжаем с сохранённого
+    checked(content.current.reading_tasks, topic_idx)
+    uid = str(call.from_user.id)
+    await ask_reading_task(call, uid, await get_user(uid), topic_idx)
+
+@router.route("S", "task_reading_restart", "topic", lock=True)
+async def task_reading_restart(call: CallbackQuery, topic_idx):
+    topic = checked(content.current.reading_tasks, topic_idx)
+    uid = str(call.from_user.id)
+    user = await get_user(uid)
+    user["used_reading"].pop(reading_key(topic, topic_idx), None)
+    await ask_reading_task(call, uid, user, topic_idx)
+
+@router.route("N", "task_reading_answer", "topic", "task", "option", lock=True)
+async def task_reading_answer(call: CallbackQuery, topic_idx, task_idx, opt_idx):
+    topic = checked(content.current.reading_tasks, topic_idx)
+    if task_idx >= len(topic.tasks) or opt_idx >= len(topic.tasks[task_idx].options):
+        await call.answer()
+        return
+    task = topic.tasks[task_idx]
     uid = str(call.from_user.id)
-    user = get_user(uid)
-
-    correct_index = task["correct_option"]
-    if opt_idx == correct_index:
-        user["xp"] += 10
-        user["score"] += 1
-        text = f"✅ Дұрыс! *{task['options'][correct_index]}* (+10 XP)"
-        next_idx = task_idx + 1
+    user = await get_user(uid)
+    if user.get("pending") != f"r{topic_idx}.{task_idx}":
+        await call.answer()
+        return
+    del user["pending"]
+
+    correct_index = task.correct
+    is_correct = opt_idx == correct_index
+    # верный ответ двигает тему к следующему заданию, после ошибки то же задание можно решить заново
+    progress = reading_progress(user, topic, topic_idx)
+    if is_correct:
+        progress[0] = task_idx + 1
+        if progress[0] >= len(topic.tasks):
+            progress[2] = int(datetime.datetime.now().timestamp())
     else:
-        text = f"❌ Қате. Дұрыс жауап: *{task['options'][correct_index]}*"
-        next_idx = task_idx
+        progress[1] += 1
+    user["used_reading"][reading_key(topic, topic_idx)] = progress
+    answer = texts(content.current)[task.options[correct_index]]
+    if is_correct:
+        award(call, uid, user)
+        text = templates.RIGHT.render(answer=answer, xp=10)
+    else:
+        text = templates.WRONG.render(answer=answer)
+    if progress[2]:
+        text += templates.READING_FINISHED.render(total=len(topic.tasks), mistakes=progress[1])
 
-    save_user_data(user_data)
+    await save_user_data(uid, user)
+    log_answer(uid, "r", f"{topic_idx}.{task_idx}", is_correct)
 
     kb = InlineKeyboardBuilder()
-    if opt_idx != correct_index:
-        kb.button(text="🔄 Қайтадан", callback_data=f"task_reading_question|{topic_idx}|{task_idx}")
-    elif next_idx < len(topic["tasks"]):
-        kb.button(text="▶️ Келесі", callback_data=f"task_reading_question|{topic_idx}|{next_idx}")
+    if not is_correct:
+        kb.button(text="🔄 Қайтадан", callback_data=router.pack("task_reading_question", topic_idx, task_idx))
+    elif progress[2]:
+        kb.button(text="✅ Аяқтау", callback_data=router.pack("task_reading"))
     else:
-        kb.button(text="✅ Аяқтау", callback_data="task_reading")
-    kb.button(text="⬅️ Артқа", callback_data="task_reading")
+        kb.button(text="▶️ Келесі", callback_data=router.pack("task_reading_question", topic_idx, progress[0]))
+    kb.button(text="⬅️ Артқа", callback_data=router.pack("task_reading"))
     kb.adjust(1)
-    await call.message.edit_text(text, parse_mode="Markdown", reply_markup=kb.as_markup())
+    await call.message.edit_text(text, parse_mode="HTML", reply_markup=kb.as_markup())
     await call.answer()
 
 
-@dp.callback_query(F.data == "menu_progress")
+def rank_text(board, user):
+    rank = board.rank(user)
+    # store догоняет запись с интервалом сброса: новичка в нём может ещё не быть
+    return f"{rank} / {max(len(board), rank)}" if rank else "—"
+
+def rank_texts(user):
+    # запросы к store; вызывается через store_call
+    return rank_text(leaderboards.board(True), user), rank_text(leaderboards.board(False), user)
+
+@router.route("P", "menu_progress")
 async def progress(call: CallbackQuery):
     uid = str(call.message.chat.id)
-    d = get_user(uid)
+    d = await get_user(uid)
     lvl = "🥉 Бастауыш" if d["xp"] < 50 else ("🥈 Орта" if d["xp"] < 150 else "🥇 Жетік")
     bar = "█" * min(10, d["xp"] // 10) + "░" * (10 - min(10, d["xp"] // 10))
     kb = InlineKeyboardBuilder()
-    kb.button(text="⬅️ Артқы", callback_data="menu_back")
+    kb.button(text="🏆 Рейтинг", callback_data=router.pack("leaderboard", 1))
+    kb.button(text="⬅️ Артқы", callback_data=router.pack("menu_back"))
     kb.adjust(1)
+    answers = ""
+    if journal:
+        a = journal.stats(uid)
+        if a.answers:
+            answers = templates.PROGRESS_ANSWERS.render(answers=a.answers, percent=a.correct * 100 // a.answers)
+    week_rank, total_rank = await store_call(store, rank_texts, d)
     await call.message.edit_text(
-        f"📊 *Сенің нәтижелерің:*\n\n"
-        f"🏆 Ұпай: {d['score']}\n🔥 XP: {d['xp']}\n{bar}\n📈 Деңгей: {lvl}",
-        parse_mode="Markdown",
+        templates.PROGRESS.render(
+            score=d["score"], xp=d["xp"], bar=bar, level=lvl, answers=answers,
+            week_rank=week_rank, total_rank=total_rank,
+        ),
+        parse_mode="HTML",
         reply_markup=kb.as_markup()
     )
     await call.answer()
 
-@dp.callback_query(F.data == "menu_back")
+@router.route("O", "leaderboard", "weekly")
+async def show_leaderboard(call: CallbackQuery, weekly):
+    board = leaderboards.board(weekly)
+    uid = str(call.from_user.id)
+    user = await get_user(uid)
+    top, rank = await store_call(store, lambda: (board.top(LEADERBOARD_SIZE), board.rank(user)))
+    lines = [templates.LEADERBOARD.render(title="Апта рейтингі" if weekly else "Жалпы рейтинг")]
+    for place, (other, name, xp) in enumerate(top, start=1):
+        row = templates.LEADERBOARD_ROW_MINE if other == uid else templates.LEADERBOARD_ROW
+        lines.append(row.render(place=place, name=name or f"#{other}", xp=xp))
+    if not top:
+        lines.append(templates.LEADERBOARD_EMPTY.render())
+    if rank and rank > LEADERBOARD_SIZE:
+        lines.append(templates.LEADERBOARD_MINE.render(place=rank, xp=board.xp_of(user)))
+    kb = InlineKeyboardBuilder()
+    kb.button(text="🌍 Жалпы" if weekly else "🗓 Апта", callback_data=router.pack("leaderboard", int(not weekly)))
+    kb.button(text="⬅️ Артқа", callback_data=router.pack("menu_progress"))
+    kb.adjust(1)
+    await call.message.edit_text("\n".join(lines), parse_mode="HTML", reply_markup=kb.as_markup())
+    await call.answer()
+
+@router.route("M", "menu_back")
 async def go_back(call: CallbackQuery):
-    await call.message.edit_text("🏠 *Басты меню*", parse_mode="Markdown", reply_markup=main_menu())
+    await call.message.edit_text(**screen(main_screen))
     await call.answer()
 
-async def main():
-    print("🚀 Bot is running...")
+def webhook_app():
+    app = web.Application()
+    # проверяет X-Telegram-Bot-Api-Secret-Token, сразу отвечает 200 и обрабатывает апдейт в фоне
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=WEBHOOK_SECRET).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    return app
+
+async def run_webhook():
+    if not WEBHOOK_URL:
+        raise RuntimeError("BOT_MODE=webhook requires WEBHOOK_URL")
+    if not WEBHOOK_SECRET:
+        raise RuntimeError("BOT_MODE=webhook requires WEBHOOK_SECRET")
+    runner = web.AppRunner(webhook_app())
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+    await bot.set_webhook(
+        WEBHOOK_URL,
+        secret_token=WEBHOOK_SECRET,
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+
+async def run_polling():
+    # после режима webhook getUpdates не работает, пока вебхук не снят
+    await bot.delete_webhook()
+    # start_polling сам ловит SIGTERM/SIGINT и выходит штатно
     await dp.start_polling(bot)
 
+async def main():
+    print(f"🚀 Bot is running ({BOT_MODE})...")
+    if writer:
+        writer.start()
+    if journal:
+        journal.start()
+    warmer = None
+    if MEDIA_WARM_CHAT:
+        warmer = asyncio.create_task(assets.warm(bot, int(MEDIA_WARM_CHAT), media_names(content.current)))
+    watcher = asyncio.create_task(content.watch(CONTENT_RELOAD_INTERVAL))
+    broadcaster = deliveries = None
+    if BROADCAST_AT:
+        # с общим store рассылку ведёт один процесс (аренда в Redis), журнал доставки общий
+        lease = RedisLease(store.client, "broadcast") if store.shared else None
+        deliveries = RedisDeliveryLog(store.client) if store.shared else DeliveryLog(BROADCAST_DB)
+        broadcast = Broadcast(bot, store, deliveries, BROADCAST_RATE, BROADCAST_CONCURRENCY)
+        broadcaster = asyncio.create_task(run_daily(broadcast, content, BROADCAST_AT, lease=lease))
+    metrics_runner = None
+    if METRICS_PORT:
+        metrics_runner = web.AppRunner(metrics_app(), access_log=None)
+        await metrics_runner.setup()
+        await web.TCPSite(metrics_runner, METRICS_HOST, METRICS_PORT).start()
+    try:
+        if BOT_MODE == "webhook":
+            await run_webhook()
+        else:
+            await run_polling()
+    finally:
+        watcher.cancel()
+        if warmer:
+            warmer.cancel()
+        if broadcaster:
+            broadcaster.cancel()
+            try:
+                await broadcaster
+            except asyncio.CancelledError:
+                pass
+            deliveries.close()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        if writer:
+            await writer.stop()
+        store.close()
+        if journal:
+            await journal.stop()
+            journal.close()
+
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,145 @@
+import time
+import bisect
+import contextlib
+from collections import defaultdict, Counter
+
+from aiohttp import web
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+MAX_LABELS = 100  # callback_data приходит от клиента, не даём ей раздуть число серий
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+class Metrics:
+    def __init__(self):
+        self.handlers = defaultdict(Histogram)  # префикс callback_data / команда
+        self.handler_errors = Counter()
+        self.sections = defaultdict(Histogram)  # storage, store_flush, content_load, api:<метод>
+        self.section_errors = Counter()
+        self.in_flight = 0
+        self.collected = {}  # имя -> (counter/gauge, функция без аргументов), значения снимаются при отдаче
+
+    def collect(self, name, kind, read):
+        self.collected[name] = (kind, read)
+
+    def label(self, name):
+        if name in self.handlers or len(self.handlers) < MAX_LABELS:
+            return name
+        return "other"
+
+    @contextlib.contextmanager
+    def timed(self, section):
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.section_errors[section] += 1
+            raise
+        finally:
+            self.sections[section].observe(time.perf_counter() - start)
+
+    def render(self):
+        lines = []
+        _histograms(lines, "anatili_handler_seconds", "handler", self.handlers)
+        _counters(lines, "anatili_handler_errors_total", "handler", self.handler_errors)
+        _histograms(lines, "anatili_section_seconds", "section", self.sections)
+        _counters(lines, "anatili_section_errors_total", "section", self.section_errors)
+        lines.append("# TYPE anatili_updates_in_flight gauge")
+        lines.append(f"anatili_updates_in_flight {self.in_flight}")
+        for name, (kind, read) in sorted(self.collected.items()):
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {read()}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _histograms(lines, name, label, histograms):
+    lines.append(f"# TYPE {name} histogram")
+    for key, h in sorted(histograms.items()):
+        key = _escape(key)
+        total = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), h.counts):
+            total += count
+            lines.append(f'{name}_bucket{{{label}="{key}",le="{bound}"}} {total}')
+        lines.append(f'{name}_sum{{{label}="{key}"}} {h.sum}')
+        lines.append(f'{name}_count{{{label}="{key}"}} {h.count}')
+
+
+def _counters(lines, name, label, counters):
+    lines.append(f"# TYPE {name} counter")
+    for key, value in sorted(counters.items()):
+        lines.append(f'{name}{{{label}="{_escape(key)}"}} {value}')
+
+
+registry = Metrics()
+timed = registry.timed
+
+
+def update_label(update, callback_label=None):
+    if update.callback_query:
+        data = update.callback_query.data or ""
+        return callback_label(data) if callback_label else data.split("|")[0]
+    if update.message:
+        text = update.message.text or ""
+        return text.split()[0].split("@")[0] if text.startswith("/") else "message"
+    return update.event_type
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Outer-middleware на dp.update: гистограмма времени, ошибки и апдейты в обработке."""
+
+    def __init__(self, metrics=registry, callback_label=None):
+        self.metrics = metrics
+        self.callback_label = callback_label  # callback_data -> имя маршрута
+
+    async def __call__(self, handler, event, data):
+        metrics = self.metrics
+        label = metrics.label(update_label(event, self.callback_label))
+        metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except BaseException:
+            metrics.handler_errors[label] += 1
+            raise
+        finally:
+            metrics.in_flight -= 1
+            metrics.handlers[label].observe(time.perf_counter() - start)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Время исходящих запросов к Bot API по методам."""
+
+    def __init__(self, metrics=registry):
+        self.metrics = metrics
+
+    async def __call__(self, make_request, bot, method):
+        with self.metrics.timed("api:" + type(method).__name__):
+            return await make_request(bot, method)
+
+
+def metrics_app(metrics=registry):
+    async def handle(request):
+        return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    return app
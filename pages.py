@@ -0,0 +1,79 @@
+import re
+
+# Telegram режет сообщения длиннее 4096 символов; оставляем запас под заголовок и номер страницы
+PAGE_LIMIT = 3500
+
+TAG = re.compile(r"<(/?)([a-zA-Z][a-zA-Z0-9-]*)[^>]*>")
+TOKEN = re.compile(r"<[^>]+>|\s+|[^<\s]+")
+
+
+def visible_len(text):
+    return len(TAG.sub("", text))
+
+
+def _cut_long(block, limit):
+    """Режет абзац длиннее limit по строкам, затем по словам; теги не разрываются."""
+    if visible_len(block) <= limit:
+        return [block]
+    lines = block.split("\n")
+    if len(lines) > 1:
+        return [part for chunk in _pack(lines, "\n", limit) for part in _cut_long(chunk, limit)]
+    parts, current, size = [], "", 0
+    for token in TOKEN.findall(block):
+        length = 0 if token.startswith("<") else len(token)
+        while length > limit:
+            # одно «слово» длиннее страницы — режем как есть
+            room = limit - size
+            current += token[:room]
+            parts.append(current)
+            token, current, size = token[room:], "", 0
+            length = len(token)
+        if size + length > limit and current.strip():
+            parts.append(current.rstrip())
+            current, size = "", 0
+            if token.isspace():
+                continue
+        current += token
+        size += length
+    if current.strip():
+        parts.append(current)
+    return parts
+
+
+def _pack(blocks, sep, limit):
+    pages, current, size = [], [], 0
+    for block in blocks:
+        length = visible_len(block)
+        if current and size + len(sep) + length > limit:
+            pages.append(sep.join(current))
+            current, size = [], 0
+        size += length + (len(sep) if current else 0)
+        current.append(block)
+    if current:
+        pages.append(sep.join(current))
+    return pages
+
+
+def _balance(pages):
+    """Теги, открытые на одной странице, закрываются в её конце и открываются заново на следующей."""
+    result, open_tags = [], []
+    for page in pages:
+        prefix = "".join(tag for _, tag in open_tags)
+        for m in TAG.finditer(page):
+            closing, name = m.group(1), m.group(2).lower()
+            if not closing:
+                open_tags.append((name, m.group(0)))
+                continue
+            for i in range(len(open_tags) - 1, -1, -1):
+                if open_tags[i][0] == name:
+                    del open_tags[i]
+                    break
+        suffix = "".join(f"</{name}>" for name, _ in reversed(open_tags))
+        result.append(prefix + page + suffix)
+    return result
+
+
+def split_html(text, limit=PAGE_LIMIT):
+    """Делит HTML-текст на страницы по абзацам, не длиннее limit видимых символов."""
+    blocks = [part for block in text.split("\n\n") for part in _cut_long(block, limit)]
+    return _balance(_pack(blocks, "\n\n", limit)) or [""]
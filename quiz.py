@@ -0,0 +1,130 @@
+import re
+import random
+
+# Вопросы по словарю (words.json), которые собираются на лету:
+#   KZ_RU — казахское слово, выбрать перевод
+#   RU_KZ — перевод, выбрать казахское слово
+#   CLOZE — пропуск в примере, выбрать слово
+# Неверные варианты берутся из пулов похожих слов, собранных при загрузке контента:
+# одинаковое окончание (у/ть — глаголы, -лық/-ость — существительные и т.п.) и близкая длина,
+# поэтому вопрос собирается за O(1) при любом размере словаря.
+KZ_RU, RU_KZ, CLOZE = range(3)
+OPTIONS = 4
+POOL_MIN = 8  # пул мельче — берём более грубый ключ
+TRIES = 16
+BLANK = "＿＿＿"
+WORD = re.compile(r"\w+")
+
+
+def shape_keys(text):
+    """Ключи пулов от точного к грубому: (окончание, длина), (длина,), ()."""
+    text = text.casefold()
+    band = min(len(text) // 3, 4)
+    return ((text[-2:], band), (band,), ())
+
+
+def build_pools(texts):
+    """Для каждого текста — кортеж индексов слов с похожей формой (общие кортежи на весь словарь)."""
+    groups, distinct = {}, {}
+    for i, text in enumerate(texts):
+        for key in shape_keys(text):
+            groups.setdefault(key, []).append(i)
+            distinct.setdefault(key, set()).add(text)
+    need = min(POOL_MIN, len(distinct.get((), ())))
+    pools = {key: tuple(ids) for key, ids in groups.items()}
+    # самый точный ключ, в котором хватает разных вариантов; () — весь словарь
+    return tuple(
+        next(pools[key] for key in shape_keys(text) if len(distinct[key]) >= need or key == ())
+        for text in texts
+    )
+
+
+def make_cloze(word, example):
+    """Пример с пропуском на месте слова; None, если слова в примере не нашлось."""
+    stem = word.casefold()
+    # кітап -> кітабы: на стыке с окончанием последняя согласная часто меняется
+    stems = (stem, stem[:-1]) if len(stem) >= 4 else (stem,)
+    for stem in stems:
+        for m in WORD.finditer(example):
+            if m.group().casefold().startswith(stem):
+                start = m.start()
+                return example[:start] + BLANK + example[start + len(stem):]
+    return None
+
+
+class Quiz:
+    __slots__ = ("kind", "word", "prompt", "hint", "options", "correct")
+
+    def __init__(self, kind, word, prompt, hint, options, correct):
+        self.kind = kind
+        self.word = word
+        self.prompt = prompt
+        self.hint = hint  # перевод к примеру с пропуском
+        self.options = options  # [(индекс слова, текст варианта)]
+        self.correct = correct  # индекс в options
+
+
+class QuizBank:
+    def __init__(self, words):
+        self.words = words
+        self.kz = tuple(w.kz for w in words)
+        # казахское слово — устойчивый id для истории повторений: индексы сдвигаются при правке words.json
+        self.index = {}
+        for i, text in enumerate(self.kz):
+            self.index.setdefault(text, i)
+        self.ru = tuple(w.ru for w in words)
+        self.kz_pools = build_pools(self.kz)
+        self.ru_pools = build_pools(self.ru)
+        self.clozes = tuple(make_cloze(w.kz, w.example) if w.example else None for w in words)
+
+    def __len__(self):
+        return len(self.words) if len(set(self.ru)) >= 2 else 0
+
+    def kinds(self, i):
+        return (KZ_RU, RU_KZ, CLOZE) if self.clozes[i] else (KZ_RU, RU_KZ)
+
+    def distractors(self, i, texts, pool, rng=random):
+        answer = texts[i]
+        picked, seen = [], {answer}
+        # случайные пробы из пула: число попыток не зависит от размера словаря
+        for _ in range(TRIES):
+            if len(picked) == OPTIONS - 1:
+                break
+            j = pool[rng.randrange(len(pool))]
+            if texts[j] not in seen:
+                seen.add(texts[j])
+                picked.append(j)
+        if len(picked) < OPTIONS - 1:
+            # маленький пул: пробы повторяются, проходим его подряд (не дальше TRIES слов)
+            start = rng.randrange(len(pool))
+            for k in range(min(len(pool), TRIES)):
+                j = pool[(start + k) % len(pool)]
+                if texts[j] not in seen and len(picked) < OPTIONS - 1:
+                    seen.add(texts[j])
+                    picked.append(j)
+        return picked
+
+    def question(self, kind, i, rng=random):
+        if kind == KZ_RU:
+            prompt, hint, texts, pools = self.kz[i], "", self.ru, self.ru_pools
+        elif kind == RU_KZ:
+            prompt, hint, texts, pools = self.ru[i], "", self.kz, self.kz_pools
+        else:
+            prompt, hint, texts, pools = self.clozes[i], self.ru[i], self.kz, self.kz_pools
+        ids = [i] + self.distractors(i, texts, pools[i], rng)
+        rng.shuffle(ids)
+        return Quiz(kind, i, prompt, hint, [(j, texts[j]) for j in ids], ids.index(i))
+
+    def generate(self, i=None, rng=random):
+        if i is None:
+            i = rng.randrange(len(self.words))
+        return self.question(rng.choice(self.kinds(i)), i, rng)
+
+    def is_correct(self, kind, i, chosen):
+        # совпадение по тексту: у омонимов в словаре разные индексы, но ответ один
+        texts = self.ru if kind == KZ_RU else self.kz
+        return texts[chosen] == texts[i]
+
+
+def build_bank(c):
+    return QuizBank(c.vocabulary)
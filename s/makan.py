@@ -38,8 +38,11 @@ def save_user_data(data):
         json.dump(data, f, ensure_ascii=False, indent=2)
 
 # === Load data ===
+# Замороженная копия: data/ читается один раз при старте, горячей перезагрузки и проверки схемы
+# (content.ContentRegistry) здесь нет и не будет — новое делается только в makan.py в корне.
 PHRASES = load_json("phrases.json")
 GRAMMAR = load_json("grammar.json")
+GRAMMAR_TASKS = load_json("grammar_tasks.json")
 WORDS = load_json("words_tasks.json")
 READING = load_json("reading_tasks.json")
 
@@ -118,7 +121,7 @@ async def show_subtopics(call: CallbackQuery):
 # === Grammar menu ===
 @dp.callback_query(F.data == "menu_grammar")
 async def show_grammar_menu(call: CallbackQuery):
-    grammar = load_json("grammar.json")
+    grammar = GRAMMAR
     kb = InlineKeyboardBuilder()
     for i, item in enumerate(grammar):
         kb.button(text=item["title"], callback_data=f"grammar|{i}")
@@ -129,7 +132,7 @@ async def show_grammar_menu(call: CallbackQuery):
 @dp.callback_query(F.data.startswith("grammar|"))
 async def show_grammar_topic(call: CallbackQuery):
     idx = int(call.data.split("|")[1])
-    grammar = load_json("grammar.json")
+    grammar = GRAMMAR
     item = grammar[idx]
     kb = InlineKeyboardBuilder()
     kb.button(text="📖 Оқу", callback_data=f"grammar_file|{idx}")
@@ -151,7 +154,7 @@ async def show_grammar_topic(call: CallbackQuery):
 @dp.callback_query(F.data.startswith("grammar_file|"))
 async def open_grammar_file(call: CallbackQuery):
     idx = int(call.data.split("|")[1])
-    grammar = load_json("grammar.json")
+    grammar = GRAMMAR
     item = grammar[idx]
     kb = InlineKeyboardBuilder()
     kb.button(text="⬅️ Артқа", callback_data=f"grammar|{idx}")
@@ -182,7 +185,7 @@ async def reading_topic(call: CallbackQuery):
 async def reading_question(call: CallbackQuery):
     _, topic_idx, task_idx = call.data.split("|")
     topic_idx, task_idx = int(topic_idx), int(task_idx)
-    reading = load_json("reading_tasks.json")
+    reading = READING
     topic = reading[topic_idx]
     task = topic["tasks"][task_idx]
     kb = InlineKeyboardBuilder()
@@ -196,7 +199,7 @@ async def reading_question(call: CallbackQuery):
 async def reading_answer(call: CallbackQuery):
     _, topic_idx, task_idx, chosen = call.data.split("|")
     topic_idx, task_idx = int(topic_idx), int(task_idx)
-    reading = load_json("reading_tasks.json")
+    reading = READING
     topic = reading[topic_idx]
     task = topic["tasks"][task_idx]
     uid = str(call.from_user.id)
@@ -313,7 +316,7 @@ async def task_words_answer(call: CallbackQuery):
 # === Grammar tasks ===
 @dp.callback_query(F.data == "task_grammar")
 async def task_grammar(call: CallbackQuery):
-    data = load_json("grammar_tasks.json")
+    data = GRAMMAR_TASKS
     uid = str(call.from_user.id)
     user = get_user(uid)
 
@@ -337,7 +340,7 @@ async def task_grammar(call: CallbackQuery):
 async def task_grammar_answer(call: CallbackQuery):
     _, q_index, opt_index = call.data.split("|")
     q_index, opt_index = int(q_index), int(opt_index)
-    data = load_json("grammar_tasks.json")
+    data = GRAMMAR_TASKS
     q = data[q_index]
     chosen = q["options"][opt_index]
     correct = q["answer"]
@@ -0,0 +1,121 @@
+import re
+import heapq
+import bisect
+from collections import defaultdict
+
+from pages import TAG
+
+# казахские буквы сводятся к русским «соседям»: с русской раскладки их часто набирают так
+FOLD = str.maketrans({
+    "ә": "а", "ө": "о", "ү": "у", "ұ": "у", "і": "и", "қ": "к", "ғ": "г", "ң": "н", "һ": "х", "ё": "е",
+})
+WORD = re.compile(r"\w+")
+PREFIX_MIN = 3  # с какой длины запрос ищется ещё и как начало слова
+PREFIX_LIMIT = 50
+FUZZY_MIN = 0.4  # минимальная похожесть по триграммам (коэффициент Жаккара)
+TITLE_WEIGHT = 2.0
+
+
+def normalize(text):
+    return TAG.sub(" ", text).casefold().translate(FOLD)
+
+
+def tokens(text):
+    return WORD.findall(normalize(text))
+
+
+def trigrams(term):
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Doc:
+    __slots__ = ("kind", "title", "body", "ref")
+
+    def __init__(self, kind, title, body, ref=None):
+        self.kind = kind  # word / phrase / grammar / reading
+        self.title = title
+        self.body = body
+        self.ref = ref  # маршрут и поля кнопки, которая откроет документ
+
+
+def content_docs(c):
+    docs = [Doc("word", w.kz, f"{w.ru}\n{w.example}".strip()) for w in c.vocabulary]
+    docs += [Doc("phrase", p.kz, p.ru) for p in c.phrases]
+    docs += [
+        Doc("grammar", g.title, f"{g.description}\n{g.file_text}", ("grammar", i))
+        for i, g in enumerate(c.grammar)
+    ]
+    docs += [
+        Doc("reading", f"{level.level} · {t.title}", t.text, ("reading_text", li, ti))
+        for li, level in enumerate(c.reading_texts) for ti, t in enumerate(level.topics)
+    ]
+    return docs
+
+
+class SearchIndex:
+    """Обратный индекс: слово -> {документ: вес поля}, плюс триграммы слов для поиска с опечатками."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.postings = defaultdict(dict)
+        for doc_id, doc in enumerate(docs):
+            for weight, text in ((TITLE_WEIGHT, doc.title), (1.0, doc.body)):
+                for term in tokens(text):
+                    posting = self.postings[term]
+                    if posting.get(doc_id, 0) < weight:
+                        posting[doc_id] = weight
+        self.postings = dict(self.postings)
+        self.terms = sorted(self.postings)
+        self.term_grams = {}
+        self.by_gram = defaultdict(list)
+        for term in self.terms:
+            grams = trigrams(term)
+            self.term_grams[term] = len(grams)
+            for gram in grams:
+                self.by_gram[gram].append(term)
+        self.by_gram = dict(self.by_gram)
+
+    def expand(self, token):
+        """Слова индекса, подходящие под слово запроса: {слово: похожесть 0..1}."""
+        matches = {}
+        if token in self.postings:
+            matches[token] = 1.0
+        if len(token) >= PREFIX_MIN:
+            i = bisect.bisect_left(self.terms, token)
+            for term in self.terms[i:i + PREFIX_LIMIT]:
+                if not term.startswith(token):
+                    break
+                matches.setdefault(term, 0.8)
+        if token in self.postings:
+            return matches
+        # точного совпадения нет — вероятно, опечатка
+        grams = trigrams(token)
+        shared = defaultdict(int)
+        for gram in grams:
+            for term in self.by_gram.get(gram, ()):
+                shared[term] += 1
+        for term, count in shared.items():
+            similarity = count / (len(grams) + self.term_grams[term] - count)
+            if similarity >= FUZZY_MIN:
+                matches[term] = max(matches.get(term, 0), 0.7 * similarity)
+        return matches
+
+    def search(self, query, limit=10):
+        """[(оценка, Doc)] по убыванию оценки; каждое слово запроса добавляет свой лучший вклад."""
+        scores = defaultdict(float)
+        for token in set(tokens(query)):
+            best = {}
+            for term, similarity in self.expand(token).items():
+                for doc_id, weight in self.postings[term].items():
+                    score = similarity * weight
+                    if score > best.get(doc_id, 0):
+                        best[doc_id] = score
+            for doc_id, score in best.items():
+                scores[doc_id] += score
+        top = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(score, self.docs[doc_id]) for doc_id, score in top]
+
+
+def build_index(c):
+    return SearchIndex(content_docs(c))
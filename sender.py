@@ -0,0 +1,109 @@
+import time
+import random
+import asyncio
+import logging
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter, TelegramNetworkError, TelegramServerError
+from aiogram.methods import EditMessageText
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds):
+        # Telegram прислал retry_after: до этого момента в этот бакет не отправляем ничего
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def idle(self):
+        now = time.monotonic()
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.paused_until
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class OutboundLimiter(BaseRequestMiddleware):
+    """Очередь исходящих запросов к Bot API.
+
+    Бакеты токенов на чат и общий, пауза по retry_after, повтор с джиттером при 429/5xx/сетевых
+    ошибках. Если на одно сообщение пришло несколько edit_text подряд, уходит только последний.
+    """
+
+    def __init__(self, global_rate=30, chat_rate=1, chat_burst=3, max_retries=3, max_chats=10000):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+        self.chats = {}  # chat_id -> TokenBucket
+        self.latest_edit = {}  # (chat_id, message_id) -> метод последнего edit_text
+        self.coalesced = 0
+        self.retried = 0
+
+    def _chat_bucket(self, chat_id):
+        bucket = self.chats.get(chat_id)
+        if bucket is None:
+            if len(self.chats) >= self.max_chats:
+                # выкидываем чаты, которые успели накопить полный запас токенов
+                for key in [key for key, b in self.chats.items() if b.idle()]:
+                    del self.chats[key]
+            bucket = self.chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def __call__(self, make_request, bot, method):
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            # answerCallbackQuery и служебные методы не упираются в лимиты сообщений
+            return await make_request(bot, method)
+
+        edit_key = None
+        if isinstance(method, EditMessageText) and method.message_id:
+            edit_key = (chat_id, method.message_id)
+            self.latest_edit[edit_key] = method
+        bucket = self._chat_bucket(chat_id)
+        try:
+            for attempt in range(self.max_retries + 1):
+                await bucket.acquire()
+                await self.global_bucket.acquire()
+                if edit_key and self.latest_edit.get(edit_key) is not method:
+                    # пока ждали, пользователь натапал новый экран — этот уже не нужен
+                    self.coalesced += 1
+                    return True
+                try:
+                    return await make_request(bot, method)
+                except TelegramRetryAfter as e:
+                    if attempt == self.max_retries:
+                        raise
+                    self.retried += 1
+                    log.warning("flood control in chat %s, retry in %ss", chat_id, e.retry_after)
+                    bucket.pause(e.retry_after + random.uniform(0, 1))
+                except (TelegramNetworkError, TelegramServerError):
+                    if attempt == self.max_retries:
+                        raise
+                    self.retried += 1
+                    await asyncio.sleep(0.5 * 2 ** attempt + random.uniform(0, 0.5))
+        finally:
+            if edit_key and self.latest_edit.get(edit_key) is method:
+                del self.latest_edit[edit_key]
@@ -0,0 +1,90 @@
+import time
+import heapq
+
+# Интервальные повторения (упрощённый SM-2) для вопросов одного раздела.
+# Состояние колоды в записи пользователя:
+#   items: {"<qid>": [срок, интервал, ease*100, повторений подряд]} — сроки и интервалы в секундах
+# В store уходит только items. Куча по сроку [[срок, qid], ...] строится из items при первом
+# обращении к колоде после загрузки записи и живёт только в памяти; устаревшие записи в ней
+# выкидываются лениво.
+DAY = 24 * 60 * 60
+RELEARN = 10 * 60  # ошибся — повторить через 10 минут
+START_EASE = 250
+MIN_EASE = 130
+
+
+def now():
+    return int(time.time())
+
+
+class Deck(dict):
+    """{"items": ...} как в записи; heap — атрибут, поэтому в JSON записи не попадает."""
+    __slots__ = ("heap", "key")
+
+    def __init__(self, items, key=int):
+        super().__init__(items=items)
+        self.key = key  # qid из строкового ключа items
+        self.rebuild()
+
+    def rebuild(self):
+        self.heap = [[item[0], self.key(qid)] for qid, item in self["items"].items()]
+        heapq.heapify(self.heap)
+
+
+def deck(user, section, key=int):
+    decks = user.setdefault("srs", {})
+    d = decks.get(section)
+    if not isinstance(d, Deck):
+        # запись только что из store (или со старой сохранённой кучей "heap", она не нужна)
+        d = decks[section] = Deck((d or {}).get("items", {}), key)
+    return d
+
+
+def seed(d, qids, now):
+    """Вопросы, пройденные до интервальных повторений: как будто отвечены один раз сейчас."""
+    for qid in qids:
+        d["items"].setdefault(str(qid), [now + DAY, DAY, START_EASE, 1])
+    d.rebuild()
+
+
+def _clean_top(d, valid):
+    heap, items = d.heap, d["items"]
+    while heap:
+        due, qid = heap[0]
+        item = items.get(str(qid))
+        if item is not None and item[0] == due and qid in valid:
+            return heap[0]
+        heapq.heappop(heap)
+        if item is not None and qid not in valid:
+            # вопрос удалили из контента
+            del items[str(qid)]
+    return None
+
+
+def next_due(d, now, valid):
+    """qid, срок которого уже наступил, или None. O(log n) с учётом ленивого удаления."""
+    top = _clean_top(d, valid)
+    return top[1] if top and top[0] <= now else None
+
+
+def earliest(d, valid):
+    """Ближайший по сроку вопрос — повторение наперёд, когда новых и просроченных нет."""
+    top = _clean_top(d, valid)
+    return top[1] if top else None
+
+
+def record(d, qid, correct, now):
+    due, interval, ease, streak = d["items"].get(str(qid), [now, 0, START_EASE, 0])
+    if correct:
+        streak += 1
+        interval = DAY if streak == 1 else 6 * DAY if streak == 2 else interval * ease // 100
+        ease = ease + 10
+    else:
+        streak = 0
+        interval = RELEARN
+        ease = max(MIN_EASE, ease - 20)
+    due = now + interval
+    d["items"][str(qid)] = [due, interval, ease, streak]
+    heapq.heappush(d.heap, [due, qid])
+    if len(d.heap) > 2 * len(d["items"]) + 16:
+        d.rebuild()
@@ -0,0 +1,642 @@
+import os
+import sys
+import copy
+import time
+import json
+import heapq
+import asyncio
+import logging
+import sqlite3
+import threading
+import contextlib
+from collections import OrderedDict
+
+from leaderboard import Leaderboard, XpCounts, board_xp
+
+log = logging.getLogger(__name__)
+
+
+def _dumps(record):
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+
+
+class VersionConflict(Exception):
+    """Запись пользователя успела измениться в другом процессе: апдейт нужно обработать заново."""
+
+    def __init__(self, uid):
+        super().__init__(uid)
+        self.uid = uid
+
+
+WEEK_TTL = 21 * 86400  # недельный рейтинг Redis живёт ещё две недели после своей недели
+
+
+# === JSON file store (старый формат user_data.json) ===
+class JsonStore:
+    shared = False  # хранилище одного процесса
+
+    def __init__(self, path):
+        self.path = path
+        self.data = _read_json(path)
+        # file_id медиа лежат рядом, чтобы user_data.json остался словарём uid -> запись
+        self.media_path = path + ".media"
+        self.media = _read_json(self.media_path)
+        self.boards = {}  # неделя (None — общий) -> Leaderboard, строится при первом запросе
+        # put_many приходит из потока WriteBehind, чтения — из цикла событий: словари меняются
+        # и сериализуются под lock, а сам файл пишется вне его, под write_lock
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+
+    def _board(self, week):
+        # вызывается под self.lock
+        board = self.boards.get(week)
+        if board is None:
+            # прошлые недели больше не спрашивают
+            self.boards = {key: value for key, value in self.boards.items() if key is None}
+            board = self.boards[week] = Leaderboard()
+            for uid, record in self.data.items():
+                board.set(uid, board_xp(record, week))
+        return board
+
+    def _score(self, uid, record):
+        for week, board in self.boards.items():
+            board.set(uid, board_xp(record, week))
+
+    def get(self, uid):
+        with self.lock:
+            return self.data.get(uid)
+
+    def put(self, uid, record):
+        self.put_many({uid: record})
+
+    def put_many(self, records):
+        with self.lock:
+            self.data.update(records)
+            for uid, record in records.items():
+                self._score(uid, record)
+        self._write(self.path, self.data)
+
+    def load_all(self):
+        with self.lock:
+            return dict(self.data)
+
+    def iter_all(self, batch=1000):
+        with self.lock:
+            return iter(list(self.data.items()))
+
+    def count(self):
+        with self.lock:
+            return len(self.data)
+
+    def uids_after(self, after, limit):
+        with self.lock:
+            return heapq.nsmallest(limit, (uid for uid in self.data if uid > after))
+
+    def top(self, week, n):
+        with self.lock:
+            return [(uid, self.data[uid].get("name"), xp) for uid, xp in self._board(week).top(n)]
+
+    def count_above(self, week, xp):
+        with self.lock:
+            return self._board(week).count_above(xp)
+
+    def ranked(self, week):
+        with self.lock:
+            return len(self._board(week))
+
+    def file_ids(self):
+        with self.lock:
+            return dict(self.media)
+
+    def put_file_id(self, key, file_id):
+        with self.lock:
+            self.media[key] = file_id
+        self._write(self.media_path, self.media)
+
+    def drop_file_id(self, key, file_id):
+        with self.lock:
+            if self.media.get(key) != file_id:
+                return
+            del self.media[key]
+        self._write(self.media_path, self.media)
+
+    def close(self):
+        pass
+
+    def _write(self, path, data):
+        # снимок берётся уже под write_lock: файл, записанный позже, не старее записанного раньше
+        with self.write_lock:
+            with self.lock:
+                text = _json_text(data)
+            _write_text(path, text)
+
+
+def _read_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _json_text(data):
+    return json.dumps(data, ensure_ascii=False, indent=2)
+
+
+def _write_text(path, text):
+    # временный файл + fsync + rename: при падении остаётся старый или новый файл целиком
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+# === SQLite store: одна строка на пользователя, WAL ===
+class SqliteStore:
+    shared = False
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS users (uid TEXT PRIMARY KEY, data TEXT NOT NULL)"
+        )
+        # загруженные в Telegram медиа: ключ файла (тип + хеш содержимого) -> file_id
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS media (key TEXT PRIMARY KEY, file_id TEXT NOT NULL)"
+        )
+        # рейтинг: XP из записи в колонках с индексами, пишется в той же транзакции, что и запись,
+        # так что топ и место пользователя не требуют читать и разбирать записи
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores (uid TEXT PRIMARY KEY, name TEXT, xp INTEGER NOT NULL, "
+            "week TEXT, week_xp INTEGER NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS scores_xp ON scores (xp DESC, uid)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS scores_week ON scores (week, week_xp DESC, uid)")
+        self._backfill_scores()
+        # число пользователей на каждое значение XP по рейтингам (None — общий): место считается
+        # в памяти, а не COUNT(*) по индексу; строится при первом запросе рейтинга
+        self.ranks = {}
+
+    def _backfill_scores(self):
+        # база, созданная до таблицы scores: XP переносятся один раз, разбор JSON — внутри SQLite
+        if self.conn.execute("SELECT EXISTS (SELECT 1 FROM scores)").fetchone()[0]:
+            return
+        self.conn.execute(
+            "INSERT INTO scores (uid, name, xp, week, week_xp) SELECT uid, json_extract(data, '$.name'), "
+            "COALESCE(json_extract(data, '$.xp'), 0), json_extract(data, '$.week'), "
+            "COALESCE(json_extract(data, '$.week_xp'), 0) FROM users"
+        )
+
+    def get(self, uid):
+        with self.lock:
+            row = self.conn.execute("SELECT data FROM users WHERE uid = ?", (uid,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, uid, record):
+        self.put_many({uid: record})
+
+    def put_many(self, records):
+        rows = [(uid, _dumps(record)) for uid, record in records.items()]
+        scores = [
+            (uid, record.get("name"), record.get("xp", 0), record.get("week"), record.get("week_xp", 0))
+            for uid, record in records.items()
+        ]
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                old = self._old_scores(list(records)) if self.ranks else {}
+                self.conn.executemany(
+                    "INSERT INTO users (uid, data) VALUES (?, ?) "
+                    "ON CONFLICT(uid) DO UPDATE SET data = excluded.data",
+                    rows,
+                )
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO scores (uid, name, xp, week, week_xp) VALUES (?, ?, ?, ?, ?)", scores
+                )
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            for week, counts in self.ranks.items():
+                for uid, record in records.items():
+                    before = board_xp(old.get(uid, {}), week)
+                    after = board_xp(record, week)
+                    if before != after:
+                        if before > 0:
+                            counts.add(before, -1)
+                        if after > 0:
+                            counts.add(after, 1)
+
+    def _old_scores(self, uids, chunk=500):
+        old = {}
+        for i in range(0, len(uids), chunk):
+            part = uids[i:i + chunk]
+            rows = self.conn.execute(
+                f"SELECT uid, xp, week, week_xp FROM scores WHERE uid IN ({','.join('?' * len(part))})", part
+            )
+            for uid, xp, week, week_xp in rows:
+                old[uid] = {"xp": xp, "week": week, "week_xp": week_xp}
+        return old
+
+    def _ranks(self, week):
+        # вызывается под self.lock
+        counts = self.ranks.get(week)
+        if counts is None:
+            if week is None:
+                rows = self.conn.execute("SELECT xp, COUNT(*) FROM scores WHERE xp > 0 GROUP BY xp")
+            else:
+                rows = self.conn.execute(
+                    "SELECT week_xp, COUNT(*) FROM scores WHERE week = ? AND week_xp > 0 GROUP BY week_xp", (week,)
+                )
+            counts = self.ranks[week] = XpCounts(rows)
+        return counts
+
+    def load_all(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT uid, data FROM users").fetchall()
+        return {uid: json.loads(data) for uid, data in rows}
+
+    def iter_all(self, batch=1000):
+        """(uid, запись) пачками по первичному ключу — вся таблица в памяти не держится."""
+        after = ""
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT uid, data FROM users WHERE uid > ? ORDER BY uid LIMIT ?", (after, batch)
+                ).fetchall()
+            if not rows:
+                return
+            for uid, data in rows:
+                yield uid, json.loads(data)
+            after = rows[-1][0]
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def uids_after(self, after, limit):
+        # постранично по первичному ключу: без OFFSET и без загрузки всей таблицы
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT uid FROM users WHERE uid > ? ORDER BY uid LIMIT ?", (after, limit)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def top(self, week, n):
+        with self.lock:
+            if week is None:
+                return self.conn.execute(
+                    "SELECT uid, name, xp FROM scores WHERE xp > 0 ORDER BY xp DESC, uid LIMIT ?", (n,)
+                ).fetchall()
+            return self.conn.execute(
+                "SELECT uid, name, week_xp FROM scores WHERE week = ? AND week_xp > 0 "
+                "ORDER BY week_xp DESC, uid LIMIT ?", (week, n)
+            ).fetchall()
+
+    def count_above(self, week, xp):
+        with self.lock:
+            return self._ranks(week).count_above(xp)
+
+    def ranked(self, week):
+        with self.lock:
+            return len(self._ranks(week))
+
+    def file_ids(self):
+        with self.lock:
+            return dict(self.conn.execute("SELECT key, file_id FROM media").fetchall())
+
+    def put_file_id(self, key, file_id):
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO media (key, file_id) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET file_id = excluded.file_id",
+                (key, file_id),
+            )
+
+    def drop_file_id(self, key, file_id):
+        # только если там всё ещё отклонённый file_id, а не новый после загрузки
+        with self.lock:
+            self.conn.execute("DELETE FROM media WHERE key = ? AND file_id = ?", (key, file_id))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+# === Redis: общее хранилище для нескольких процессов бота ===
+class RedisStore:
+    """Запись пользователя — JSON в ключе user:<uid>, плюс индекс uid в sorted set для обхода по порядку.
+
+    Версия записи лежит в самой записи ("_v"). put пишет, только если в Redis всё ещё та версия,
+    которую прочитал этот процесс (WATCH/MULTI/EXEC), иначе VersionConflict.
+    """
+
+    shared = True
+
+    def __init__(self, url, prefix="anatili:"):
+        import redis  # нужен только для USER_STORE=redis://...
+
+        self.redis = redis
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.index = prefix + "users"
+        self.media = prefix + "media"  # hash: ключ файла -> file_id
+        self.scores = prefix + "xp"  # sorted set uid -> XP; недельные — в <prefix>xp:<неделя>
+
+    def _key(self, uid):
+        return f"{self.prefix}user:{uid}"
+
+    def _board(self, week):
+        return self.scores if week is None else f"{self.scores}:{week}"
+
+    def _score(self, pipe, uid, record):
+        pipe.zadd(self.scores, {uid: record.get("xp", 0)})
+        week = record.get("week")
+        if week:
+            pipe.zadd(self._board(week), {uid: record.get("week_xp", 0)})
+            pipe.expire(self._board(week), WEEK_TTL)
+
+    def get(self, uid):
+        raw = self.client.get(self._key(uid))
+        return json.loads(raw) if raw else None
+
+    def put(self, uid, record):
+        key = self._key(uid)
+        expected = record.get("_v", 0)
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                raw = pipe.get(key)
+                if (json.loads(raw).get("_v", 0) if raw else 0) != expected:
+                    raise VersionConflict(uid)
+                record["_v"] = expected + 1
+                pipe.multi()
+                pipe.set(key, _dumps(record))
+                pipe.zadd(self.index, {uid: 0})
+                self._score(pipe, uid, record)
+                pipe.execute()
+            except self.redis.WatchError:
+                record["_v"] = expected
+                raise VersionConflict(uid) from None
+            except BaseException:
+                record["_v"] = expected
+                raise
+
+    def put_many(self, records):
+        # перенос user_data.json: без проверки версий
+        with self.client.pipeline(transaction=False) as pipe:
+            for uid, record in records.items():
+                pipe.set(self._key(uid), _dumps(record))
+                pipe.zadd(self.index, {uid: 0})
+                self._score(pipe, uid, record)
+            pipe.execute()
+
+    def load_all(self):
+        return dict(self.iter_all())
+
+    def iter_all(self, batch=1000):
+        after = ""
+        while True:
+            uids = self.uids_after(after, batch)
+            if not uids:
+                return
+            for uid, raw in zip(uids, self.client.mget([self._key(uid) for uid in uids])):
+                if raw:
+                    yield uid, json.loads(raw)
+            after = uids[-1]
+
+    def count(self):
+        return self.client.zcard(self.index)
+
+    def uids_after(self, after, limit):
+        # все оценки 0, поэтому sorted set упорядочен по uid как строке — как ORDER BY uid в SQLite
+        return self.client.zrangebylex(self.index, f"({after}" if after else "-", "+", start=0, num=limit)
+
+    def top(self, week, n):
+        rows = self.client.zrevrangebyscore(self._board(week), "+inf", "(0", start=0, num=n, withscores=True)
+        if not rows:
+            return []
+        names = (json.loads(raw).get("name") if raw else None
+                 for raw in self.client.mget([self._key(uid) for uid, _ in rows]))
+        return [(uid, name, int(xp)) for (uid, xp), name in zip(rows, names)]
+
+    def count_above(self, week, xp):
+        return self.client.zcount(self._board(week), f"({xp}", "+inf")
+
+    def ranked(self, week):
+        return self.count_above(week, 0)
+
+    def file_ids(self):
+        return self.client.hgetall(self.media)
+
+    def put_file_id(self, key, file_id):
+        # file_id от любого процесса одинаково годится, поэтому без проверки версий
+        self.client.hset(self.media, key, file_id)
+
+    def drop_file_id(self, key, file_id):
+        # удаляем, только если другой процесс не успел записать новый file_id
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(self.media)
+                if pipe.hget(self.media, key) != file_id:
+                    return
+                pipe.multi()
+                pipe.hdel(self.media, key)
+                pipe.execute()
+            except self.redis.WatchError:
+                pass
+
+    def close(self):
+        self.client.close()
+
+
+async def store_call(store, fn, *args):
+    """Вызов store из event loop. Сетевой store (Redis) уходит в пул потоков, как сброс WriteBehind:
+    ожидание ответа не должно останавливать остальные апдейты. Локальный вызывается сразу —
+    JsonStore пишет файл без блокировок и из нескольких потоков его звать нельзя.
+    """
+    if store.shared:
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+    return fn(*args)
+
+
+# === Write-behind: ответы копятся в памяти и пишутся пачкой в фоне ===
+class WriteBehind:
+    def __init__(self, store, interval_ms=500, max_dirty=200, timer=contextlib.nullcontext):
+        self.store = store
+        self.timer = timer
+        self.interval = interval_ms / 1000
+        self.max_dirty = max_dirty
+        self.dirty = {}  # uid -> живая запись пользователя
+        self.flushing = {}  # снято с dirty, но ещё не записано
+        self.wakeup = asyncio.Event()
+        self.flush_lock = asyncio.Lock()
+        self.task = None
+
+    def mark(self, uid, record):
+        self.dirty[uid] = record
+        if len(self.dirty) >= self.max_dirty:
+            self.wakeup.set()
+
+    async def flush(self):
+        async with self.flush_lock:
+            if not self.dirty:
+                return
+            pending, self.dirty = self.dirty, {}
+            self.flushing = pending
+            # копия снимается в потоке event loop, чтобы хендлеры не меняли её во время записи
+            batch = {uid: copy.deepcopy(record) for uid, record in pending.items()}
+            try:
+                with self.timer("store_flush"):
+                    await asyncio.get_running_loop().run_in_executor(None, self.store.put_many, batch)
+            except BaseException:
+                for uid, record in pending.items():
+                    self.dirty.setdefault(uid, record)
+                raise
+            finally:
+                self.flushing = {}
+
+    def is_dirty(self, uid):
+        return uid in self.dirty or uid in self.flushing
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                log.exception("user data flush failed, will retry")
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.flush()
+
+
+# === LRU записей пользователей поверх store ===
+class UserCache:
+    """Записи активных пользователей: загружаются при первом обращении, холодные выталкиваются.
+
+    Выталкивается запись, которая не трогалась дольше ttl секунд или вышла за max_size, но только
+    если она уже записана в store: несохранённую держим до ближайшего сброса WriteBehind,
+    иначе следующий get прочитал бы из store старую версию.
+    """
+
+    def __init__(self, store, writer=None, max_size=10000, ttl=3600, clock=time.monotonic):
+        self.store = store
+        self.writer = writer
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()  # uid -> [запись, время последнего обращения]; старые в начале
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _cached(self, uid, now):
+        entry = self.entries.get(uid)
+        # общее хранилище могли изменить другие процессы: читаем всегда, кэш только держит запись до записи
+        if entry is None or self.store.shared:
+            return None
+        self.hits += 1
+        entry[1] = now
+        self.entries.move_to_end(uid)
+        self._evict(now)
+        return entry[0]
+
+    def get(self, uid):
+        """Запись пользователя или None, если его нет и в store."""
+        now = self.clock()
+        record = self._cached(uid, now)
+        if record is None:
+            self.misses += 1
+            record = self.store.get(uid)
+            if record is not None:
+                self.put(uid, record, now)
+        return record
+
+    async def fetch(self, uid):
+        """То же для хендлеров: чтение из сетевого store не останавливает event loop."""
+        record = self._cached(uid, self.clock())
+        if record is None:
+            self.misses += 1
+            record = await store_call(self.store, self.store.get, uid)
+            if record is not None:
+                self.put(uid, record)
+        return record
+
+    def put(self, uid, record, now=None):
+        now = self.clock() if now is None else now
+        self.entries[uid] = [record, now]
+        self.entries.move_to_end(uid)
+        self._evict(now)
+
+    def forget(self, uid):
+        self.entries.pop(uid, None)
+
+    def _evict(self, now):
+        entries = self.entries
+        while entries:
+            uid, (record, touched) = next(iter(entries.items()))
+            if len(entries) <= self.max_size and now - touched < self.ttl:
+                return
+            if self.writer and self.writer.is_dirty(uid):
+                # самая холодная запись ещё не записана: просим сброс и выталкиваем позже
+                self.writer.wakeup.set()
+                return
+            del entries[uid]
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def open_store(spec):
+    """spec: "sqlite:<path>", "json:<path>" или "redis://<host>:<port>/<db>"."""
+    kind, _, path = spec.partition(":")
+    if kind in ("redis", "rediss", "unix"):
+        return RedisStore(spec)
+    if kind == "sqlite":
+        return SqliteStore(path)
+    if kind == "json":
+        return JsonStore(path)
+    raise ValueError(f"unknown user store: {spec!r}")
+
+
+def migrate_json(json_path, store):
+    """Один раз переносит user_data.json в store, возвращает число пользователей."""
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    store.put_many(data)
+    return len(data)
+
+
+if __name__ == "__main__":
+    # python storage.py user_data.json sqlite:user_data.db
+    if len(sys.argv) != 3:
+        sys.exit("usage: python storage.py <user_data.json> <store spec>")
+    target = open_store(sys.argv[2])
+    print(f"migrated {migrate_json(sys.argv[1], target)} users")
+    target.close()
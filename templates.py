@@ -0,0 +1,252 @@
+import re
+import html
+import string
+
+from pages import split_html, visible_len
+
+# Все сообщения бота — HTML: в тексте из data/ достаточно экранировать & < >, а в старом Markdown
+# звёздочку или подчёркивание внутри *...* экранировать нечем, и Telegram отклоняет всё сообщение.
+# Шаблон разбирается один раз при импорте; поля подставляются экранированными, кроме Markup.
+# Текст контента экранируется один раз на версию (escape_content), числа (XP, очки) — без экранирования.
+
+
+class Markup(str):
+    """Уже готовый HTML: подставляется в шаблон как есть."""
+    __slots__ = ()
+
+    def __add__(self, other):
+        # склейка с обычной строкой её экранирует, а не превращает результат в «сырой» str
+        return Markup(str.__add__(self, escape(other)))
+
+
+def escape(value):
+    if isinstance(value, Markup):
+        return value
+    if isinstance(value, int):
+        return str(value)
+    value = str(value)
+    # в большинстве строк (ранги, полоска прогресса) экранировать нечего — проверка дешевле замены
+    if "&" in value or "<" in value or ">" in value:
+        value = html.escape(value, quote=False)
+    return Markup(value)
+
+
+class Template:
+    """Шаблон разбирается один раз в строку для оператора %: render только экранирует значения
+    и подставляет их кортежем, без разбора шаблона и склейки списка на каждый вызов."""
+
+    def __init__(self, source):
+        self.source = source
+        pattern, order = [], []
+        for literal, field, spec, conversion in string.Formatter().parse(source):
+            if spec or conversion or (field is not None and not field.isidentifier()):
+                raise ValueError(f"{source!r}: only plain {{name}} fields are supported, pass a ready value")
+            pattern.append(literal.replace("%", "%%"))
+            if field is not None:
+                pattern.append("%s")
+                order.append(field)
+        # "a {x} b {x}" -> pattern "a %s b %s", order ("x", "x")
+        self.pattern = "".join(pattern)
+        self.order = tuple(order)
+        self.fields = frozenset(order)
+        if not order:
+            # шаблон без полей собирается один раз
+            self.static = Markup(self.pattern % ())
+
+    def render(self, **values):
+        if len(values) != len(self.fields):
+            raise TypeError(f"{self!r} expects fields {sorted(self.fields)}, got {sorted(values)}")
+        if not self.order:
+            return self.static
+        args = []
+        try:
+            for field in self.order:
+                # то же, что escape(), без вызова на каждое поле: Markup (текст контента) и числа
+                # подставляются как есть, обычная строка заменяется, только если в ней есть & < >
+                value = values[field]
+                kind = type(value)
+                if kind is str:
+                    if "&" in value or "<" in value or ">" in value:
+                        value = html.escape(value, quote=False)
+                elif kind is not Markup and kind is not int:
+                    value = escape(value)
+                args.append(value)
+        except KeyError:
+            raise TypeError(f"{self!r} expects fields {sorted(self.fields)}, got {sorted(values)}") from None
+        return Markup(self.pattern % tuple(args))
+
+    def __repr__(self):
+        return f"Template({self.source!r})"
+
+
+# === Текст контента, экранированный при загрузке ===
+# поля с HTML-разметкой (делятся на страницы pages.split_html), остальные строки — обычный текст
+MARKUP_FIELDS = {("GrammarTopic", "file_text"), ("ReadingText", "text")}
+
+
+class EscapedText(dict):
+    """Строка из снимка -> она же в HTML; строки не из снимка (собранные в хендлере) экранируются на лету."""
+
+    def __missing__(self, value):
+        return escape(value)
+
+
+def content_strings(value, owner=None, field=None):
+    """(класс записи, поле, строка) для всех строк снимка, включая вложенные записи и кортежи."""
+    if isinstance(value, str):
+        yield owner, field, value
+    elif isinstance(value, (tuple, list)):
+        for item in value:
+            yield from content_strings(item, owner, field)
+    elif hasattr(value, "__slots__"):
+        for name in value.__slots__:
+            yield from content_strings(getattr(value, name), type(value).__name__, name)
+
+
+def escape_content(c, files=None):
+    from content import FILES
+
+    escaped = EscapedText()
+    for name in files or FILES:
+        for owner, field, text in content_strings(getattr(c, name)):
+            if (owner, field) not in MARKUP_FIELDS:
+                escaped[text] = escape(text)
+    return escaped
+
+
+# === Проверка HTML так, как его разбирает Telegram ===
+TELEGRAM_TAGS = {
+    "b", "strong", "i", "em", "u", "ins", "s", "strike", "del", "a", "code", "pre", "span",
+    "tg-spoiler", "tg-emoji", "blockquote",
+}
+HTML_TOKEN = re.compile(r"<(/?)([a-zA-Z][\w-]*)[^<>]*>|<|&(#\d+|#x[0-9a-fA-F]+|[a-zA-Z]+);")
+TELEGRAM_ENTITIES = {"lt", "gt", "amp", "quot"}
+MESSAGE_LIMIT = 4096
+
+
+def html_errors(text):
+    """Почему Telegram не примет text с parse_mode="HTML" (пустой список — примет)."""
+    errors, open_tags = [], []
+    for m in HTML_TOKEN.finditer(text):
+        closing, tag, entity = m.group(1), m.group(2), m.group(3)
+        if m.group(0) == "<":
+            errors.append(f"unescaped '<' at {m.start()}")
+        elif entity is not None:
+            if not entity.startswith("#") and entity not in TELEGRAM_ENTITIES:
+                errors.append(f"unsupported entity &{entity}; at {m.start()}")
+        elif tag.lower() not in TELEGRAM_TAGS:
+            errors.append(f"unsupported tag <{tag}> at {m.start()}")
+        elif not closing:
+            open_tags.append(tag.lower())
+        elif not open_tags or open_tags.pop() != tag.lower():
+            errors.append(f"unbalanced </{tag}> at {m.start()}")
+    errors += [f"unclosed <{tag}>" for tag in open_tags]
+    if visible_len(text) > MESSAGE_LIMIT:
+        errors.append(f"longer than {MESSAGE_LIMIT} characters")
+    return errors
+
+
+# === Сообщения бота ===
+MAIN_MENU = Template("🏠 <b>Басты меню</b>")
+START = Template(
+    "✨ <b>AnaTili Bot 🇰🇿</b>\n{greeting}\n\n"
+    "💬 Күннің дәйексөзі:\n<i>{phrase}</i>\n\n"
+    "📚 Сөздер — Quizlet сілтемелері\n"
+    "✏️ Грамматика — ережелер мен бейне\n"
+    "📖 Чтение — мәтіндер деңгеймен\n"
+    "📈 Прогресс — сенің жетістігің\n"
+    "🔎 /search — сөз бен тақырып іздеу"
+)
+DAILY_PHRASE = Template("💬 Күннің дәйексөзі:\n<i>{phrase}</i>")
+QUIZLET_TOPICS = Template("📘 <b>Quizlet тақырыптары:</b>")
+QUIZLET_SUBTOPICS = Template("✨ <b>{topic}</b> тақырыптары:")
+GRAMMAR_MENU = Template("📘 <b>Грамматика тақырыптары:</b>")
+GRAMMAR_TOPIC = Template("🧩 <b>{title}</b>\n\n{description}")
+GRAMMAR_PAGE = Template("📘 <b>{title}</b>{counter}\n\n{page}")
+READING_LEVELS = Template("📖 <b>Оқу деңгейін таңда:</b>")
+READING_TOPICS = Template("📘 <b>Тақырыпты таңда:</b>")
+READING_PAGE = Template("📖 <b>{title}</b>{counter}\n\n{page}")
+PAGE_COUNTER = Template(" ({page}/{total})")
+TASKS = Template(
+    "🧠 <b>Тапсырмалар бөлімі</b>\n\n"
+    "🧩 Сөздер — сөздік тесттер\n"
+    "🔤 Сөздік — сөздіктен шексіз сұрақтар\n"
+    "📘 Грамматика — сұрақтарға жауап беріңіз\n"
+    "📖 Чтение — мәтіндермен жұмыс\n"
+)
+WORD_QUESTION = Template("🧩 <b>{question}</b>")
+GRAMMAR_QUESTION = Template("📘 <b>{question}</b>")
+RIGHT = Template("✅ Дұрыс! <b>{answer}</b> (+{xp} XP)")
+WRONG = Template("❌ Қате. Дұрыс жауап: <b>{answer}</b>")
+VOCAB_QUESTION = Template("🔤 {title}\n\n<b>{prompt}</b>")
+VOCAB_HINT = Template("\n({hint})")
+VOCAB_RIGHT = Template("✅ Дұрыс! <b>{kz}</b> — {ru} (+{xp} XP)")
+VOCAB_WRONG = Template("❌ Қате. Дұрыс жауап: <b>{kz}</b> — {ru}")
+EXAMPLE = Template("\n\n<i>{example}</i>")
+READING_TASKS = Template("🧠 <b>Reading – задания:</b>")
+READING_TASK_TOPIC = Template("📘 <b>{title}</b>\n\n{id}")
+READING_TOPIC_DONE = Template("\n\n✅ Аяқталды: {total} тапсырма, {mistakes} қате")
+READING_TOPIC_STARTED = Template("\n\n⏯ {done}/{total} тапсырма орындалды")
+READING_QUESTION = Template("📝 {number}/{total}. {question}")
+READING_FINISHED = Template("\n\n🏁 Тақырып аяқталды: {total} тапсырма, {mistakes} қате")
+PROGRESS = Template(
+    "📊 <b>Сенің нәтижелерің:</b>\n\n"
+    "🏆 Ұпай: {score}\n🔥 XP: {xp}\n{bar}\n📈 Деңгей: {level}{answers}\n\n"
+    "🗓 Апта орны: {week_rank}\n"
+    "🌍 Жалпы орын: {total_rank}"
+)
+PROGRESS_ANSWERS = Template("\n✍️ Жауаптар: {answers} (дұрыс {percent}%)")
+LEADERBOARD = Template("🏆 <b>{title}</b>\n")
+LEADERBOARD_ROW = Template("{place}. {name} — {xp} XP")
+LEADERBOARD_ROW_MINE = Template("{place}. <b>{name}</b> — {xp} XP")
+LEADERBOARD_EMPTY = Template("Әзірге ешкім жоқ.")
+LEADERBOARD_MINE = Template("…\n{place}. <b>Сен</b> — {xp} XP")
+SEARCH_EMPTY = Template("🔎 «{query}» бойынша ештеңе табылмады.")
+SEARCH_RESULTS = Template("🔎 <b>{query}</b>\n")
+SEARCH_LINK = Template("{icon} {title}")
+SEARCH_ENTRY = Template("{icon} <b>{title}</b> — {body}")
+INLINE_ENTRY = Template("<b>{kz}</b>")
+INLINE_TRANSLATION = Template(" — {ru}")
+INLINE_EXAMPLE = Template("\n<i>{example}</i>")
+
+
+def content_messages(c):
+    """(где, сообщение) для каждого сообщения, в которое попадает текст из data/."""
+    import inline
+
+    t = escape_content(c)
+    for i, p in enumerate(c.phrases + c.quotes):
+        yield f"phrase {i}", START.render(greeting="", phrase=t[p.kz])
+        yield f"phrase {i} (daily)", DAILY_PHRASE.render(phrase=t[p.kz])
+    for i, g in enumerate(c.grammar):
+        yield f"grammar {i}", GRAMMAR_TOPIC.render(title=t[g.title], description=t[g.description])
+        pages = split_html(g.file_text)
+        for n, page in enumerate(pages):
+            counter = PAGE_COUNTER.render(page=n + 1, total=len(pages))
+            yield f"grammar {i} page {n + 1}", GRAMMAR_PAGE.render(title=t[g.title], counter=counter, page=Markup(page))
+    for li, level in enumerate(c.reading_texts):
+        for ti, topic in enumerate(level.topics):
+            pages = split_html(topic.text)
+            for n, page in enumerate(pages):
+                counter = PAGE_COUNTER.render(page=n + 1, total=len(pages))
+                yield (f"reading {li}.{ti} page {n + 1}",
+                       READING_PAGE.render(title=t[topic.title], counter=counter, page=Markup(page)))
+    for name, question in (("words", WORD_QUESTION), ("grammar_tasks", GRAMMAR_QUESTION)):
+        for q in getattr(c, name):
+            yield f"{name} {q.id}", question.render(question=t[q.question])
+            for option in q.options:
+                yield f"{name} {q.id} answer", RIGHT.render(answer=t[option], xp=10)
+    for i, w in enumerate(c.vocabulary):
+        answer = VOCAB_RIGHT.render(kz=t[w.kz], ru=t[w.ru], xp=5)
+        yield f"vocabulary {i}", answer + EXAMPLE.render(example=t[w.example]) if w.example else answer
+        yield f"vocabulary {i} question", VOCAB_QUESTION.render(title="", prompt=t[w.kz]) + VOCAB_HINT.render(hint=t[w.ru])
+    for i, topic in enumerate(c.reading_tasks):
+        yield f"reading_tasks {i}", READING_TASK_TOPIC.render(title=t[topic.title], id=t[topic.id])
+        for n, task in enumerate(topic.tasks):
+            yield (f"reading_tasks {i}.{n}",
+                   READING_QUESTION.render(number=n + 1, total=len(topic.tasks), question=t[task.question]))
+            for option in task.options:
+                yield f"reading_tasks {i}.{n} answer", WRONG.render(answer=t[option])
+    for i, entry in enumerate(inline.content_entries(c)):
+        yield f"inline {i}", inline.article_text(entry)
+
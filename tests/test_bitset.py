@@ -0,0 +1,44 @@
+import random
+from types import SimpleNamespace
+
+from bitset import QuestionSet, get_bits, mark, set_bits
+
+
+def questions(*ids):
+    return [SimpleNamespace(id=qid, question=f"q{qid}") for qid in ids]
+
+
+def test_bits_are_stored_as_hex():
+    user = {}
+    assert get_bits(user, "done") == 0
+    mark(user, "done", 0)
+    mark(user, "done", 70)
+    assert user["done"] == format(1 | 1 << 70, "x")
+    set_bits(user, "done", 0)
+    assert get_bits(user, "done") == 0
+
+
+def test_pick_unanswered_only_returns_free_ids():
+    random.seed(1)
+    qs = QuestionSet(questions(*range(0, 200, 3)))
+    bits = 0
+    seen = set()
+    while (qid := qs.pick_unanswered(bits)) is not None:
+        assert qid in qs.by_id and not bits >> qid & 1
+        seen.add(qid)
+        bits |= 1 << qid
+    assert seen == set(qs.ids)
+
+
+def test_pick_unanswered_ignores_bits_of_removed_questions():
+    qs = QuestionSet(questions(1, 2))
+    assert qs.pick_unanswered(1 << 1 | 1 << 5) == 2
+    assert qs.pick_unanswered(1 << 1 | 1 << 2) is None
+
+
+def test_migrate_old_question_lists():
+    qs = QuestionSet(questions(3, 4))
+    user = {"used": ["q4", "gone"], "done": "1"}
+    assert qs.migrate(user, "used", "done")
+    assert "used" not in user and get_bits(user, "done") == 1 | 1 << 4
+    assert not qs.migrate(user, "used", "done")
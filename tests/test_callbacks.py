@@ -0,0 +1,106 @@
+import asyncio
+import base64
+from types import SimpleNamespace
+
+import pytest
+
+from callbacks import MAX_CALLBACK_BYTES, CallbackRouter, checked
+
+
+def make_router():
+    router = CallbackRouter(stale_text="stale")
+    calls = []
+
+    @router.route("A", "menu")
+    async def menu(call):
+        calls.append(("menu",))
+
+    @router.route("B", "page", "topic", "page", optional=1)
+    async def page(call, topic, page=0):
+        calls.append(("page", topic, page))
+        return checked(["x"], topic)
+
+    @router.route("C", "broken", "topic")
+    async def broken(call, topic):
+        return {}["missing"]
+
+    return router, calls
+
+
+@pytest.mark.parametrize("args", [(0,), (127,), (128,), (300, 0), (2 ** 40, 5)])
+def test_pack_unpack_round_trip(args):
+    router, _ = make_router()
+    data = router.pack("page", *args)
+    assert data[0] == "B" and len(data.encode()) <= MAX_CALLBACK_BYTES
+    route, unpacked = router.unpack(data)
+    assert route.name == "page" and unpacked == args
+    assert router.name_of(data) == "page"
+
+
+def test_route_without_fields():
+    router, _ = make_router()
+    assert router.pack("menu") == "A"
+    assert router.unpack("A")[1] == ()
+
+
+def test_legacy_format_still_unpacks():
+    router, _ = make_router()
+    route, args = router.unpack("page|3|1")
+    assert route.name == "page" and args == (3, 1)
+
+
+@pytest.mark.parametrize("data", [
+    "",
+    "Z",  # неизвестный код
+    "nope|1",  # неизвестное имя в старом формате
+    "B",  # не хватает обязательного поля
+    "B" + base64.urlsafe_b64encode(bytes([1, 2, 3])).decode(),  # лишнее поле
+    "B" + base64.urlsafe_b64encode(bytes([0x80])).decode(),  # оборванный varint
+    "B" + base64.urlsafe_b64encode(bytes([0xFF] * 10 + [1])).decode(),  # слишком длинный varint
+    "page|x",
+])
+def test_unpack_rejects_bad_data(data):
+    router, _ = make_router()
+    with pytest.raises(ValueError):
+        router.unpack(data)
+
+
+def test_pack_rejects_bad_values():
+    router, _ = make_router()
+    with pytest.raises(ValueError):
+        router.pack("page", -1)
+    with pytest.raises(ValueError):
+        router.pack("page", 1, 2, 3)
+    with pytest.raises(ValueError):
+        router.route("A", "other")
+    with pytest.raises(ValueError):
+        router.route("a", "lower")
+
+
+class Call:
+    def __init__(self, data):
+        self.data = data
+        self.from_user = SimpleNamespace(id=1)
+        self.answers = []
+
+    async def answer(self, text=None, **kwargs):
+        self.answers.append(text)
+
+
+def test_dispatch_answers_bad_and_stale_callbacks():
+    router, calls = make_router()
+    bad, stale, ok = Call("garbage"), Call(router.pack("page", 5)), Call(router.pack("page", 0, 2))
+    for call in (bad, stale, ok):
+        asyncio.run(router.dispatch(call))
+    assert bad.answers == [None]
+    assert stale.answers == ["stale"]
+    assert ok.answers == []
+    assert calls == [("page", 5, 0), ("page", 0, 2)]
+
+
+def test_dispatch_lets_handler_bugs_through():
+    router, _ = make_router()
+    call = Call(router.pack("broken", 0))
+    with pytest.raises(KeyError):
+        asyncio.run(router.dispatch(call))
+    assert call.answers == []
@@ -0,0 +1,60 @@
+import asyncio
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from cluster import ConflictRetryMiddleware, SeenUpdates, UpdateDedupMiddleware
+from storage import VersionConflict
+
+
+class Users:
+    def __init__(self):
+        self.forgotten = []
+
+    def forget(self, uid):
+        self.forgotten.append(uid)
+
+
+def conflicting(times):
+    calls = []
+
+    async def handler(event, data):
+        calls.append(event.update_id)
+        if len(calls) <= times:
+            raise VersionConflict("7")
+        return "done"
+
+    return handler, calls
+
+
+def test_conflict_is_retried_with_backoff():
+    users = Users()
+    retry = ConflictRetryMiddleware(users, attempts=5, delay=0.001, max_delay=0.002, rng=random.Random(1))
+    handler, calls = conflicting(4)
+    assert asyncio.run(retry(handler, SimpleNamespace(update_id=1), {})) == "done"
+    assert len(calls) == 5 and users.forgotten == ["7"] * 4
+    assert retry.conflicts == 4 and retry.failures == 0
+
+
+def test_conflict_gives_up_after_attempts():
+    retry = ConflictRetryMiddleware(Users(), attempts=3, delay=0, rng=random.Random(1))
+    handler, calls = conflicting(10)
+    with pytest.raises(VersionConflict):
+        asyncio.run(retry(handler, SimpleNamespace(update_id=1), {}))
+    assert len(calls) == 3 and retry.failures == 1
+
+
+def test_duplicate_update_is_dropped_and_failed_one_redelivered():
+    dedup = UpdateDedupMiddleware(SeenUpdates())
+
+    async def run():
+        handler, calls = conflicting(1)
+        with pytest.raises(VersionConflict):
+            await dedup(handler, SimpleNamespace(update_id=5), {})
+        assert await dedup(handler, SimpleNamespace(update_id=5), {}) == "done"
+        assert await dedup(handler, SimpleNamespace(update_id=5), {}) is None
+        return calls
+
+    assert asyncio.run(run()) == [5, 5]
+    assert dedup.duplicates == 1
@@ -0,0 +1,144 @@
+import json
+import random
+import sqlite3
+import threading
+
+import pytest
+
+from leaderboard import Leaderboard, Leaderboards, XpCounts
+from storage import JsonStore, SqliteStore
+
+
+def user(name, xp=0, week=None, week_xp=0):
+    record = {"name": name, "xp": xp}
+    if week:
+        record.update(week=week, week_xp=week_xp)
+    return record
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, tmp_path):
+    store = JsonStore(str(tmp_path / "users.json")) if request.param == "json" else SqliteStore(str(tmp_path / "users.db"))
+    yield store
+    store.close()
+
+
+def test_index_top_and_rank():
+    board = Leaderboard()
+    for uid, xp in [("a", 30), ("b", 50), ("c", 30), ("d", 0)]:
+        board.set(uid, xp)
+    assert board.top(2) == [("b", 50), ("a", 30)]
+    assert [board.rank(uid) for uid in "abcd"] == [2, 1, 3, None]
+    assert board.count_above(30) == 1
+    board.set("b", 0)
+    assert len(board) == 2 and board.rank("a") == 1
+
+
+def test_xp_counts_match_brute_force():
+    rng = random.Random(7)
+    xp = {uid: rng.randint(1, 20) for uid in range(50)}
+    counts = XpCounts(sorted({v: sum(1 for x in xp.values() if x == v) for v in xp.values()}.items()))
+    for _ in range(500):
+        uid = rng.randrange(50)
+        new = rng.choice([0, rng.randint(1, 20), rng.randint(1, 5000)])  # и рост дерева
+        if xp.get(uid):
+            counts.add(xp.pop(uid), -1)
+        if new:
+            counts.add(new, 1)
+            xp[uid] = new
+        probe = rng.randint(0, 6000)
+        assert counts.count_above(probe) == sum(1 for x in xp.values() if x > probe)
+        assert len(counts) == len(xp)
+
+
+def test_sqlite_rank_follows_writes_after_first_query(tmp_path):
+    store = SqliteStore(str(tmp_path / "users.db"))
+    store.put_many({"1": user("a", 10, "2026-W01", 10), "2": user("b", 20, "2026-W01", 20)})
+    assert store.count_above(None, 10) == 1 and store.ranked("2026-W01") == 2
+    store.put_many({"1": user("a", 30, "2026-W02", 5), "3": user("c", 15, "2026-W01", 15)})
+    assert store.count_above(None, 10) == 3 and store.count_above(None, 20) == 1
+    assert store.ranked("2026-W01") == 2 and store.count_above("2026-W01", 15) == 1
+    store.close()
+    # после перезапуска счётчики строятся заново из таблицы scores
+    store = SqliteStore(str(tmp_path / "users.db"))
+    assert store.count_above(None, 10) == 3 and store.ranked("2026-W01") == 2
+    store.close()
+
+
+def test_ranks_from_store(store):
+    store.put_many({"1": user("Әли", 10), "2": user("Бота", 40), "3": user("Дана", 25), "4": user("Ерлан")})
+    board = Leaderboards(store, today=lambda: "2026-W01").board(weekly=False)
+    assert board.top(2) == [("2", "Бота", 40), ("3", "Дана", 25)]
+    assert len(board) == 3
+    assert board.rank(store.get("2")) == 1
+    assert board.rank(store.get("1")) == 3
+    assert board.rank(store.get("4")) is None
+    # своё место считается по живой записи, даже если store её ещё не получил
+    assert board.rank(user("Әли", 30)) == 2
+
+
+def test_add_xp_and_weekly_rollover(store):
+    week = ["2026-W01"]
+    boards = Leaderboards(store, today=lambda: week[0])
+    a, b = user("a"), user("b")
+    boards.add_xp("a", a, 10)
+    boards.add_xp("b", b, 5)
+    store.put_many({"a": a, "b": b})
+    assert boards.board(True).top(10) == [("a", "a", 10), ("b", "b", 5)]
+
+    week[0] = "2026-W02"
+    assert len(boards.board(True)) == 0
+    boards.add_xp("b", b, 3)
+    store.put("b", b)
+    assert b == {"name": "b", "xp": 8, "week": "2026-W02", "week_xp": 3}
+    assert boards.board(True).top(10) == [("b", "b", 3)]
+    assert boards.board(False).top(10) == [("a", "a", 10), ("b", "b", 8)]
+    assert boards.board(True).rank(a) is None
+
+
+def test_startup_does_not_read_records(tmp_path, monkeypatch):
+    store = SqliteStore(str(tmp_path / "users.db"))
+    store.put_many({str(i): user(str(i), i) for i in range(100)})
+    for name in ("get", "load_all", "iter_all"):
+        monkeypatch.setattr(store, name, lambda *args, name=name: pytest.fail(f"store.{name} called"))
+    board = Leaderboards(store).board(weekly=False)
+    assert board.top(1) == [("99", "99", 99)]
+    assert len(board) == 99
+    store.close()
+
+
+def test_sqlite_backfills_scores_of_old_database(tmp_path):
+    path = str(tmp_path / "users.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (uid TEXT PRIMARY KEY, data TEXT NOT NULL)")
+    conn.executemany(
+        "INSERT INTO users VALUES (?, ?)",
+        [("1", json.dumps(user("a", 7, "2026-W01", 2))), ("2", json.dumps({"name": "b"}))],
+    )
+    conn.commit()
+    conn.close()
+    store = SqliteStore(path)
+    assert store.top(None, 10) == [("1", "a", 7)]
+    assert store.top("2026-W01", 10) == [("1", "a", 2)]
+    assert store.ranked(None) == 1
+    store.close()
+
+
+def test_json_store_reads_while_another_thread_writes(tmp_path):
+    # WriteBehind зовёт put_many из потока executor, пока цикл событий читает тот же store
+    store = JsonStore(str(tmp_path / "users.json"))
+    store.ranked(None)
+    done = threading.Event()
+
+    def writer():
+        for i in range(100):
+            store.put_many({str(i): user(str(i), i + 1)})
+        done.set()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    while not done.is_set():
+        store.top(None, 5), store.count_above(None, 10), store.load_all(), store.uids_after("", 10)
+    thread.join()
+    assert store.ranked(None) == 100
+    assert len(json.loads((tmp_path / "users.json").read_text(encoding="utf-8"))) == 100
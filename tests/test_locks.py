@@ -0,0 +1,57 @@
+import asyncio
+
+from locks import UserLocks
+
+
+def test_same_user_is_serialized_and_others_are_not():
+    locks = UserLocks()
+    log = []
+
+    async def work(uid, tag):
+        async with locks.hold(uid):
+            log.append(("start", tag))
+            await asyncio.sleep(0.01)
+            log.append(("end", tag))
+
+    async def run():
+        await asyncio.gather(work(1, "a"), work(1, "b"), work(2, "c"))
+
+    asyncio.run(run())
+    # у пользователя 1 критические секции не пересекаются, пользователь 2 их не ждёт
+    one = [event for event in log if event[1] in "ab"]
+    assert one in ([("start", "a"), ("end", "a"), ("start", "b"), ("end", "b")],
+                   [("start", "b"), ("end", "b"), ("start", "a"), ("end", "a")])
+    assert log.index(("start", "c")) < log.index(("end", "a"))
+
+
+def test_idle_entries_are_removed():
+    locks = UserLocks()
+
+    async def run():
+        async with locks.hold(1):
+            waiter = asyncio.create_task(hold_briefly(locks, 1))
+            await asyncio.sleep(0)
+            assert locks.locks[1][1] == 2
+        await waiter
+        assert locks.locks == {}
+
+    asyncio.run(run())
+
+
+async def hold_briefly(locks, uid):
+    async with locks.hold(uid):
+        pass
+
+
+def test_entry_is_removed_when_the_holder_fails():
+    locks = UserLocks()
+
+    async def run():
+        try:
+            async with locks.hold(1):
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        assert locks.locks == {}
+
+    asyncio.run(run())
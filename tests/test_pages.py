@@ -0,0 +1,49 @@
+import re
+
+from pages import PAGE_LIMIT, split_html, visible_len
+from templates import GRAMMAR_PAGE, MESSAGE_LIMIT, PAGE_COUNTER, Markup, html_errors
+
+WORDS = re.compile(r"[^\s<>]+")
+
+
+def visible_words(text):
+    return WORDS.findall(re.sub(r"<[^>]+>", " ", text))
+
+
+def long_text():
+    paragraphs = []
+    for i in range(60):
+        words = " ".join(f"сөз{i}_{j}" for j in range(40))
+        paragraphs.append(f"<b>Тақырып {i}</b>\n<i>{words}</i>" if i % 3 else words)
+    # тег, открытый через несколько абзацев
+    return "<blockquote>" + "\n\n".join(paragraphs) + "</blockquote>"
+
+
+def test_short_text_is_one_page():
+    assert split_html("<b>hi</b>") == ["<b>hi</b>"]
+    assert split_html("") == [""]
+
+
+def test_pages_are_balanced_and_within_limit():
+    text = long_text()
+    pages = split_html(text)
+    assert len(pages) > 3
+    for page in pages:
+        assert visible_len(page) <= PAGE_LIMIT
+        assert html_errors(page) == []
+    # ничего не потеряно и не задвоено
+    assert [w for page in pages for w in visible_words(page)] == visible_words(text)
+
+
+def test_page_with_header_fits_telegram_limit():
+    pages = split_html(long_text())
+    for n, page in enumerate(pages, 1):
+        counter = PAGE_COUNTER.render(page=n, total=len(pages))
+        message = GRAMMAR_PAGE.render(title="Септік жалғаулары", counter=counter, page=Markup(page))
+        assert visible_len(message) <= MESSAGE_LIMIT
+        assert html_errors(message) == []
+
+
+def test_word_longer_than_page_is_cut():
+    pages = split_html("x" * 25, limit=10)
+    assert pages == ["x" * 10, "x" * 10, "x" * 5]
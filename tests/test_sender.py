@@ -0,0 +1,96 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter, TelegramServerError
+from aiogram.methods import EditMessageText, SendMessage
+
+import sender
+from sender import OutboundLimiter, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Время в sender идёт только во время sleep: паузы видны без реального ожидания."""
+    state = SimpleNamespace(now=1000.0, sleeps=[])
+
+    async def sleep(seconds):
+        state.sleeps.append(seconds)
+        state.now += seconds
+        await asyncio.sleep(0)  # отдаём управление другим задачам, как настоящий sleep
+
+    monkeypatch.setattr(sender, "time", SimpleNamespace(monotonic=lambda: state.now))
+    monkeypatch.setattr(sender, "asyncio", SimpleNamespace(sleep=sleep))
+    monkeypatch.setattr(sender, "random", SimpleNamespace(uniform=lambda a, b: 0))
+    return state
+
+
+def flaky(errors):
+    """make_request, который сначала бросает errors по одной, потом отвечает "ok"; calls — время попыток."""
+    calls = []
+
+    async def make_request(bot, method):
+        calls.append(sender.time.monotonic())
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok"
+
+    return make_request, calls
+
+
+def test_retry_after_pauses_the_chat(clock):
+    limiter = OutboundLimiter(global_rate=100, chat_rate=100, chat_burst=10)
+    method = SendMessage(chat_id=1, text="x")
+    make_request, calls = flaky([TelegramRetryAfter(method, "flood", 5)])
+    assert asyncio.run(limiter(make_request, None, method)) == "ok"
+    assert len(calls) == 2 and calls[1] - calls[0] >= 5
+    assert limiter.retried == 1
+    # пауза касается только этого чата
+    other = SendMessage(chat_id=2, text="y")
+    started = clock.now
+    assert asyncio.run(limiter(flaky([])[0], None, other)) == "ok"
+    assert clock.now == started
+
+
+def test_retry_after_gives_up_after_max_retries(clock):
+    limiter = OutboundLimiter(max_retries=2)
+    method = SendMessage(chat_id=1, text="x")
+    make_request, calls = flaky([TelegramRetryAfter(method, "flood", 1)] * 5)
+    with pytest.raises(TelegramRetryAfter):
+        asyncio.run(limiter(make_request, None, method))
+    assert len(calls) == 3
+
+
+def test_server_error_is_retried_with_backoff(clock):
+    limiter = OutboundLimiter(global_rate=100, chat_rate=100, chat_burst=10)
+    method = SendMessage(chat_id=1, text="x")
+    make_request, calls = flaky([TelegramServerError(method, "502"), TelegramServerError(method, "502")])
+    assert asyncio.run(limiter(make_request, None, method)) == "ok"
+    assert clock.sleeps[:2] == [0.5, 1.0]
+
+
+def test_superseded_edit_is_dropped(clock):
+    limiter = OutboundLimiter(global_rate=100, chat_rate=1, chat_burst=1)
+    sent = []
+
+    async def make_request(bot, m):
+        sent.append(m.text)
+        return True
+
+    async def run():
+        edits = [EditMessageText(chat_id=1, message_id=7, text=str(i)) for i in range(3)]
+        await asyncio.gather(*(limiter(make_request, None, m) for m in edits))
+
+    asyncio.run(run())
+    assert sent == ["0", "2"] and limiter.coalesced == 1
+
+
+def test_token_bucket_rate(clock):
+    bucket = TokenBucket(rate=2, burst=2)
+
+    async def take(n):
+        for _ in range(n):
+            await bucket.acquire()
+
+    asyncio.run(take(6))
+    assert clock.now - 1000.0 == pytest.approx(2.0)
@@ -0,0 +1,72 @@
+import json
+
+import srs
+from srs import DAY, MIN_EASE, RELEARN, START_EASE
+
+
+def test_intervals_grow_on_correct_answers():
+    user = {}
+    d = srs.deck(user, "w")
+    srs.record(d, 1, True, 0)
+    assert d["items"]["1"] == [DAY, DAY, START_EASE + 10, 1]
+    srs.record(d, 1, True, DAY)
+    assert d["items"]["1"] == [7 * DAY, 6 * DAY, START_EASE + 20, 2]
+    srs.record(d, 1, True, 7 * DAY)
+    interval = 6 * DAY * (START_EASE + 20) // 100
+    assert d["items"]["1"] == [7 * DAY + interval, interval, START_EASE + 30, 3]
+
+
+def test_wrong_answer_relearns_and_lowers_ease():
+    d = srs.deck({}, "w")
+    for _ in range(10):
+        srs.record(d, 1, False, 0)
+    assert d["items"]["1"] == [RELEARN, RELEARN, MIN_EASE, 0]
+
+
+def test_next_due_and_earliest():
+    d = srs.deck({}, "w")
+    srs.record(d, 1, True, 0)  # через день
+    srs.record(d, 2, False, 0)  # через 10 минут
+    valid = {1, 2}
+    assert srs.next_due(d, RELEARN - 1, valid) is None
+    assert srs.next_due(d, RELEARN, valid) == 2
+    assert srs.earliest(d, valid) == 2
+    srs.record(d, 2, True, RELEARN)  # старая запись в куче устарела
+    assert srs.next_due(d, RELEARN, valid) is None
+    assert srs.earliest(d, valid) == 1
+
+
+def test_removed_question_is_dropped():
+    d = srs.deck({}, "w")
+    srs.record(d, 1, False, 0)
+    srs.record(d, 2, False, 5)
+    assert srs.next_due(d, DAY, {2}) == 2
+    assert "1" not in d["items"]
+
+
+def test_only_items_are_stored_and_heap_rebuilt_on_load():
+    user = {}
+    d = srs.deck(user, "w")
+    for t in range(100):
+        srs.record(d, t % 3, t % 2 == 0, t)
+    assert len(d.heap) <= 2 * len(d["items"]) + 16
+    saved = json.loads(json.dumps(user))
+    assert saved == {"srs": {"w": {"items": d["items"]}}}
+    loaded = srs.deck(saved, "w")
+    assert srs.earliest(loaded, {0, 1, 2}) == srs.earliest(d, {0, 1, 2})
+    # старый формат с сохранённой кучей
+    old = {"srs": {"w": {"items": d["items"], "heap": [[0, 9]]}}}
+    assert "heap" not in srs.deck(old, "w")
+
+
+def test_seed_queues_answered_questions_once():
+    d = srs.deck({}, "w")
+    srs.record(d, 2, False, 0)
+    srs.seed(d, [1, 2, 3], 100)
+    # уже известный вопрос не перезаписывается, остальные — как отвеченные один раз
+    assert d["items"] == {"2": [RELEARN, RELEARN, START_EASE - 20, 0],
+                          "1": [100 + DAY, DAY, START_EASE, 1], "3": [100 + DAY, DAY, START_EASE, 1]}
+    valid = {1, 2, 3}
+    assert srs.next_due(d, RELEARN, valid) == 2
+    srs.record(d, 2, True, RELEARN)
+    assert srs.next_due(d, 100 + DAY, valid) == 1
@@ -0,0 +1,23 @@
+import asyncio
+
+from bench.fake_api import FakeBotAPI, load_bot
+from bench.stress_taps import hammer
+
+
+def test_concurrent_taps_neither_lose_nor_double_xp():
+    # уменьшенный bench.stress_taps: 20 пользователей × 10 одновременных тапов × 3 раунда
+    async def run():
+        api = await FakeBotAPI(latency=0.002).start()
+        makan = load_bot(api, FLUSH_INTERVAL_MS=50)
+        makan.writer.start()
+        try:
+            memory, stored = await hammer(makan, range(1, 21), taps=10, rounds=3)
+        finally:
+            await makan.bot.session.close()
+            await api.stop()
+        return memory, stored, len(makan.user_locks.locks)
+
+    memory, stored, locks_left = asyncio.run(run())
+    assert memory == [30] * 20
+    assert stored == [30] * 20
+    assert locks_left == 0
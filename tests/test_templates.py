@@ -0,0 +1,83 @@
+import os
+import json
+
+import pytest
+
+from content import FILES, Content, compile_sources, read_sources
+from templates import Markup, Template, content_messages, escape, html_errors
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+# HTML-разметка, ключи медиа и id не трогаем: остальное в data/ — обычный текст
+NOT_TEXT = {"file_text", "text", "image", "audio", "id"}
+INJECTED = " 1<2 & *жирный* _курсив_ </b>"
+
+
+def inject(value, key=None):
+    if isinstance(value, str):
+        return value if key in NOT_TEXT else value + INJECTED
+    if isinstance(value, list):
+        return [inject(item, key) for item in value]
+    if isinstance(value, dict):
+        return {k: inject(v, k) for k, v in value.items()}
+    return value
+
+
+def load(transform=None):
+    sources = read_sources(DATA_DIR)
+    if transform:
+        sources = {name: raw and json.dumps(transform(json.loads(raw))).encode() for name, raw in sources.items()}
+    return Content(0, compile_sources(sources))
+
+
+@pytest.mark.parametrize("transform", [None, inject], ids=["data", "injected"])
+def test_every_content_message_is_valid_telegram_html(transform):
+    messages = list(content_messages(load(transform)))
+    assert len(messages) > len(FILES)
+    errors = [f"{where}: {error}" for where, message in messages for error in html_errors(message)]
+    assert errors == []
+
+
+def test_injected_text_is_escaped_not_interpreted():
+    messages = dict(content_messages(load(inject)))
+    escaped = " 1&lt;2 &amp; *жирный* _курсив_ &lt;/b&gt;"
+    assert escaped in messages["phrase 0 (daily)"]
+    assert escaped in messages["inline 0"]
+    assert INJECTED not in "".join(messages.values())
+
+
+def test_render_escapes_fields_but_not_markup():
+    t = Template("<b>{name}</b> — {xp} XP{tail}")
+    assert t.render(name="a<b & c", xp=5, tail=Markup("<i>!</i>")) == "<b>a&lt;b &amp; c</b> — 5 XP<i>!</i>"
+    assert isinstance(t.render(name="", xp=0, tail=""), Markup)
+    assert t.fields == {"name", "xp", "tail"}
+
+
+def test_render_requires_exactly_the_template_fields():
+    t = Template("{a} {b}")
+    with pytest.raises(TypeError):
+        t.render(a=1)
+    with pytest.raises(TypeError):
+        t.render(a=1, b=2, c=3)
+    assert Template("static <b>text</b>").render() == "static <b>text</b>"
+    with pytest.raises(TypeError):
+        Template("static").render(a=1)
+
+
+def test_only_plain_fields_are_supported():
+    for source in ("{x:>3}", "{x!r}", "{x.y}", "{0}"):
+        with pytest.raises(ValueError):
+            Template(source)
+
+
+def test_markup_concatenation_escapes_plain_strings():
+    assert Markup("<b>x</b>") + "<" == "<b>x</b>&lt;"
+    assert escape(Markup("<i>")) == "<i>"
+    assert escape(7) == "7"
+
+
+def test_html_errors():
+    assert html_errors("<b>ok</b> &amp; &lt;") == []
+    assert html_errors("a < b") == ["unescaped '<' at 2"]
+    assert html_errors("<b>x") == ["unclosed <b>"]
+    assert html_errors("<div>x</div>")[0].startswith("unsupported tag <div>")
+    assert html_errors("&nbsp;") == ["unsupported entity &nbsp; at 0"]